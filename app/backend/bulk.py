@@ -0,0 +1,311 @@
+from fastapi import Request, status
+from fastapi.exceptions import HTTPException
+from pydantic import ValidationError
+from slugify import slugify
+from sqlalchemy import Integer, case, select, text, update, values, column, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator
+import csv
+import orjson
+
+from app.backend.cache import response_cache
+from app.models.models import Category, Product
+from app.schemas.schemas import CreateProduct, ProductStockPrice, UserPrincipal
+
+
+BATCH_SIZE = 5000
+IMPORT_COLUMNS = ('row_no', 'name', 'slug', 'description', 'price', 'image_url', 'stock', 'supplier_id', 'category_id')
+UPDATE_COLUMNS = ('name', 'description', 'price', 'image_url', 'stock', 'category_id')
+
+
+async def iter_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b''
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def iter_records(request: Request) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    """
+    Строки тела запроса в виде (номер строки, словарь полей или текст ошибки).
+    CSV разбирается построчно, поэтому значения не должны содержать переводов строк
+    """
+    is_csv = request.headers.get('content-type', '').startswith('text/csv')
+    header = None
+    row_no = 0
+    async for line in iter_lines(request):
+        line = line.rstrip(b'\r')
+        if not line.strip():
+            continue
+        try:
+            if not is_csv:
+                row_no += 1
+                record = orjson.loads(line)
+                yield row_no, record if isinstance(record, dict) else 'Row must be a JSON object'
+                continue
+            values = next(csv.reader([line.decode()]))
+            if header is None:
+                header = values
+                continue
+            row_no += 1
+            yield row_no, dict(zip(header, values))
+        except (ValueError, UnicodeDecodeError) as ex:
+            yield row_no, f'Malformed row: {ex}'
+
+
+class ProductImport:
+    """
+    Массовая загрузка товаров: строки валидируются пачками по CreateProduct,
+    slug генерируется для всей пачки, загрузка идет через COPY во временную
+    таблицу с последующим upsert одним запросом. Первая строка с данным slug
+    обновляет одноименный товар, следующие получают slug с суффиксом -2, -3, ...,
+    не занятым ни в загрузке, ни в базе
+    """
+
+    def __init__(self, db: AsyncSession, user: UserPrincipal):
+        self.db = db
+        self.user = user
+        self.supplier_id = user.id if user.is_supplier else None
+        self.seen_slugs: set[str] = set()
+        self.next_suffix: dict[str, int] = {}
+        self.inserted = 0
+        self.updated = 0
+        self.errors: list[dict[str, Any]] = []
+
+    def error(self, row_no: int, detail: Any) -> None:
+        self.errors.append({'row': row_no, 'detail': detail})
+
+    async def run(self, records: AsyncIterator[tuple[int, dict[str, Any] | str]]) -> dict[str, Any]:
+        batch = []
+        async for row_no, record in records:
+            if isinstance(record, str):
+                self.error(row_no, record)
+                continue
+            batch.append((row_no, record))
+            if len(batch) >= BATCH_SIZE:
+                await self.load_batch(batch)
+                batch = []
+        if batch:
+            await self.load_batch(batch)
+
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'errors': self.errors
+        }
+
+    def validate(
+        self,
+        batch: list[tuple[int, dict[str, Any]]]
+    ) -> tuple[list[dict[str, Any]], list[tuple[dict[str, Any], str]]]:
+        rows = []
+        repeated = []
+        for row_no, record in batch:
+            try:
+                product = CreateProduct.model_validate(record)
+            except ValidationError as ex:
+                self.error(row_no, ex.errors(include_url=False, include_context=False))
+                continue
+            slug = slugify(product.name)
+            row = {
+                'row_no': row_no,
+                'name': product.name,
+                'slug': slug,
+                'description': product.description,
+                'price': product.price,
+                'image_url': product.image_url or '',
+                'stock': product.stock,
+                'supplier_id': self.supplier_id,
+                'category_id': product.category_id
+            }
+            if slug in self.seen_slugs:
+                repeated.append((row, slug))
+            else:
+                self.seen_slugs.add(slug)
+            rows.append(row)
+        return rows, repeated
+
+    async def disambiguate(self, repeated: list[tuple[dict[str, Any], str]]) -> None:
+        """
+        Подбирает повторам slug вида base-N: кандидаты проверяются в базе одним
+        запросом, занятые заменяются следующими номерами до тех пор, пока все не станут свободны
+        """
+        while repeated:
+            for row, base in repeated:
+                number = self.next_suffix.get(base, 2)
+                while f'{base}-{number}' in self.seen_slugs:
+                    number += 1
+                self.next_suffix[base] = number + 1
+                row['slug'] = f'{base}-{number}'
+                self.seen_slugs.add(row['slug'])
+            candidates = [row['slug'] for row, _ in repeated]
+            taken = set((await self.db.scalars(select(Product.slug).where(Product.slug.in_(candidates)))).all())
+            # занятый в базе slug остается доступен строке с таким именем - она обновит товар
+            self.seen_slugs -= taken
+            repeated = [(row, base) for row, base in repeated if row['slug'] in taken]
+
+    async def load_batch(self, batch: list[tuple[int, dict[str, Any]]]) -> None:
+        rows, repeated = self.validate(batch)
+        if not rows:
+            return
+        await self.disambiguate(repeated)
+
+        category_ids = {row['category_id'] for row in rows}
+        known = set((await self.db.scalars(select(Category.id).where(Category.id.in_(category_ids)))).all())
+        valid = []
+        for row in rows:
+            if row['category_id'] in known:
+                valid.append(row)
+            else:
+                self.error(row['row_no'], f'Category {row["category_id"]} not found')
+        if not valid:
+            return
+
+        slugs = [row['slug'] for row in valid]
+        existing = set((await self.db.scalars(select(Product.slug).where(Product.slug.in_(slugs)))).all())
+        if self.db.bind.dialect.driver == 'asyncpg':
+            written = await self.copy_upsert(valid)
+        else:
+            written = await self.insert_upsert(valid)
+        await self.db.commit()
+
+        for row in valid:
+            if row['slug'] not in written:
+                self.error(row['row_no'], 'Product already present')
+            elif row['slug'] in existing:
+                self.updated += 1
+            else:
+                self.inserted += 1
+        updated_ids = [product_id for slug, product_id in written.items() if slug in existing]
+        if updated_ids:
+            await response_cache.invalidate(*(f'product:{product_id}' for product_id in updated_ids))
+
+    def ownership_clause(self, table: str) -> str:
+        if self.user.is_supplier:
+            return f'where {table}.supplier_id = {int(self.user.id)}'
+        return ''
+
+    async def copy_upsert(self, rows: list[dict[str, Any]]) -> dict[str, int]:
+        products = Product.__table__.fullname
+        await self.db.execute(text(
+            'create temp table products_import (row_no integer, name text, slug text, description text, '
+            'price integer, image_url text, stock integer, supplier_id integer, category_id integer) '
+            'on commit drop'
+        ))
+        connection = await self.db.connection()
+        raw = (await connection.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            'products_import',
+            columns=IMPORT_COLUMNS,
+            records=[tuple(row[column] for column in IMPORT_COLUMNS) for row in rows]
+        )
+        updates = ', '.join(f'{column} = excluded.{column}' for column in UPDATE_COLUMNS)
+        result = await self.db.execute(text(
+            f'insert into {products} (name, slug, description, price, image_url, stock, supplier_id, category_id, rating) '
+            f'select name, slug, description, price, image_url, stock, supplier_id, category_id, 0 '
+            f'from products_import '
+            f'on conflict (slug) do update set {updates}, version = products.version + 1 '
+            f'{self.ownership_clause("products")} '
+            f'returning slug, id'
+        ))
+        return {slug: product_id for slug, product_id in result}
+
+    async def insert_upsert(self, rows: list[dict[str, Any]], chunk_size: int = 1000) -> dict[str, int]:
+        """
+        Запасной путь без COPY (не asyncpg): тот же upsert через INSERT ... ON CONFLICT
+        """
+        insert = sqlite_insert if self.db.bind.dialect.name == 'sqlite' else pg_insert
+        written = {}
+        for start in range(0, len(rows), chunk_size):
+            stmt = insert(Product).values([
+                {key: value for key, value in row.items() if key != 'row_no'} | {'rating': 0.0}
+                for row in rows[start:start + chunk_size]
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Product.slug],
+                set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS} | {'version': Product.version + 1},
+                where=(Product.supplier_id == self.user.id) if self.user.is_supplier else None
+            )
+            result = await self.db.execute(stmt.returning(Product.slug, Product.id))
+            written.update({slug: product_id for slug, product_id in result})
+        return written
+
+
+async def update_stock_price(
+    db: AsyncSession,
+    user: UserPrincipal,
+    items: list[ProductStockPrice],
+    chunk_size: int = 1000
+) -> dict[str, list[int | str]]:
+    """
+    Массовое обновление остатков и цен: товары находятся одним запросом по id и slug,
+    владение проверяется для всего набора сразу, изменения применяются
+    одним UPDATE ... FROM (VALUES ...) на каждую пачку
+    """
+    ids = {item.id for item in items if item.slug is None}
+    slugs = {item.slug for item in items if item.slug is not None}
+    found = (await db.execute(
+        select(Product.id, Product.slug, Product.supplier_id)
+        .where(or_(Product.id.in_(ids), Product.slug.in_(slugs)))
+    )).all()
+    by_key = {row.id: row for row in found if row.id in ids} | {row.slug: row for row in found if row.slug in slugs}
+
+    missing = [item.key for item in items if item.key not in by_key]
+    if user.is_supplier:
+        foreign = [item.key for item in items if item.key in by_key and by_key[item.key].supplier_id != user.id]
+        if foreign:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail={'message': 'You are not authorized to use this method', 'products': foreign}
+            )
+
+    changes: dict[int, tuple[int | None, int | None]] = {}
+    keys_by_id: dict[int, list[int | str]] = {}
+    for item in items:
+        if item.key in by_key:
+            product_id = by_key[item.key].id
+            stock, price = changes.get(product_id, (None, None))
+            changes[product_id] = (item.stock if item.stock is not None else stock,
+                                   item.price if item.price is not None else price)
+            keys_by_id.setdefault(product_id, []).append(item.key)
+
+    changed_ids = []
+    rows = [(product_id, stock, price) for product_id, (stock, price) in changes.items()]
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        if db.bind.dialect.name == 'postgresql':
+            v = values(column('id', Integer), column('stock', Integer), column('price', Integer), name='v')\
+                .data(chunk)
+            matches, stock, price = Product.id == v.c.id, v.c.stock, v.c.price
+        else:
+            # sqlite не поддерживает имена колонок у VALUES - значения берутся CASE по id
+            matches = Product.id.in_([product_id for product_id, _, _ in chunk])
+            stock = case({product_id: stock for product_id, stock, _ in chunk}, value=Product.id)
+            price = case({product_id: price for product_id, _, price in chunk}, value=Product.id)
+        new_stock = func.coalesce(stock, Product.stock)
+        new_price = func.coalesce(price, Product.price)
+        result = await db.execute(
+            update(Product)
+            .where(matches)
+            .where(or_(Product.stock.is_distinct_from(new_stock), Product.price.is_distinct_from(new_price)))
+            .values(stock=new_stock, price=new_price, version=Product.version + 1)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        changed_ids.extend(result.scalars().all())
+    await db.commit()
+
+    if changed_ids:
+        await response_cache.invalidate(*(f'product:{product_id}' for product_id in changed_ids))
+    changed = set(changed_ids)
+    return {
+        'changed': [key for product_id in changed_ids for key in keys_by_id[product_id]],
+        'unchanged': [key for product_id, keys in keys_by_id.items() if product_id not in changed for key in keys],
+        'missing': missing
+    }
@@ -0,0 +1,260 @@
+from abc import ABC, abstractmethod
+from asyncio import Future, get_running_loop
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+import orjson
+
+from app.backend.db import read_only
+from app.backend.settings import get_settings, lazy
+from app.backend.metrics import CACHE_HITS, CACHE_MISSES, RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES
+
+
+class TTLCache:
+    """
+    LRU-кэш с ограничением времени жизни записей, локальный для воркера.
+    on_evict вызывается для записей, вытесненных по размеру или по TTL
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        on_evict: Callable[[Hashable, Any], None] | None = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._on_evict = on_evict
+        self._hits = CACHE_HITS.labels(cache=name)
+        self._misses = CACHE_MISSES.labels(cache=name)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is not None:
+            if item[0] > monotonic():
+                self._data.move_to_end(key)
+                self._hits.inc()
+                return item[1]
+            del self._data[key]
+            self._evicted(key, item[1])
+        self._misses.inc()
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        self._data[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted, item = self._data.popitem(last=False)
+            self._evicted(evicted, item[1])
+
+    def pop(self, key: Hashable) -> Any:
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evicted(self, key: Hashable, value: Any) -> None:
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+
+class CacheBackend(ABC):
+    """
+    Хранилище кэша ответов. Реализация для общего хранилища (например, Redis)
+    должна обеспечивать те же операции: значения - готовые байты ответа,
+    инвалидация - по тегам.
+    Каждая инвалидация увеличивает номер последовательности и запоминает его
+    для своих тегов. Загрузка берет sequence() до чтения из базы, и set с этим
+    номером атомарно отказывается сохранять ответ, если какой-то из его тегов
+    был инвалидирован позже: иначе ответ, прочитанный до записи, пережил бы
+    инвалидацию. Ответ, прочитанный с реплики, не сохраняется и тогда, когда
+    тег инвалидирован за последние lag секунд: реплика могла еще не получить запись
+    """
+
+    @abstractmethod
+    async def sequence(self) -> int:
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        tags: Iterable[str],
+        ttl: float,
+        since: int,
+        lag: float = 0
+    ) -> bool:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        ...
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Локальное для воркера хранилище: LRU с TTL и индексом ключей по тегам.
+    Теги хранятся вместе с записью, и вытесненная запись убирается из индекса.
+    Номера инвалидаций помнятся horizon секунд: загрузка, начатая раньше,
+    не сохраняется
+    """
+
+    def __init__(self, maxsize: int, horizon: float = 300):
+        self.horizon = horizon
+        self._entries = TTLCache('responses', maxsize=maxsize, ttl=0, on_evict=self._unlink)
+        self._tags: dict[str, set[str]] = {}
+        self._sequence = 0
+        self._invalidated: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._forgotten = 0
+
+    async def sequence(self) -> int:
+        return self._sequence
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        tags: Iterable[str],
+        ttl: float,
+        since: int,
+        lag: float = 0
+    ) -> bool:
+        tags = frozenset(tags)
+        if since < self._forgotten:
+            return False
+        settled = monotonic() - lag
+        for tag in tags:
+            sequence, invalidated_at = self._invalidated.get(tag, (0, 0))
+            if sequence > since or invalidated_at > settled:
+                return False
+        previous = self._entries.pop(key)
+        if previous is not None:
+            self._unlink(key, previous)
+        self._entries.set(key, (value, tags), ttl=ttl)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        return True
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        self._sequence += 1
+        now = monotonic()
+        for tag in tags:
+            self._invalidated[tag] = (self._sequence, now)
+            self._invalidated.move_to_end(tag)
+            for key in self._tags.pop(tag, ()):
+                entry = self._entries.pop(key)
+                if entry is not None:
+                    self._unlink(key, entry)
+        while self._invalidated:
+            tag, (sequence, invalidated_at) = next(iter(self._invalidated.items()))
+            if invalidated_at > now - self.horizon:
+                break
+            del self._invalidated[tag]
+            self._forgotten = sequence
+
+    def _unlink(self, key: str, entry: tuple[bytes, frozenset[str]]) -> None:
+        for tag in entry[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class ResponseCache:
+    """
+    Кэш сериализованных ответов GET-маршрутов. Одновременные промахи по одному
+    ключу в пределах воркера ждут одну загрузку, а не идут в базу каждый.
+    Инвалидация отцепляет идущие загрузки ключей с этими тегами: следующие
+    запросы к ним начнут новую. Теги загрузки известны только после нее,
+    поэтому берутся из прошлой загрузки того же ключа; загрузка ключа
+    с неизвестными тегами отцепляется при любой инвалидации.
+    Запросы, читающие основную базу (клиент недавно писал), кэш не читают и
+    чужих загрузок не ждут - там может быть ответ реплики без его записи.
+    Ответ реплики сохраняется с задержкой replica_lag после инвалидации
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, replica_lag: float = 0, maxsize: int = 10000):
+        self.backend = backend
+        self.ttl = ttl
+        self.replica_lag = replica_lag
+        self._loading: dict[str, Future] = {}
+        self._tags = TTLCache('response_tags', maxsize=maxsize, ttl=ttl)
+
+    async def get_or_set(
+        self,
+        route: str,
+        key: str,
+        loader: Callable[[], Awaitable[tuple[Any, Iterable[str]]]]
+    ) -> bytes:
+        key = f'{route}:{key}'
+        replica = read_only.get()
+        if replica:
+            body = await self.backend.get(key)
+            if body is not None:
+                RESPONSE_CACHE_HITS.labels(route=route).inc()
+                return body
+
+            if key in self._loading:
+                RESPONSE_CACHE_HITS.labels(route=route).inc()
+                return await self._loading[key]
+
+        RESPONSE_CACHE_MISSES.labels(route=route).inc()
+        future = get_running_loop().create_future()
+        if replica:
+            self._loading[key] = future
+        try:
+            since = await self.backend.sequence()
+            content, tags = await loader()
+            tags = frozenset(tags)
+            self._tags.set(key, tags)
+            body = orjson.dumps(content)
+            await self.backend.set(key, body, tags, self.ttl, since, self.replica_lag if replica else 0)
+            future.set_result(body)
+            return body
+        except Exception as ex:
+            future.set_exception(ex)
+            # исключение получат ожидающие, для самого future его не нужно логировать
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    async def invalidate(self, *tags: str) -> None:
+        invalidated = set(tags)
+        for key in list(self._loading):
+            known = self._tags.get(key)
+            if known is None or known & invalidated:
+                del self._loading[key]
+        await self.backend.invalidate(tags)
+
+
+def build_response_cache() -> ResponseCache:
+    settings = get_settings()
+    # без реплики чтение идет в основную базу и ждать после записи нечего
+    return ResponseCache(MemoryBackend(maxsize=settings.response_cache_size),
+                         ttl=settings.response_cache_ttl,
+                         replica_lag=settings.db_read_your_writes if settings.db_read else 0,
+                         maxsize=settings.response_cache_size)
+
+
+response_cache = lazy(build_response_cache)
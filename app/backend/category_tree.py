@@ -0,0 +1,54 @@
+from bisect import bisect_left
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from time import monotonic
+
+from app.backend.settings import get_settings, lazy
+from app.models.models import Category
+
+
+class CategoryTree:
+    """
+    Снимок дерева активных категорий в памяти воркера: пары (path, id),
+    отсортированные по материализованному пути. Потомки категории
+    занимают непрерывный отрезок списка сразу после нее самой
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._paths: list[str] = []
+        self._ids: list[int] = []
+        self._by_id: dict[int, str] = {}
+        self._expires = 0.0
+
+    async def load(self, db: AsyncSession) -> None:
+        rows = sorted((await db.execute(select(Category.path, Category.id)
+                                        .where(Category.path.is_not(None))
+                                        .where(Category.is_active == True))).all())
+        self._paths = [row.path for row in rows]
+        self._ids = [row.id for row in rows]
+        self._by_id = dict(zip(self._ids, self._paths))
+        self._expires = monotonic() + self.ttl
+
+    def invalidate(self) -> None:
+        self._expires = 0.0
+
+    async def subtree(self, db: AsyncSession, category_id: int) -> list[int]:
+        if monotonic() >= self._expires:
+            await self.load(db)
+        path = self._by_id.get(category_id)
+        if path is None:
+            return await self.subtree_from_db(db, category_id)
+        start = bisect_left(self._paths, path)
+        end = bisect_left(self._paths, path + '\uffff', lo=start)
+        return self._ids[start:end]
+
+    @staticmethod
+    async def subtree_from_db(db: AsyncSession, category_id: int) -> list[int]:
+        path = select(Category.path).where(Category.id == category_id).scalar_subquery()
+        ids = (await db.scalars(select(Category.id).where(Category.path.startswith(path))
+                                .where(Category.is_active == True))).all()
+        return list(ids) or [category_id]
+
+
+category_tree = lazy(lambda: CategoryTree(ttl=get_settings().category_tree_ttl))
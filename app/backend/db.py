@@ -1,9 +1,14 @@
+from contextvars import ContextVar
 from datetime import datetime
-from environs import Env
-from sqlalchemy import Integer, Text, Boolean, DateTime, MetaData, func, URL
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase, mapped_column
-from typing import Annotated
+from functools import cache
+from operator import attrgetter
+from sqlalchemy import Integer, Text, Boolean, DateTime, MetaData, func, URL, event, inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, InstrumentedAttribute, Session, mapped_column
+from typing import Annotated, Callable
+
+from app.backend.pool import InstrumentedPool, instrument_pool, instrument_queries
+from app.backend.settings import get_settings, on_settings_change
 
 
 int_pk = Annotated[int, mapped_column(Integer, primary_key=True)]
@@ -14,27 +19,101 @@ str_uq_ix = Annotated[str, mapped_column(Text, unique=True, index=True)]
 curr_time = Annotated[datetime, mapped_column(DateTime, server_default=func.clock_timestamp())]
 
 
+@cache
+def column_accessor(model: type) -> tuple[tuple[str, ...], tuple[InstrumentedAttribute, ...], attrgetter]:
+    """
+    Колонки модели, вычисляемые один раз на маппер: ключи, атрибуты для select
+    и attrgetter, читающий все значения объекта одним вызовом
+    """
+    attributes = tuple(getattr(model, prop.key) for prop in inspect(model).column_attrs)
+    keys = tuple(attribute.key for attribute in attributes)
+    return keys, attributes, attrgetter(*keys)
+
+
 class Base(DeclarativeBase):
 
     metadata = MetaData(schema='ecommerce_fastapi')
 
+    @classmethod
+    def columns(cls) -> tuple[InstrumentedAttribute, ...]:
+        return column_accessor(cls)[1]
+
     @property
     def attrs(self):
-        cols = {col.key: getattr(self, col.key) for col in list(self.__table__.columns)}
-        return cols
-
-
-env = Env()
-env.read_env()
-connect_args = {
-    'drivername': f'{env("DB_LANGUAGE")}+{env("DB_DRIVER")}',
-    'username': env("DB_USERNAME"),
-    'password': env("DB_PASSWORD"),
-    'host': env("DB_HOST"),
-    'port': env("DB_PORT"),
-    'database': env("DB_DATABASE")
-}
-
-url = URL.create(**connect_args)
-engine = create_async_engine(url)
-AsyncSession = async_sessionmaker(bind=engine, expire_on_commit=False)
+        keys, _, getter = column_accessor(type(self))
+        return dict(zip(keys, getter(self)))
+
+
+def create_engine(connect_args: dict[str, str]) -> AsyncEngine:
+    engine = create_async_engine(URL.create(**connect_args), poolclass=InstrumentedPool, **get_settings().pool_args)
+    instrument_pool(engine)
+    instrument_queries(engine)
+    return engine
+
+
+@cache
+def get_engine() -> AsyncEngine:
+    return create_engine(get_settings().connect_args)
+
+
+@cache
+def get_read_engine() -> AsyncEngine:
+    """
+    Движок реплики для чтения; без DB_READ_* чтение идет через основной
+    """
+    settings = get_settings()
+    return create_engine(settings.read_connect_args) if settings.db_read else get_engine()
+
+
+async def dispose_engines() -> None:
+    for engine in {get_engine(), get_read_engine()}:
+        await engine.dispose()
+    reset_engines()
+
+
+class LazySessionmaker(async_sessionmaker):
+    """
+    Фабрика сессий, которая создает движок при первой сессии, а не при импорте
+    """
+
+    def __init__(self, get_bind: Callable[[], AsyncEngine], **kw):
+        super().__init__(**kw)
+        self._get_bind = get_bind
+
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+
+class ReadOnlySession(Session):
+    pass
+
+
+AsyncSession = LazySessionmaker(get_engine, expire_on_commit=False)
+ReadSession = LazySessionmaker(get_read_engine, expire_on_commit=False, sync_session_class=ReadOnlySession)
+
+
+@on_settings_change
+def reset_engines() -> None:
+    """
+    Следующая сессия создаст движки заново - по текущим настройкам
+    """
+    get_engine.cache_clear()
+    get_read_engine.cache_clear()
+    for sessionmaker in (AsyncSession, ReadSession):
+        sessionmaker.configure(bind=None)
+
+
+# сессию выбирает replica_middleware: безопасные методы читают с реплики,
+# пока у клиента нет недавней собственной записи
+read_only: ContextVar[bool] = ContextVar('read_only', default=False)
+
+
+def session_factory() -> async_sessionmaker:
+    return ReadSession if read_only.get() else AsyncSession
+
+
+@event.listens_for(ReadOnlySession, 'before_flush')
+def forbid_writes(session: Session, flush_context, instances):
+    raise RuntimeError('Attempt to write through a read-only session')
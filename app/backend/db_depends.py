@@ -1,34 +1,61 @@
-from app.backend.db import AsyncSession
-from app.models.models import Category, Product, Rating
+from app.backend.db import AsyncSession, session_factory
+from app.models.models import Category, Product, Rating, Order
 from app.schemas.schemas import CreateProduct, CreateCategory
 from fastapi import Depends, status, Body, Path, Query
 from fastapi.exceptions import HTTPException
 from sqlalchemy import select, and_
+from sqlalchemy.orm import InstrumentedAttribute
 from slugify import slugify
-from typing import Annotated
+from typing import Annotated, Any, TypeVar
+
+
+Model = TypeVar('Model')
 
 
 async def get_session():
-    session = AsyncSession()
+    session = session_factory()()
     try:
         yield session
     finally:
         await session.reset()
 
 
+class EntityLoader:
+    """
+    Загрузчик сущностей в рамках одного запроса: зависимости и обработчик
+    получают один и тот же ORM-объект, а запрос к базе выполняется один раз.
+    Число SQL-запросов за HTTP-запрос - в RequestStats.db_queries (заголовок Server-Timing)
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._loaded: dict[tuple, Any] = {}
+
+    async def get(self, model: type[Model], column: InstrumentedAttribute, value: Any) -> Model | None:
+        key = (model, column.key, value)
+        if key not in self._loaded:
+            self._loaded[key] = await self.db.scalar(select(model).where(column == value))
+        return self._loaded[key]
+
+
+async def get_loader(
+    db: Annotated[AsyncSession, Depends(get_session)]
+) -> EntityLoader:
+    return EntityLoader(db)
+
+
 async def category_found(
     category_slug: Annotated[str, Path()],
-    db: Annotated[AsyncSession, Depends(get_session)]
-):
-    stmt = select(Category).where(Category.slug == category_slug)
-    category = await db.scalar(stmt)
+    loader: Annotated[EntityLoader, Depends(get_loader)]
+) -> Category:
+    category = await loader.get(Category, Category.slug, category_slug)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='There is no category found'
         )
 
-    return category.attrs
+    return category
 
 
 async def category_already_exists(
@@ -45,9 +72,9 @@ async def category_already_exists(
 
 async def product_found(
     product_slug: Annotated[str, Path()],
-    db: Annotated[AsyncSession, Depends(get_session)]
-):
-    product = await db.scalar(select(Product).where(Product.slug == product_slug))
+    loader: Annotated[EntityLoader, Depends(get_loader)]
+) -> Product:
+    product = await loader.get(Product, Product.slug, product_slug)
     if product is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -80,3 +107,17 @@ async def rating_found(
         )
 
     return rating
+
+
+async def order_found(
+    order_id: Annotated[int, Path()],
+    db: Annotated[AsyncSession, Depends(get_session)]
+) -> Order:
+    order = await db.scalar(select(Order).where(Order.id == order_id))
+    if order is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No order found'
+        )
+
+    return order
@@ -0,0 +1,45 @@
+from fastapi import Request, status
+from fastapi.responses import ORJSONResponse, Response
+from hashlib import blake2b
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Iterable
+import orjson
+
+
+def entity_etag(entity_id: int, version: int) -> str:
+    return f'"{entity_id}-{version}"'
+
+
+def rows_etag(versions: Iterable[tuple[int, int]]) -> str:
+    """
+    ETag набора строк по парам (id, version): меняется при изменении любой
+    строки набора и при изменении самого состава
+    """
+    digest = blake2b(orjson.dumps([tuple(pair) for pair in versions]), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(header: str | None, etag: str, weak: bool = True) -> bool:
+    """
+    Сравнение с If-None-Match (слабое, W/ игнорируется) или If-Match (строгое)
+    """
+    if header is None:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = (tag.strip() for tag in header.split(','))
+    return etag in {tag.removeprefix('W/') for tag in tags} if weak else etag in set(tags)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+async def stale_data_handler(request: Request, ex: StaleDataError) -> ORJSONResponse:
+    """
+    Версия строки изменилась между чтением и UPDATE ... WHERE version = ...
+    """
+    return ORJSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={'detail': 'The entity was modified concurrently, retry the request'}
+    )
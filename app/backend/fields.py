@@ -0,0 +1,46 @@
+from fastapi import Query, status
+from fastapi.exceptions import HTTPException
+from sqlalchemy.orm import InstrumentedAttribute
+from typing import Annotated, Callable
+
+from app.backend.db import Base, column_accessor
+
+
+Fields = tuple[str, ...] | None
+
+
+def fields_params(model: type[Base]) -> Callable:
+    """
+    Зависимость для параметра fields=name,slug,price: поля проверяются по колонкам
+    модели и возвращаются в порядке колонок, чтобы одинаковые наборы давали
+    один ключ кэша. id добавляется всегда - по нему строится курсор и теги кэша
+    """
+    async def dependency(
+        fields: Annotated[str | None, Query(description='Comma-separated list of columns to return')] = None
+    ) -> Fields:
+        if fields is None:
+            return None
+        keys = column_accessor(model)[0]
+        requested = {field.strip() for field in fields.split(',') if field.strip()}
+        unknown = requested - set(keys)
+        if not requested or unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={'message': 'Unknown fields', 'fields': sorted(unknown), 'allowed': list(keys)}
+            )
+        return tuple(key for key in keys if key in requested or key == 'id')
+
+    return dependency
+
+
+def select_fields(model: type[Base], fields: Fields, keys: tuple = ()) -> tuple[InstrumentedAttribute, ...]:
+    """
+    Колонки для select; keys - ключи пагинации, они нужны для курсора даже без запроса
+    """
+    if fields is None:
+        return model.columns()
+    return tuple(getattr(model, key) for key in fields) + tuple(key for key in keys if key.key not in fields)
+
+
+def fields_key(key: str, fields: Fields) -> str:
+    return key if fields is None else f'{key}?fields={",".join(fields)}'
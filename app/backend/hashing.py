@@ -0,0 +1,61 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import status
+from fastapi.exceptions import HTTPException
+from passlib.context import CryptContext
+from time import perf_counter
+from typing import Any, Callable
+
+from app.backend.metrics import (
+    PASSWORD_HASH_SECONDS,
+    PASSWORD_HASH_QUEUE_WAIT_SECONDS,
+    PASSWORD_HASH_PENDING,
+    PASSWORD_HASH_REJECTED
+)
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в ограниченном пуле потоков, чтобы не блокировать event loop.
+    bcrypt отпускает GIL, поэтому потоков достаточно. Если в работе и очереди
+    уже workers + max_queue вызовов, новый запрос сразу получает 503
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self._context = context
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._max_pending = workers + max_queue
+        self._pending = 0
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self._max_pending:
+            PASSWORD_HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Too many authentication requests, try again later',
+                headers={'Retry-After': '1'}
+            )
+
+        queued = perf_counter()
+
+        def job():
+            started = perf_counter()
+            PASSWORD_HASH_QUEUE_WAIT_SECONDS.observe(started - queued)
+            try:
+                return func(*args)
+            finally:
+                PASSWORD_HASH_SECONDS.labels(operation=operation).observe(perf_counter() - started)
+
+        self._pending += 1
+        PASSWORD_HASH_PENDING.inc()
+        try:
+            return await get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self._pending -= 1
+            PASSWORD_HASH_PENDING.dec()
+
+    async def hash(self, password: str) -> str:
+        return await self._run('hash', self._context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._run('verify', self._context.verify_and_update, password, hashed_password)
@@ -0,0 +1,161 @@
+from asyncio import to_thread, wrap_future
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import UploadFile, status
+from fastapi.exceptions import HTTPException
+from hashlib import sha256
+from multiprocessing import get_context
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Literal
+
+from app.backend.metrics import IMAGE_RENDER_SECONDS, IMAGE_PENDING, IMAGE_REJECTED, IMAGE_UPLOADS
+from app.backend.settings import get_settings, lazy
+from app.backend.thumbnails import THUMBNAIL_SIZES, THUMBNAIL_FORMAT, UnsupportedImage, render_thumbnails
+
+
+ThumbnailSize = Literal['large', 'medium', 'small']
+DIGEST_PATTERN = '^[0-9a-f]{64}$'
+
+
+class ImageStore:
+    """
+    Локальное хранилище миниатюр с адресацией по sha256 загруженного файла:
+    root/ab/abcd.../{size}.webp. Повторная загрузка того же файла (в том числе
+    к другому товару) не обрабатывается заново
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def directory(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def relative_path(self, digest: str, size: str) -> str:
+        return f'{digest[:2]}/{digest}/{size}.{THUMBNAIL_FORMAT}'
+
+    def complete(self, digest: str) -> bool:
+        return all((self.directory(digest) / f'{size}.{THUMBNAIL_FORMAT}').is_file() for size in THUMBNAIL_SIZES)
+
+
+class ImageProcessor:
+    """
+    Пул процессов для Pillow: декодирование и ресайз держат GIL, поэтому
+    в отличие от bcrypt нужны процессы, а не потоки. Процессы запускаются
+    через spawn - fork воркера с работающим event loop и потоками небезопасен.
+    Если в работе и очереди уже workers + max_queue загрузок, новая получает 503.
+    Место освобождается, когда задача завершилась в пуле, а не когда запрос
+    перестал ее ждать: отмененный запрос не отменяет уже идущий ресайз
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self._workers = workers
+        self._executor = self._new_executor()
+        self._max_pending = workers + max_queue
+        self._pending = 0
+        self._lock = Lock()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self._workers, mp_context=get_context('spawn'))
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._pending >= self._max_pending:
+                return False
+            self._pending += 1
+        IMAGE_PENDING.inc()
+        return True
+
+    def _release(self, started: float) -> None:
+        # вызывается потоком пула при завершении задачи
+        with self._lock:
+            self._pending -= 1
+        IMAGE_PENDING.dec()
+        IMAGE_RENDER_SECONDS.observe(perf_counter() - started)
+
+    def _broken(self, executor: ProcessPoolExecutor) -> HTTPException:
+        # процесс пула упал (например, OOM): следующие загрузки получат новый пул
+        if self._executor is executor:
+            self._executor = self._new_executor()
+            executor.shutdown(wait=False, cancel_futures=True)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Image processing is temporarily unavailable',
+            headers={'Retry-After': '1'}
+        )
+
+    async def render(self, data: bytes, directory: Path) -> dict[str, tuple[int, int]]:
+        if not self._acquire():
+            IMAGE_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Too many image uploads, try again later',
+                headers={'Retry-After': '1'}
+            )
+
+        settings = get_settings()
+        started = perf_counter()
+        executor = self._executor
+        try:
+            future: Future = executor.submit(render_thumbnails, data, str(directory),
+                                             settings.image_quality, settings.image_max_pixels)
+        except BrokenProcessPool:
+            self._release(started)
+            raise self._broken(executor)
+        except BaseException:
+            self._release(started)
+            raise
+        future.add_done_callback(lambda _: self._release(started))
+        try:
+            return await wrap_future(future)
+        except UnsupportedImage as ex:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f'Unsupported or corrupted image: {ex}'
+            )
+        except BrokenProcessPool:
+            raise self._broken(executor)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_store = lazy(lambda: ImageStore(get_settings().image_root))
+image_processor = lazy(lambda: ImageProcessor(workers=get_settings().image_workers,
+                                              max_queue=get_settings().image_queue))
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    limit = get_settings().image_max_bytes
+    data = await file.read(limit + 1)
+    if len(data) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f'Image must not exceed {limit} bytes'
+        )
+    if not data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Empty file'
+        )
+    return data
+
+
+async def store_image(file: UploadFile) -> str:
+    """
+    Сохраняет миниатюры загруженного файла и возвращает его sha256
+    """
+    data = await read_upload(file)
+    # sha256 отпускает GIL на больших буферах, поток не блокирует event loop
+    digest = await to_thread(lambda: sha256(data).hexdigest())
+    if image_store.complete(digest):
+        IMAGE_UPLOADS.labels(result='deduplicated').inc()
+        return digest
+    await image_processor.render(data, image_store.directory(digest))
+    IMAGE_UPLOADS.labels(result='processed').inc()
+    return digest
+
+
+def image_urls(digest: str) -> dict[str, str]:
+    return {size: f'/products/images/{digest}/{size}' for size in THUMBNAIL_SIZES}
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from fastapi import Query, Request, status
+from fastapi.exceptions import HTTPException
+from sqlalchemy import Select
+from typing import Annotated, Literal
+
+from app.models.models import Product
+
+
+Sort = Literal['id', 'newest', 'price', '-price', '-rating']
+
+# ключи keyset-пагинации и направление; каждому варианту соответствует
+# частичный индекс (is_active and stock > 0) по этим колонкам
+SORTS: dict[str, tuple[tuple, bool]] = {
+    'id': ((Product.id,), False),
+    'newest': ((Product.id,), True),
+    'price': ((Product.price, Product.id), False),
+    '-price': ((Product.price, Product.id), True),
+    '-rating': ((Product.rating, Product.id), True),
+}
+
+# фильтр допустим только с сортировками, для которых есть индекс,
+# начинающийся с его колонки (или с category_id перед ней)
+FILTER_SORTS: dict[str, set[str]] = {
+    'price_min': {'price', '-price'},
+    'price_max': {'price', '-price'},
+    'rating_min': {'-rating'},
+    'supplier_id': {'id', 'newest'},
+}
+
+
+@dataclass
+class ProductFilters:
+
+    sort: Sort = 'id'
+    price_min: int | None = None
+    price_max: int | None = None
+    rating_min: float | None = None
+    category_id: list[int] | None = None
+    supplier_id: int | None = None
+    in_stock: bool = True
+
+    @property
+    def keys(self) -> tuple:
+        return SORTS[self.sort][0]
+
+    @property
+    def descending(self) -> bool:
+        return SORTS[self.sort][1]
+
+    def check(self, in_category: bool = False) -> None:
+        unsupported = [name for name, sorts in FILTER_SORTS.items()
+                       if getattr(self, name) is not None and self.sort not in sorts]
+        if not self.in_stock and (self.sort not in ('id', 'newest') or in_category
+                                  or self.category_id is not None or self.supplier_id is not None):
+            unsupported.append('in_stock')
+        if unsupported:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={'message': f'Filters are not supported with sort={self.sort}',
+                        'filters': unsupported,
+                        'supported': {name: sorted(sorts) for name, sorts in FILTER_SORTS.items()}}
+            )
+
+    def apply(self, stmt: Select, categories: list[int] | None = None) -> Select:
+        stmt = stmt.where(Product.is_active == True)
+        if self.in_stock:
+            stmt = stmt.where(Product.stock > 0)
+        if self.price_min is not None:
+            stmt = stmt.where(Product.price >= self.price_min)
+        if self.price_max is not None:
+            stmt = stmt.where(Product.price <= self.price_max)
+        if self.rating_min is not None:
+            stmt = stmt.where(Product.rating >= self.rating_min)
+        if self.supplier_id is not None:
+            stmt = stmt.where(Product.supplier_id == self.supplier_id)
+        if self.category_id is not None:
+            categories = [category for category in categories if category in self.category_id] \
+                if categories is not None else self.category_id
+        if categories is not None:
+            stmt = stmt.where(Product.category_id.in_(categories))
+        return stmt
+
+
+# параметры запроса списка товаров: фильтры, сортировка, страница и fields.
+# Опечатка в имени фильтра не должна молча возвращать весь список
+LISTING_PARAMS = {'sort', 'price_min', 'price_max', 'rating_min', 'category_id', 'supplier_id', 'in_stock',
+                  'limit', 'after', 'fields'}
+
+
+async def product_filters(
+    request: Request,
+    sort: Annotated[Sort, Query()] = 'id',
+    price_min: Annotated[int | None, Query(ge=0)] = None,
+    price_max: Annotated[int | None, Query(ge=0)] = None,
+    rating_min: Annotated[float | None, Query(ge=0, le=10)] = None,
+    category_id: Annotated[list[int] | None, Query(max_length=500)] = None,
+    supplier_id: Annotated[int | None, Query()] = None,
+    in_stock: Annotated[bool, Query()] = True
+) -> ProductFilters:
+    unknown = set(request.query_params) - LISTING_PARAMS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={'message': 'Unknown query parameters', 'params': sorted(unknown),
+                    'allowed': sorted(LISTING_PARAMS)}
+        )
+    return ProductFilters(sort=sort, price_min=price_min, price_max=price_max, rating_min=rating_min,
+                          category_id=category_id, supplier_id=supplier_id, in_stock=in_stock)
@@ -0,0 +1,134 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+import os
+import re
+
+
+CACHE_HITS = Counter('cache_hits_total', 'Cache lookups served from memory', ['cache'])
+CACHE_MISSES = Counter('cache_misses_total', 'Cache lookups that fell through', ['cache'])
+
+PASSWORD_HASH_SECONDS = Histogram(
+    'password_hash_seconds', 'Time spent in bcrypt per call', ['operation'],
+    buckets=(.05, .1, .2, .3, .4, .5, .75, 1, 2)
+)
+PASSWORD_HASH_QUEUE_WAIT_SECONDS = Histogram(
+    'password_hash_queue_wait_seconds', 'Time a bcrypt call waited for a pool thread',
+    buckets=(.001, .01, .05, .1, .25, .5, 1, 2, 5)
+)
+PASSWORD_HASH_PENDING = Gauge('password_hash_pending', 'bcrypt calls running or queued',
+                              multiprocess_mode='livesum')
+PASSWORD_HASH_REJECTED = Counter('password_hash_rejected_total', 'bcrypt calls rejected on a saturated pool')
+
+RESPONSE_CACHE_HITS = Counter('response_cache_hits_total', 'Responses served from the cache', ['route'])
+RESPONSE_CACHE_MISSES = Counter('response_cache_misses_total', 'Responses rendered on a cache miss', ['route'])
+
+DB_POOL_WAIT_SECONDS = Histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a pooled database connection',
+    buckets=(.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections currently checked out of the pool',
+                            multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge('db_pool_overflow', 'Connections open above pool_size', multiprocess_mode='livesum')
+DB_POOL_CONNECTION_AGE_SECONDS = Histogram(
+    'db_pool_connection_age_seconds', 'Age of pooled connections at checkout',
+    buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200, 14400)
+)
+
+DB_QUERY_SECONDS = Histogram(
+    'db_query_seconds', 'Duration of a single database statement',
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+
+ORDERS_RESERVED = Counter('orders_reserved_total', 'Checkouts that reserved stock')
+ORDERS_REJECTED = Counter('orders_rejected_total', 'Checkouts rejected for insufficient stock')
+ORDERS_RELEASED = Counter('orders_released_total', 'Reservations whose stock was returned', ['reason'])
+
+RATING_DIRTY_PRODUCTS = Gauge('rating_dirty_products', 'Products waiting for rating recomputation',
+                              multiprocess_mode='livesum')
+RATING_STALENESS_SECONDS = Histogram(
+    'rating_staleness_seconds', 'Time from a committed rating change to the recomputed product rating',
+    buckets=(.1, .25, .5, 1, 2, 5, 10, 30, 60, 300)
+)
+RATING_RECOMPUTED = Counter('rating_recomputed_products_total', 'Product ratings recomputed in the background')
+
+IMAGE_RENDER_SECONDS = Histogram(
+    'image_render_seconds', 'Time to decode, resize and encode an uploaded image in the process pool',
+    buckets=(.05, .1, .25, .5, 1, 2, 5, 10)
+)
+IMAGE_PENDING = Gauge('image_render_pending', 'Image renders running or queued', multiprocess_mode='livesum')
+IMAGE_REJECTED = Counter('image_render_rejected_total', 'Image uploads rejected on a saturated pool')
+IMAGE_UPLOADS = Counter('image_uploads_total', 'Accepted image uploads', ['result'])
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route'],
+    buckets=(.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10)
+)
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP responses by status code', ['method', 'route', 'status'])
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being processed', multiprocess_mode='livesum')
+HTTP_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database statements executed per HTTP request', ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50)
+)
+HTTP_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Total database time per HTTP request', ['route'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+
+ACCESS_LOG_DROPPED = Counter('access_log_dropped_total', 'Access log lines dropped because the queue was full')
+
+
+LIVE_GAUGE_FILE = re.compile(r'gauge_live\w+_(\d+)\.db')
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def mark_dead_workers() -> None:
+    """
+    Удаляет livesum-гаужи завершившихся воркеров: иначе упавший воркер навсегда
+    оставляет в сумме свои соединения, запросы в работе и очереди.
+    Под gunicorn то же делает child_exit в app/gunicorn_conf.py, под uvicorn
+    --workers - этот обход при старте воркера и при каждом чтении /metrics
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not directory:
+        return
+    pids = {int(match.group(1)) for path in Path(directory).glob('gauge_live*.db')
+            if (match := LIVE_GAUGE_FILE.fullmatch(path.name))}
+    for pid in pids:
+        if not process_alive(pid):
+            multiprocess.mark_process_dead(pid, directory)
+
+
+def render_metrics() -> bytes:
+    """
+    При нескольких воркерах (PROMETHEUS_MULTIPROC_DIR задан) метрики
+    собираются из файлов всех процессов, иначе - из реестра текущего процесса
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        mark_dead_workers()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+@dataclass
+class RequestStats:
+
+    db_queries: int = 0
+    db_time: float = 0.0
+    pool_wait: float = 0.0
+    user_id: int | None = None
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar('request_stats', default=None)
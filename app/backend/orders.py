@@ -0,0 +1,178 @@
+from datetime import timedelta
+from fastapi import status
+from fastapi.exceptions import HTTPException
+from loguru import logger
+from sqlalchemy import DateTime, Integer, Update, select, update, values, column, func, cast, case, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+
+from app.backend.cache import response_cache
+from app.backend.db import AsyncSession as Session
+from app.backend.metrics import ORDERS_RESERVED, ORDERS_REJECTED, ORDERS_RELEASED
+from app.backend.settings import get_settings
+from app.models.models import Order, OrderItem, Product
+from app.schemas.schemas import CartLine, UserPrincipal
+
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def db_now(dialect: str, seconds: int = 0):
+    """
+    Время по часам базы через seconds секунд: сроки резервов задаются и сравниваются
+    одними часами, даже если часы воркеров расходятся с базой и между собой.
+    В sqlite время - текст ISO, CAST AS DATETIME превратил бы его в число,
+    а сдвиг делает strftime
+    """
+    if dialect == 'sqlite':
+        return type_coerce(func.strftime('%Y-%m-%d %H:%M:%f', func.clock_timestamp(), f'+{seconds} seconds'), DateTime)
+    now = cast(func.clock_timestamp(), DateTime)
+    return now + timedelta(seconds=seconds) if seconds else now
+
+
+async def reserve(db: AsyncSession, user: UserPrincipal, lines: list[CartLine]) -> Order:
+    """
+    Резервирование всей корзины одним условным UPDATE ... FROM (VALUES ...):
+    остаток уменьшается только там, где stock >= quantity, без чтения
+    остатков заранее. Если зарезервировались не все строки, транзакция
+    откатывается целиком. Блокировки строк держатся только до commit.
+    Срок резерва считает база в том же UPDATE. sqlite не поддерживает имена
+    колонок у VALUES - там количество берется CASE по id
+    """
+    quantities: dict[int, int] = {}
+    for line in lines:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+
+    dialect = db.bind.dialect.name
+    if dialect == 'postgresql':
+        v = values(column('id', Integer), column('quantity', Integer), name='v')\
+            .data(sorted(quantities.items()))
+        matches, quantity = Product.id == v.c.id, v.c.quantity
+    else:
+        matches, quantity = Product.id.in_(sorted(quantities)), case(quantities, value=Product.id)
+    expires_at = db_now(dialect, get_settings().order_reservation_ttl)
+    reserved = (await db.execute(
+        update(Product)
+        .where(matches)
+        .where(Product.is_active == True)
+        .where(Product.stock >= quantity)
+        .values(stock=Product.stock - quantity, version=Product.version + 1)
+        .returning(Product.id, Product.price, expires_at.label('expires_at'))
+        .execution_options(synchronize_session=False)
+    )).all()
+
+    if len(reserved) < len(quantities):
+        await db.rollback()
+        ORDERS_REJECTED.inc()
+        available = {row.id for row in reserved}
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={'message': 'Not enough stock',
+                    'products': [product_id for product_id in quantities if product_id not in available]}
+        )
+
+    prices = {row.id: row.price for row in reserved}
+    order = Order(
+        user_id=user.id,
+        status='reserved',
+        total=sum(prices[product_id] * quantity for product_id, quantity in quantities.items()),
+        expires_at=reserved[0].expires_at,
+        items=[OrderItem(product_id=product_id, quantity=quantity, price=prices[product_id])
+               for product_id, quantity in quantities.items()]
+    )
+    db.add(order)
+    await db.commit()
+    ORDERS_RESERVED.inc()
+    await response_cache.invalidate(*(f'product:{product_id}' for product_id in quantities))
+    return order
+
+
+async def release(db: AsyncSession, claim: Update, reason: str) -> list[int]:
+    """
+    Возврат остатков по заказам, которые claim перевел из reserved в другой
+    статус. Условие на статус в claim гарантирует, что каждый резерв
+    возвращается ровно один раз, даже при нескольких воркерах
+    """
+    order_ids = (await db.scalars(claim.returning(Order.id))).all()
+    if not order_ids:
+        await db.rollback()
+        return []
+
+    totals = (
+        select(OrderItem.product_id, func.sum(OrderItem.quantity).label('quantity'))
+        .where(OrderItem.order_id.in_(order_ids))
+        .group_by(OrderItem.product_id)
+        .subquery()
+    )
+    product_ids = (await db.scalars(
+        update(Product)
+        .where(Product.id == totals.c.product_id)
+        .values(stock=Product.stock + totals.c.quantity, version=Product.version + 1)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    ORDERS_RELEASED.labels(reason).inc(len(order_ids))
+    await response_cache.invalidate(*(f'product:{product_id}' for product_id in product_ids))
+    return list(order_ids)
+
+
+async def cancel(db: AsyncSession, order: Order) -> bool:
+    claim = (
+        update(Order)
+        .where(Order.id == order.id)
+        .where(Order.status == 'reserved')
+        .values(status='cancelled')
+        .execution_options(synchronize_session=False)
+    )
+    return bool(await release(db, claim, 'cancelled'))
+
+
+async def pay(db: AsyncSession, order: Order) -> bool:
+    paid = await db.scalar(
+        update(Order)
+        .where(Order.id == order.id)
+        .where(Order.status == 'reserved')
+        .where(Order.expires_at > db_now(db.bind.dialect.name))
+        .values(status='paid')
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return paid is not None
+
+
+async def release_expired(db: AsyncSession, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    released = 0
+    while True:
+        expired = (
+            select(Order.id)
+            .where(Order.status == 'reserved')
+            .where(Order.expires_at <= db_now(db.bind.dialect.name))
+            .limit(batch_size)
+        )
+        claim = (
+            update(Order)
+            .where(Order.id.in_(expired))
+            .where(Order.status == 'reserved')
+            .values(status='expired')
+            .execution_options(synchronize_session=False)
+        )
+        order_ids = await release(db, claim, 'expired')
+        released += len(order_ids)
+        if len(order_ids) < batch_size:
+            return released
+
+
+async def sweep_reservations() -> None:
+    """
+    Фоновая задача воркера: периодически возвращает остатки просроченных резервов
+    """
+    interval = get_settings().order_sweep_interval
+    while True:
+        try:
+            async with Session() as db:
+                await release_expired(db)
+        except Exception:
+            logger.exception('Failed to release expired reservations')
+        await asyncio.sleep(interval)
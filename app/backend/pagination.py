@@ -0,0 +1,82 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from dataclasses import dataclass
+from fastapi import Query, status
+from fastapi.exceptions import HTTPException
+from sqlalchemy import Select, tuple_
+from typing import Annotated, Any
+import orjson
+
+
+def encode_cursor(values: list[Any]) -> str:
+    return urlsafe_b64encode(orjson.dumps(values)).decode().rstrip('=')
+
+
+def key_types(key) -> tuple[type, ...]:
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        # у ранга поиска нет типа SQLAlchemy - это число
+        return int, float
+    return (int, float) if python_type is float else (python_type,)
+
+
+def decode_cursor(cursor: str, keys: tuple) -> list[Any]:
+    """
+    Значения курсора для keys: число и типы значений должны совпасть
+    с колонками сортировки, иначе поддельный курсор попал бы в WHERE
+    """
+    try:
+        values = orjson.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (DecodeError, ValueError):
+        values = None
+    if not (isinstance(values, list) and len(values) == len(keys)
+            and all(isinstance(value, key_types(key)) and not isinstance(value, bool)
+                    for value, key in zip(values, keys))):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor'
+        )
+    return values
+
+
+@dataclass
+class Page:
+
+    limit: int | None
+    after: str | None = None
+
+
+async def page_params(
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    after: Annotated[str | None, Query()] = None
+) -> Page:
+    return Page(limit=limit, after=after)
+
+
+def paginate(stmt: Select, page: Page, keys: tuple, descending: bool = False) -> Select:
+    """
+    Keyset-пагинация: keys - колонки сортировки, последней всегда идет id.
+    Следующая страница начинается строго после значений из курсора, поэтому
+    стоимость любой страницы равна стоимости первой при наличии индекса по keys
+    """
+    if page.after is not None:
+        values = decode_cursor(page.after, keys)
+        row_value = tuple_(*keys)
+        stmt = stmt.where(row_value < tuple_(*values) if descending else row_value > tuple_(*values))
+    order = [key.desc() for key in keys] if descending else list(keys)
+    stmt = stmt.order_by(*order)
+    if page.limit is None:
+        return stmt
+    return stmt.limit(page.limit + 1)
+
+
+def page_result(items: list[dict[str, Any]], page: Page, keys: tuple) -> dict[str, Any]:
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        next_cursor = encode_cursor([items[-1][key.key] for key in keys])
+    return {
+        'items': items,
+        'next_cursor': next_cursor
+    }
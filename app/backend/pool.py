@@ -0,0 +1,101 @@
+from asyncio import gather
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from time import monotonic, perf_counter
+from typing import Any
+
+from app.backend.metrics import (
+    DB_POOL_WAIT_SECONDS,
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_OVERFLOW,
+    DB_POOL_CONNECTION_AGE_SECONDS,
+    DB_QUERY_SECONDS,
+    request_stats
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, замеряющий ожидание свободного соединения: в гистограмму
+    и в статистику текущего запроса
+    """
+
+    def connect(self):
+        started = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            waited = perf_counter() - started
+            DB_POOL_WAIT_SECONDS.observe(waited)
+            stats = request_stats.get()
+            if stats is not None:
+                stats.pool_wait += waited
+
+
+def instrument_pool(engine: AsyncEngine) -> None:
+    pool = engine.sync_engine.pool
+
+    @event.listens_for(pool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        connection_record.info['connected_at'] = monotonic()
+
+    @event.listens_for(pool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.inc()
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+        connected_at = connection_record.info.get('connected_at')
+        if connected_at is not None:
+            DB_POOL_CONNECTION_AGE_SECONDS.observe(monotonic() - connected_at)
+
+    @event.listens_for(pool, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.dec()
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """
+    Время и количество SQL-запросов: в гистограмму и в статистику текущего запроса.
+    Считается каждый отправленный в базу запрос, включая выполненные при flush
+    и завершившиеся ошибкой
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(perf_counter())
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info['query_started'].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_time += elapsed
+
+
+async def warmup_pool(engine: AsyncEngine, connections: int) -> None:
+    """
+    Открывает соединения заранее, чтобы первые запросы после старта
+    воркера не платили за установку соединения
+    """
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text('select 1'))
+
+    await gather(*(ping() for _ in range(connections)))
+
+
+def pool_status(engine: AsyncEngine) -> dict[str, Any]:
+    pool = engine.sync_engine.pool
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'timeout': pool.timeout()
+    }
@@ -0,0 +1,44 @@
+"""
+Celery-задачи обновления рейтингов (RATING_WORKER=celery).
+
+    celery -A app.backend.rating_tasks worker
+"""
+from celery import Celery
+from sqlalchemy import URL
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+import asyncio
+
+from app.backend.ratings import RatingsNotApplied, recompute_ratings
+from app.backend.settings import get_settings
+
+
+# memory:// - локальная замена брокера: задачи выполняются сразу в вызывающем потоке,
+# а их исключения доходят до RatingWorker, который вернет непересчитанные продукты в очередь
+celery_app = Celery('ecommerce', broker=get_settings().celery_broker_url)
+celery_app.conf.task_always_eager = celery_app.conf.broker_url.startswith('memory://')
+celery_app.conf.task_eager_propagates = True
+
+
+@celery_app.task(name='ratings.recompute', bind=True, max_retries=5)
+def recompute_ratings_task(self, product_ids: list[int], marked_at: float) -> None:
+    """
+    Celery-воркер работает вне event loop приложения, поэтому у задачи свой
+    движок без пула: соединения не переживают asyncio.run. С отдельным
+    воркером кэш ответов приложения обновится по TTL. Повтор получает только
+    непересчитанные продукты
+    """
+    async def run():
+        engine = create_async_engine(URL.create(**get_settings().connect_args), poolclass=NullPool)
+        try:
+            await recompute_ratings(async_sessionmaker(bind=engine, expire_on_commit=False),
+                                    product_ids, marked_at)
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(run())
+    except RatingsNotApplied as ex:
+        if self.request.is_eager:
+            raise
+        raise self.retry(args=(ex.product_ids, marked_at), exc=ex, countdown=2 ** self.request.retries)
@@ -0,0 +1,130 @@
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+from time import time
+from typing import Iterable
+import asyncio
+
+from app.backend.cache import response_cache
+from app.backend.db import AsyncSession
+from app.backend.metrics import RATING_DIRTY_PRODUCTS, RATING_STALENESS_SECONDS, RATING_RECOMPUTED
+from app.backend.settings import get_settings, lazy
+from app.models.models import rebuild_ratings_stmt
+
+
+class RatingsNotApplied(Exception):
+    """
+    Продукты, чей рейтинг не пересчитан: пересчет идемпотентен,
+    поэтому их можно повторить целиком
+    """
+
+    def __init__(self, product_ids: list[int]):
+        super().__init__(f'{len(product_ids)} product ratings not recomputed')
+        self.product_ids = product_ids
+
+
+async def recompute_ratings(session_factory: async_sessionmaker, product_ids: list[int], marked_at: float) -> None:
+    batch_size = get_settings().rating_batch_size
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        try:
+            async with session_factory() as db:
+                await db.execute(rebuild_ratings_stmt(batch).execution_options(synchronize_session=False))
+                await db.commit()
+        except Exception as ex:
+            raise RatingsNotApplied(product_ids[start:]) from ex
+        RATING_RECOMPUTED.inc(len(batch))
+        await response_cache.invalidate(*(f'product:{product_id}' for product_id in batch))
+    RATING_STALENESS_SECONDS.observe(time() - marked_at)
+
+
+class RatingWorker:
+    """
+    Отложенное обновление рейтингов: продукты с закоммиченными изменениями
+    оценок копятся window секунд, затем их счетчики пересчитываются по таблице
+    ratings одним UPDATE на пачку (rebuild_ratings_stmt). Всплеск отзывов
+    к одному продукту превращается в один пересчет. В памяти хранятся только
+    id продуктов: повтор после неясного исхода commit ничего не задвоит,
+    а если воркер упал до пересчета, рейтинг лишь отстанет до следующей
+    оценки продукта или app.scripts.rebuild_ratings
+    """
+
+    def __init__(self, mode: str, window: float):
+        self.mode = mode
+        self.window = window
+        self._dirty: set[int] = set()
+        self._marked_at: float | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def mark(self, product_ids: Iterable[int]) -> None:
+        if self._marked_at is None:
+            self._marked_at = time()
+        self._dirty.update(product_ids)
+        RATING_DIRTY_PRODUCTS.set(len(self._dirty))
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        product_ids = sorted(self._dirty)
+        marked_at = self._marked_at
+        self._dirty, self._marked_at = set(), None
+        self._wakeup.clear()
+        RATING_DIRTY_PRODUCTS.set(0)
+        if not product_ids:
+            return
+        try:
+            if self.mode == 'celery':
+                await self._send(product_ids, marked_at)
+            else:
+                await recompute_ratings(AsyncSession, product_ids, marked_at)
+        except RatingsNotApplied as ex:
+            # непересчитанные продукты вернутся в очередь до следующей попытки
+            self.mark(ex.product_ids)
+            self._marked_at = min(self._marked_at, marked_at)
+            raise
+
+    @staticmethod
+    async def _send(product_ids: list[int], marked_at: float) -> None:
+        # celery импортируется только в этом режиме
+        from app.backend.rating_tasks import recompute_ratings_task
+        from kombu.exceptions import OperationalError
+        try:
+            await asyncio.to_thread(recompute_ratings_task.delay, product_ids, marked_at)
+        except OperationalError as ex:
+            # брокер недоступен: задача не отправлена
+            raise RatingsNotApplied(product_ids) from ex
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Failed to recompute product ratings')
+
+
+rating_worker = lazy(lambda: RatingWorker(mode=get_settings().rating_worker,
+                                          window=get_settings().rating_coalesce_window))
+
+
+@event.listens_for(Session, 'after_commit')
+def schedule_rating_recompute(session: Session):
+    product_ids = session.info.pop('rating_dirty', None)
+    if product_ids:
+        rating_worker.mark(product_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_rating_dirty(session: Session):
+    session.info.pop('rating_dirty', None)
@@ -0,0 +1,48 @@
+from sqlalchemy import Select, select, func, table, column, literal_column, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Product
+
+
+def search_document():
+    """
+    Выражение tsvector, по которому построен GIN-индекс. Конфигурация и разделитель
+    подставляются литералами: с параметрами планировщик не сопоставит запрос с индексом
+    """
+    return func.to_tsvector(literal_column("'simple'"),
+                            Product.name + literal_column("' '") + Product.description)
+
+
+fts_table = table('products_fts', column('rowid'), column('rank'), schema=Product.__table__.schema)
+
+
+def fts5_query(q: str) -> str:
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+def search_stmt(db: AsyncSession, q: str, columns: tuple | None = None) -> tuple[Select, tuple]:
+    """
+    Запрос поиска по name и description с ранжированием. Возвращает запрос
+    и ключи keyset-пагинации (rank, id), сортировка по убыванию.
+    columns - выбираемые колонки Product, по умолчанию все (id обязателен)
+    """
+    columns = columns or Product.columns()
+    filters = and_(Product.is_active == True, Product.stock > 0)
+    if db.bind.dialect.name == 'sqlite':
+        ranked = (
+            select(*columns, (-fts_table.c.rank).label('rank'))
+            .join(fts_table, fts_table.c.rowid == Product.id)
+            .where(literal_column('products_fts').op('MATCH')(fts5_query(q)))
+            .where(filters)
+            .subquery()
+        )
+    else:
+        query = func.websearch_to_tsquery(literal_column("'simple'"), q)
+        document = search_document()
+        ranked = (
+            select(*columns, func.ts_rank_cd(document, query).label('rank'))
+            .where(document.op('@@')(query))
+            .where(filters)
+            .subquery()
+        )
+    return select(*ranked.c), (ranked.c.rank, ranked.c.id)
@@ -0,0 +1,211 @@
+from dataclasses import dataclass, field
+from environs import Env
+from typing import Any, Callable, Generic, TypeVar
+
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Настройки приложения из окружения и .env. Читаются один раз при первом
+    обращении к get_settings(), а не при импорте модулей
+    """
+
+    db_language: str
+    db_driver: str
+    db_username: str
+    db_password: str
+    db_host: str
+    db_port: str
+    db_database: str
+    secret_key: str
+    expires: int
+    algorithm: str
+
+    db_read: dict[str, str] = field(default_factory=dict)
+    db_read_your_writes: int = 5
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    db_pool_warmup: int | None = None
+
+    password_hash_workers: int = 2
+    password_hash_queue: int = 32
+    user_cache_size: int = 10000
+    # кэш пользователей локален для воркера: смена роли или удаление сбрасывают
+    # запись только в обработавшем запрос воркере, остальные видят прежние права
+    # до user_cache_ttl секунд. Должен быть больше отставания реплики
+    # (db_read_your_writes), иначе промах загрузит с реплики старую строку
+    user_cache_ttl: float = 15
+    auth_stateless: bool = False
+    auth_stateless_max_age: int = 30
+
+    response_cache_size: int = 10000
+    response_cache_ttl: float = 30
+    category_tree_ttl: float = 30
+
+    order_reservation_ttl: int = 900
+    order_sweep_interval: float = 30
+
+    rating_worker: str = 'inprocess'
+    rating_coalesce_window: float = 0.5
+    rating_batch_size: int = 500
+    celery_broker_url: str = 'memory://'
+
+    access_log_sample_rate: float = 1.0
+    access_log_slow_ms: float = 500
+    access_log_sink: str = 'stdout'
+    access_log_batch_size: int = 256
+    access_log_flush_interval: float = 0.5
+    access_log_queue_size: int = 10000
+
+    image_root: str = 'media/images'
+    image_workers: int = 2
+    image_queue: int = 8
+    image_max_bytes: int = 10 * 1024 * 1024
+    image_max_pixels: int = 40_000_000
+    image_quality: int = 80
+    image_accel_redirect: bool = False
+
+    @property
+    def connect_args(self) -> dict[str, str]:
+        return {
+            'drivername': f'{self.db_language}+{self.db_driver}',
+            'username': self.db_username,
+            'password': self.db_password,
+            'host': self.db_host,
+            'port': self.db_port,
+            'database': self.db_database
+        }
+
+    @property
+    def read_connect_args(self) -> dict[str, str]:
+        return self.connect_args | self.db_read
+
+    @property
+    def pool_args(self) -> dict[str, int | float | bool]:
+        return {
+            'pool_size': self.db_pool_size,
+            'max_overflow': self.db_max_overflow,
+            'pool_timeout': self.db_pool_timeout,
+            'pool_recycle': self.db_pool_recycle,
+            'pool_pre_ping': self.db_pool_pre_ping
+        }
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        env = Env()
+        env.read_env()
+        # реплика для чтения: любой заданный DB_READ_* включает отдельный движок,
+        # незаданные параметры берутся у основной базы
+        db_read = {key: env(f'DB_READ_{key.upper()}', None)
+                   for key in ('username', 'password', 'host', 'port', 'database')}
+        return cls(
+            db_language=env('DB_LANGUAGE'),
+            db_driver=env('DB_DRIVER'),
+            db_username=env('DB_USERNAME'),
+            db_password=env('DB_PASSWORD'),
+            db_host=env('DB_HOST'),
+            db_port=env('DB_PORT'),
+            db_database=env('DB_DATABASE'),
+            secret_key=env('SECRET_KEY'),
+            expires=env.int('EXPIRES'),
+            algorithm=env('ALGORITHM'),
+            db_read={key: value for key, value in db_read.items() if value is not None},
+            db_read_your_writes=env.int('DB_READ_YOUR_WRITES_SECONDS', 5),
+            db_pool_size=env.int('DB_POOL_SIZE', 5),
+            db_max_overflow=env.int('DB_MAX_OVERFLOW', 10),
+            db_pool_timeout=env.float('DB_POOL_TIMEOUT', 30),
+            db_pool_recycle=env.int('DB_POOL_RECYCLE', -1),
+            db_pool_pre_ping=env.bool('DB_POOL_PRE_PING', False),
+            db_pool_warmup=env.int('DB_POOL_WARMUP', None),
+            password_hash_workers=env.int('PASSWORD_HASH_WORKERS', 2),
+            password_hash_queue=env.int('PASSWORD_HASH_QUEUE', 32),
+            user_cache_size=env.int('USER_CACHE_SIZE', 10000),
+            user_cache_ttl=env.float('USER_CACHE_TTL', 15),
+            auth_stateless=env.bool('AUTH_STATELESS', False),
+            auth_stateless_max_age=env.int('AUTH_STATELESS_MAX_AGE', 30),
+            response_cache_size=env.int('RESPONSE_CACHE_SIZE', 10000),
+            response_cache_ttl=env.float('RESPONSE_CACHE_TTL', 30),
+            category_tree_ttl=env.float('CATEGORY_TREE_TTL', 30),
+            order_reservation_ttl=env.int('ORDER_RESERVATION_TTL', 900),
+            order_sweep_interval=env.float('ORDER_SWEEP_INTERVAL', 30),
+            rating_worker=env('RATING_WORKER', 'inprocess'),
+            rating_coalesce_window=env.float('RATING_COALESCE_WINDOW', 0.5),
+            rating_batch_size=env.int('RATING_BATCH_SIZE', 500),
+            celery_broker_url=env('CELERY_BROKER_URL', 'memory://'),
+            access_log_sample_rate=env.float('ACCESS_LOG_SAMPLE_RATE', 1.0),
+            access_log_slow_ms=env.float('ACCESS_LOG_SLOW_MS', 500),
+            access_log_sink=env('ACCESS_LOG_SINK', 'stdout'),
+            access_log_batch_size=env.int('ACCESS_LOG_BATCH_SIZE', 256),
+            access_log_flush_interval=env.float('ACCESS_LOG_FLUSH_INTERVAL', 0.5),
+            access_log_queue_size=env.int('ACCESS_LOG_QUEUE_SIZE', 10000),
+            image_root=env('IMAGE_ROOT', 'media/images'),
+            image_workers=env.int('IMAGE_WORKERS', 2),
+            image_queue=env.int('IMAGE_QUEUE', 8),
+            image_max_bytes=env.int('IMAGE_MAX_BYTES', 10 * 1024 * 1024),
+            image_max_pixels=env.int('IMAGE_MAX_PIXELS', 40_000_000),
+            image_quality=env.int('IMAGE_QUALITY', 80),
+            image_accel_redirect=env.bool('IMAGE_ACCEL_REDIRECT', False)
+        )
+
+
+_settings: list[Settings] = []
+_resets: list[Callable[[], None]] = []
+
+
+def get_settings() -> Settings:
+    if not _settings:
+        _settings.append(Settings.from_env())
+    return _settings[0]
+
+
+def on_settings_change(reset: Callable[[], None]) -> Callable[[], None]:
+    """
+    Регистрирует сброс состояния, построенного по настройкам (движки, синглтоны)
+    """
+    _resets.append(reset)
+    return reset
+
+
+def use_settings(settings: Settings) -> None:
+    """
+    Подменяет настройки (тесты, create_app(settings)) и сбрасывает все, что было
+    построено по прежним: движки и lazy-синглтоны создадутся заново при первом
+    обращении. Движки прежних настроек нужно закрыть до вызова (dispose_engines)
+    """
+    _settings[:] = [settings]
+    for reset in _resets:
+        reset()
+
+
+class Lazy(Generic[T]):
+    """
+    Модульный синглтон, создаваемый при первом обращении к атрибуту:
+    импорт модуля не читает настройки и не открывает ресурсы.
+    close освобождает ресурсы прежнего экземпляра при смене настроек
+    """
+
+    def __init__(self, factory: Callable[[], T], close: Callable[[T], None] | None = None):
+        self._factory = factory
+        self._close = close
+        self._instance: T | None = None
+        on_settings_change(self._reset)
+
+    def _reset(self) -> None:
+        instance, self._instance = self._instance, None
+        if instance is not None and self._close is not None:
+            self._close(instance)
+
+    def __getattr__(self, name: str) -> Any:
+        if self._instance is None:
+            self._instance = self._factory()
+        return getattr(self._instance, name)
+
+
+def lazy(factory: Callable[[], T], close: Callable[[T], None] | None = None) -> T:
+    return Lazy(factory, close)  # type: ignore[return-value]
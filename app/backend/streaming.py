@@ -0,0 +1,31 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+import orjson
+
+from app.backend.db import session_factory
+
+
+NDJSON = 'application/x-ndjson'
+
+
+async def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get('accept', '')
+
+
+def ndjson_response(stmt: Select, batch_size: int = 1000) -> StreamingResponse:
+    """
+    Потоковая выдача строк в формате NDJSON через серверный курсор.
+    stmt выбирает колонки, а не сущности: строки уходят в orjson без ORM.
+    Сессия открывается внутри генератора: зависимости с yield закрываются
+    до отправки тела ответа, поэтому get_session здесь не подходит
+    """
+    factory = session_factory()
+
+    async def rows():
+        async with factory() as session:
+            result = await session.stream(stmt.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                yield b''.join(orjson.dumps(row._asdict()) + b'\n' for row in partition)
+
+    return StreamingResponse(rows(), media_type=NDJSON)
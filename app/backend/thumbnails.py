@@ -0,0 +1,58 @@
+"""
+Декодирование и уменьшение изображений. Модуль выполняется в процессах
+ImageProcessor и поэтому не импортирует ничего из приложения, кроме Pillow
+"""
+from io import BytesIO
+from PIL import Image, ImageOps
+import os
+
+
+# имя размера -> максимальная сторона в пикселях, от большего к меньшему
+THUMBNAIL_SIZES: dict[str, int] = {'large': 1200, 'medium': 480, 'small': 160}
+THUMBNAIL_FORMAT = 'webp'
+
+
+class UnsupportedImage(Exception):
+    """
+    Файл не декодируется как изображение или слишком велик
+    """
+
+
+def decode_image(data: bytes, max_pixels: int) -> Image.Image:
+    """
+    Декодирует файл целиком в памяти, JPEG - сразу в уменьшенном масштабе (draft).
+    Чтение идет из BytesIO, поэтому OSError здесь - поврежденные данные, а не диск
+    """
+    try:
+        with Image.open(BytesIO(data)) as source:
+            if source.width * source.height > max_pixels:
+                raise UnsupportedImage(f'Image is larger than {max_pixels} pixels')
+            largest = max(THUMBNAIL_SIZES.values())
+            source.draft('RGB', (largest, largest))
+            source.load()
+            image = ImageOps.exif_transpose(source)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+            return image
+    except (OSError, Image.DecompressionBombError) as ex:
+        raise UnsupportedImage(str(ex)) from ex
+
+
+def render_thumbnails(data: bytes, directory: str, quality: int, max_pixels: int) -> dict[str, tuple[int, int]]:
+    """
+    Пишет в directory по файлу на каждый размер и возвращает их размеры.
+    Каждый следующий размер уменьшается на месте из предыдущего. Файлы
+    появляются атомарно через os.replace, поэтому параллельная загрузка той же
+    картинки безопасна. Ошибки записи на диск не перехватываются
+    """
+    image = decode_image(data, max_pixels)
+    os.makedirs(directory, exist_ok=True)
+    sizes = {}
+    for name, side in THUMBNAIL_SIZES.items():
+        image.thumbnail((side, side), Image.Resampling.LANCZOS)
+        path = os.path.join(directory, f'{name}.{THUMBNAIL_FORMAT}')
+        temporary = f'{path}.{os.getpid()}.tmp'
+        image.save(temporary, THUMBNAIL_FORMAT, quality=quality)
+        os.replace(temporary, path)
+        sizes[name] = image.size
+    return sizes
@@ -0,0 +1,49 @@
+from sqlalchemy import Select, select, and_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.backend.category_tree import category_tree
+from app.backend.db import ReadSession
+from app.backend.listing import ProductFilters
+from app.backend.pagination import Page, paginate
+from app.models.models import Category, Product, Review, User
+
+
+def hot_statements() -> list[Select]:
+    """
+    Запросы горячих маршрутов в том же виде, в каком их строят обработчики:
+    ключ кэша компиляции SQLAlchemy не зависит от значений параметров
+    """
+    filters = ProductFilters()
+    listing = filters.apply(select(*Product.columns()))
+    by_category = filters.apply(select(*Product.columns()), [0])
+    versions = filters.apply(select(Product.id, Product.version))
+    return [
+        paginate(versions, Page(limit=1), filters.keys, filters.descending),
+        paginate(listing, Page(limit=1), filters.keys, filters.descending),
+        paginate(by_category, Page(limit=1), filters.keys, filters.descending),
+        select(Product.id, Product.version).where(Product.slug == ''),
+        select(*Product.columns()).where(Product.id == 0),
+        select(Product).where(Product.slug == ''),
+        select(Category).where(Category.slug == ''),
+        select(Category.id, Category.version).where(Category.is_active == True).order_by(Category.id),
+        select(*Category.columns()).where(Category.is_active == True).order_by(Category.id),
+        select(*Review.columns()).where(and_(Review.product_id == 0, Review.is_active == True)),
+        select(User).where(and_(User.id == 0, User.is_active == True)),
+    ]
+
+
+async def compile_statements(session_factory: async_sessionmaker) -> int:
+    """
+    Выполняет горячие запросы один раз, чтобы их компиляция попала в кэш
+    движка до первого пользовательского запроса
+    """
+    statements = hot_statements()
+    async with session_factory() as db:
+        for stmt in statements:
+            await db.execute(stmt)
+    return len(statements)
+
+
+async def prime_caches() -> None:
+    async with ReadSession() as db:
+        await category_tree.load(db)
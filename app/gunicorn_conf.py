@@ -0,0 +1,9 @@
+"""
+Настройки gunicorn: gunicorn app.main:app --config python:app.gunicorn_conf
+"""
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # livesum-гаужи завершившегося воркера не должны оставаться в сумме
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,14 +1,74 @@
+from app.backend.db import AsyncSession, ReadSession, get_engine, get_read_engine, dispose_engines
+from app.backend.etag import stale_data_handler
+from app.backend.images import image_processor
+from app.backend.metrics import mark_dead_workers
+from app.backend.orders import sweep_reservations
+from app.backend.pool import warmup_pool
+from app.backend.ratings import rating_worker
+from app.backend.settings import Settings, get_settings, use_settings
+from app.backend.warmup import compile_statements, prime_caches
 from app.middleware.log import log_middleware
+from app.middleware.metrics import metrics_middleware
+from app.middleware.replica import replica_middleware
 from app.models.models import Base
-from app.routers import category, products, auth, reviews
+from app.routers import category, products, auth, reviews, orders, service
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, BackgroundTasks
+from loguru import logger
+from sqlalchemy.orm.exc import StaleDataError
+import asyncio
 import time
 import uvicorn
 
 
-app = FastAPI()
-app.include_router(category.router)
-app.include_router(products.router)
-app.include_router(auth.router)
-app.include_router(reviews.router)
-app.middleware('http')(log_middleware)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # воркер сообщает о готовности только после выхода из этого блока:
+    # соединения открыты, кэши заполнены, горячие запросы скомпилированы
+    started = time.perf_counter()
+    mark_dead_workers()
+    settings = get_settings()
+    connections = settings.db_pool_warmup or settings.db_pool_size
+    await warmup_pool(get_engine(), connections)
+    if get_read_engine() is not get_engine():
+        await warmup_pool(get_read_engine(), connections)
+    await prime_caches()
+    compiled = await compile_statements(AsyncSession)
+    if get_read_engine() is not get_engine():
+        await compile_statements(ReadSession)
+    logger.info(f'Ready in {time.perf_counter() - started:.3f}s: {connections} connections, {compiled} statements')
+    sweeper = asyncio.create_task(sweep_reservations())
+    rating_worker.start()
+    yield
+    sweeper.cancel()
+    # сборщик может быть посреди транзакции: движки закрываются после его выхода
+    with suppress(asyncio.CancelledError):
+        await sweeper
+    await rating_worker.stop()
+    image_processor.shutdown()
+    await dispose_engines()
+
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    """
+    Фабрика приложения: uvicorn --factory app.main:create_app.
+    Настройки читаются из окружения при первом обращении, если не переданы явно
+    """
+    if settings is not None:
+        use_settings(settings)
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(category.router)
+    app.include_router(products.router)
+    app.include_router(auth.router)
+    app.include_router(reviews.router)
+    app.include_router(orders.router)
+    app.include_router(service.router)
+    app.include_router(service.metrics_router)
+    app.middleware('http')(replica_middleware)
+    app.middleware('http')(log_middleware)
+    app.middleware('http')(metrics_middleware)
+    app.add_exception_handler(StaleDataError, stale_data_handler)
+    return app
+
+
+app = create_app()
@@ -1,28 +1,126 @@
+from datetime import datetime, timezone
 from loguru import logger
-from uuid import uuid4
 from fastapi import Request
 from fastapi.responses import ORJSONResponse
+from queue import Queue, Empty, Full
+from threading import Thread
+from time import monotonic, perf_counter
+import atexit
+import orjson
+import random
+import sys
 
+from app.backend.metrics import ACCESS_LOG_DROPPED, request_stats
+from app.backend.settings import get_settings, lazy
+from app.middleware.metrics import route_template
 
-logger.add(
-    "C:/Users/Гера/Desktop/py/FastAPI/ecommerce/info.log",
-    format="Log: [{extra[log_id]}:{time} - {level} - {message}]",
-    level="INFO",
-    rotation="1 MB",
-    enqueue=True
-)
 
+class BatchedWriter:
+    """
+    Неблокирующая запись строк лога: middleware только кладет строку в очередь,
+    фоновый поток копит строки и пишет их одной записью, когда набралось
+    batch_size строк или прошло interval секунд с прошлой записи.
+    Очередь ограничена max_queue строками: если sink не успевает, новые строки
+    отбрасываются и считаются в access_log_dropped_total, а запрос не ждет.
+    Ошибка записи в sink теряет только текущую пачку: поток сообщает о ней
+    в stderr и продолжает работу
+    """
 
-async def log_middleware(request: Request, call_next):
-    log_id = str(uuid4())
-    with logger.contextualize(log_id=log_id):
+    def __init__(self, sink: str, batch_size: int, interval: float, max_queue: int):
+        self._owns_stream = sink != 'stdout'
+        self._stream = open(sink, 'ab') if self._owns_stream else sys.stdout.buffer
+        self._batch_size = batch_size
+        self._interval = interval
+        self._queue: Queue[bytes | None] = Queue(maxsize=max_queue)
+        self._thread = Thread(target=self._run, name='access-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line: bytes) -> None:
+        try:
+            self._queue.put_nowait(line)
+        except Full:
+            ACCESS_LOG_DROPPED.inc()
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        if not self._thread.is_alive():
+            return
         try:
-            response = await call_next(request)
-            if response.status_code in [401, 402, 403, 404]:
-                logger.warning(f"Request to {request.url.path} failed")
+            self._queue.put(None, timeout=5)
+        except Full:
+            return
+        self._thread.join(timeout=5)
+        if self._owns_stream:
+            self._stream.close()
+
+    def _flush(self, batch: list[bytes]) -> None:
+        try:
+            self._stream.write(b''.join(batch))
+            self._stream.flush()
+        except (OSError, ValueError) as ex:
+            ACCESS_LOG_DROPPED.inc(len(batch))
+            print(f'Access log write failed, {len(batch)} lines dropped: {ex!r}', file=sys.stderr)
+
+    def _run(self) -> None:
+        batch: list[bytes] = []
+        deadline = monotonic() + self._interval
+        closed = False
+        while not closed:
+            try:
+                line = self._queue.get(timeout=max(deadline - monotonic(), 0))
+            except Empty:
+                pass
             else:
-                logger.info('Successfully accessed ' + request.url.path)
-        except Exception as ex:
-            logger.error(f"Request to {request.url.path} failed: {ex}")
-            response = ORJSONResponse(content={"success": False}, status_code=500)
+                if line is None:
+                    closed = True
+                else:
+                    batch.append(line)
+            if closed or len(batch) >= self._batch_size or monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = monotonic() + self._interval
+
+
+access_log = lazy(lambda: BatchedWriter(
+    get_settings().access_log_sink,
+    batch_size=get_settings().access_log_batch_size,
+    interval=get_settings().access_log_flush_interval,
+    max_queue=get_settings().access_log_queue_size
+), close=BatchedWriter.close)
+
+
+async def log_middleware(request: Request, call_next):
+    started = perf_counter()
+    error = None
+    try:
+        response = await call_next(request)
+    except Exception as ex:
+        logger.exception(f"Request to {request.url.path} failed")
+        error = repr(ex)
+        response = ORJSONResponse(content={"success": False}, status_code=500)
+    duration = perf_counter() - started
+
+    settings = get_settings()
+    if (response.status_code < 400 and duration * 1000 < settings.access_log_slow_ms
+            and random.random() >= settings.access_log_sample_rate):
         return response
+
+    stats = request_stats.get()
+    record = {
+        'time': datetime.now(tz=timezone.utc),
+        'method': request.method,
+        'route': route_template(request),
+        'path': request.url.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'db_ms': round(stats.db_time * 1000, 3) if stats else None,
+        'db_queries': stats.db_queries if stats else None,
+        'user_id': stats.user_id if stats else None,
+        'request_id': request.headers.get('x-request-id')
+    }
+    if error is not None:
+        record['error'] = error
+    access_log.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+    return response
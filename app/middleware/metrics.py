@@ -0,0 +1,39 @@
+from fastapi import Request
+from time import perf_counter
+
+from app.backend.metrics import (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    HTTP_IN_FLIGHT,
+    HTTP_DB_QUERIES,
+    HTTP_DB_SECONDS,
+    RequestStats,
+    request_stats
+)
+
+
+def route_template(request: Request) -> str:
+    route = request.scope.get('route')
+    return route.path if route is not None else 'unmatched'
+
+
+async def metrics_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    started = perf_counter()
+    status_code = 500
+    HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        request_stats.reset(token)
+        route = route_template(request)
+        HTTP_REQUEST_SECONDS.labels(method=request.method, route=route).observe(perf_counter() - started)
+        HTTP_REQUESTS.labels(method=request.method, route=route, status=str(status_code)).inc()
+        HTTP_DB_QUERIES.labels(route=route).observe(stats.db_queries)
+        HTTP_DB_SECONDS.labels(route=route).observe(stats.db_time)
+    response.headers['Server-Timing'] = (f'db;dur={stats.db_time * 1000:.2f};desc="{stats.db_queries} queries", '
+                                         f'db-pool;dur={stats.pool_wait * 1000:.2f}')
+    return response
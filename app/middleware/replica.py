@@ -0,0 +1,59 @@
+from fastapi import Request
+from jwt import InvalidTokenError
+import jwt
+
+from app.backend.cache import response_cache
+from app.backend.db import read_only
+from app.backend.metrics import request_stats
+from app.backend.settings import get_settings
+
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+PRIMARY_COOKIE = 'db_primary'
+
+
+def writer_key(user_id: int) -> str:
+    return f'db_primary:user:{user_id}'
+
+
+def token_user_id(request: Request) -> int | None:
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    settings = get_settings()
+    try:
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]).get('user_id')
+    except InvalidTokenError:
+        return None
+
+
+async def recent_writer(request: Request) -> bool:
+    if PRIMARY_COOKIE in request.cookies:
+        return True
+    user_id = token_user_id(request)
+    return user_id is not None and await response_cache.backend.get(writer_key(user_id)) is not None
+
+
+async def replica_middleware(request: Request, call_next):
+    """
+    Безопасные методы читают с реплики. После успешной записи чтения клиента
+    DB_READ_YOUR_WRITES_SECONDS секунд идут в основную базу, чтобы он видел
+    собственные изменения несмотря на отставание реплики. Клиент узнается по cookie,
+    а клиент с токеном - по пользователю: метка хранится в бэкенде кэша ответов
+    и видна всем воркерам, если бэкенд общий
+    """
+    settings = get_settings()
+    safe = request.method in SAFE_METHODS
+    token = read_only.set(safe and not (settings.db_read and await recent_writer(request)))
+    try:
+        response = await call_next(request)
+    finally:
+        read_only.reset(token)
+    if settings.db_read and not safe and response.status_code < 400:
+        response.set_cookie(PRIMARY_COOKIE, '1', max_age=settings.db_read_your_writes, httponly=True, samesite='lax')
+        stats = request_stats.get()
+        if stats is not None and stats.user_id is not None:
+            backend = response_cache.backend
+            await backend.set(writer_key(stats.user_id), b'1', (), settings.db_read_your_writes,
+                              await backend.sequence())
+    return response
@@ -22,15 +22,15 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 
-from app.main import Base
-from environs import Env
+# модели, а не app.main: миграциям не нужны роутеры, middleware и движки приложения
+from app.backend.settings import get_settings
+from app.models.models import Base
+from sqlalchemy import URL
 
 target_metadata = Base.metadata
 
-env = Env()
-env.read_env()
-db_url = f"{env('DB_LANGUAGE')}+{env('DB_DRIVER')}://{env('DB_USERNAME')}:{env('DB_PASSWORD')}@{env('DB_HOST')}:{env('DB_PORT')}/{env('DB_DATABASE')}"
-config.set_main_option("sqlalchemy.url", db_url)
+db_url = URL.create(**get_settings().connect_args).render_as_string(hide_password=False)
+config.set_main_option("sqlalchemy.url", db_url.replace('%', '%%'))
 
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,42 @@
+"""Product rating counters
+
+Revision ID: 3b8e51c0d2a7
+Revises: fdc46b273ced
+Create Date: 2026-10-17 11:04:02.517964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e51c0d2a7'
+down_revision: Union[str, None] = 'fdc46b273ced'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('rating_sum', sa.Float(), server_default='0', nullable=False),
+                  schema='ecommerce_fastapi')
+    op.add_column('products', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False),
+                  schema='ecommerce_fastapi')
+    op.execute('''
+        update ecommerce_fastapi.products p
+        set rating_sum = r.rating_sum,
+            rating_count = r.rating_count
+        from (
+            select product_id, sum(grade) as rating_sum, count(*) as rating_count
+            from ecommerce_fastapi.ratings
+            where is_active
+            group by product_id
+        ) r
+        where p.id = r.product_id
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'rating_count', schema='ecommerce_fastapi')
+    op.drop_column('products', 'rating_sum', schema='ecommerce_fastapi')
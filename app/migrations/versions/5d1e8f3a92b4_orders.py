@@ -0,0 +1,58 @@
+"""Orders and order items
+
+Revision ID: 5d1e8f3a92b4
+Revises: c71f2a9be048
+Create Date: 2026-10-17 14:21:45.108273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d1e8f3a92b4'
+down_revision: Union[str, None] = 'c71f2a9be048'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Text(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('clock_timestamp()'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['ecommerce_fastapi.users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    schema='ecommerce_fastapi'
+    )
+    op.create_index(op.f('ix_ecommerce_fastapi_orders_user_id'), 'orders', ['user_id'], unique=False,
+                    schema='ecommerce_fastapi')
+    op.create_index('ix_ecommerce_fastapi_orders_reserved_expires', 'orders', ['expires_at'], unique=False,
+                    schema='ecommerce_fastapi', postgresql_where=sa.text("status = 'reserved'"))
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['ecommerce_fastapi.orders.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['ecommerce_fastapi.products.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    schema='ecommerce_fastapi'
+    )
+    op.create_index(op.f('ix_ecommerce_fastapi_order_items_order_id'), 'order_items', ['order_id'], unique=False,
+                    schema='ecommerce_fastapi')
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ecommerce_fastapi_order_items_order_id'), table_name='order_items',
+                  schema='ecommerce_fastapi')
+    op.drop_table('order_items', schema='ecommerce_fastapi')
+    op.drop_index('ix_ecommerce_fastapi_orders_reserved_expires', table_name='orders', schema='ecommerce_fastapi')
+    op.drop_index(op.f('ix_ecommerce_fastapi_orders_user_id'), table_name='orders', schema='ecommerce_fastapi')
+    op.drop_table('orders', schema='ecommerce_fastapi')
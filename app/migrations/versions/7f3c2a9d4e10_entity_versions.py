@@ -0,0 +1,30 @@
+"""Version counters on products and categories
+
+Revision ID: 7f3c2a9d4e10
+Revises: e29b7c4d0a61
+Create Date: 2026-10-17 18:41:09.613207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3c2a9d4e10'
+down_revision: Union[str, None] = 'e29b7c4d0a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # константный default не переписывает таблицу (Postgres 11+)
+    for table in ('products', 'categories'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+                      schema='ecommerce_fastapi')
+
+
+def downgrade() -> None:
+    for table in ('products', 'categories'):
+        op.drop_column(table, 'version', schema='ecommerce_fastapi')
@@ -0,0 +1,34 @@
+"""Product full-text search index
+
+Revision ID: 9a4d07e6c1f3
+Revises: 3b8e51c0d2a7
+Create Date: 2026-10-17 12:20:51.904226
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d07e6c1f3'
+down_revision: Union[str, None] = '3b8e51c0d2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в products на время построения;
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_ecommerce_fastapi_products_search', 'products',
+                        [sa.text("to_tsvector('simple', name || ' ' || description)")],
+                        unique=False, schema='ecommerce_fastapi', postgresql_using='gin',
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_ecommerce_fastapi_products_search', table_name='products', schema='ecommerce_fastapi',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,42 @@
+"""Partial indexes for listing, rating and review queries
+
+Revision ID: c71f2a9be048
+Revises: 9a4d07e6c1f3
+Create Date: 2026-10-17 13:02:17.336410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71f2a9be048'
+down_revision: Union[str, None] = '9a4d07e6c1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+indexes = [
+    ('ix_ecommerce_fastapi_products_listing', 'products', ['id'], 'is_active and stock > 0'),
+    ('ix_ecommerce_fastapi_products_category_listing', 'products', ['category_id', 'id'], 'is_active and stock > 0'),
+    ('ix_ecommerce_fastapi_ratings_product_active', 'ratings', ['product_id'], 'is_active'),
+    ('ix_ecommerce_fastapi_reviews_product_active', 'reviews', ['product_id'], 'is_active'),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in indexes:
+            op.create_index(name, table, columns, unique=False, schema='ecommerce_fastapi',
+                            postgresql_where=sa.text(where), postgresql_concurrently=True,
+                            if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in indexes:
+            op.drop_index(name, table_name=table, schema='ecommerce_fastapi',
+                          postgresql_concurrently=True, if_exists=True)
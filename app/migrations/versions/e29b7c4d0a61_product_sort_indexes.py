@@ -0,0 +1,43 @@
+"""Partial indexes for product filters and sort orders
+
+Revision ID: e29b7c4d0a61
+Revises: 5d1e8f3a92b4
+Create Date: 2026-10-17 15:12:40.274518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e29b7c4d0a61'
+down_revision: Union[str, None] = '5d1e8f3a92b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+indexes = [
+    ('ix_ecommerce_fastapi_products_price_listing', ['price', 'id']),
+    ('ix_ecommerce_fastapi_products_rating_listing', ['rating', 'id']),
+    ('ix_ecommerce_fastapi_products_supplier_listing', ['supplier_id', 'id']),
+    ('ix_ecommerce_fastapi_products_category_price_listing', ['category_id', 'price', 'id']),
+    ('ix_ecommerce_fastapi_products_category_rating_listing', ['category_id', 'rating', 'id']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, columns in indexes:
+            op.create_index(name, 'products', columns, unique=False, schema='ecommerce_fastapi',
+                            postgresql_where=sa.text('is_active and stock > 0'), postgresql_concurrently=True,
+                            if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in indexes:
+            op.drop_index(name, table_name='products', schema='ecommerce_fastapi',
+                          postgresql_concurrently=True, if_exists=True)
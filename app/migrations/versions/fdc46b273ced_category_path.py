@@ -0,0 +1,44 @@
+"""Category materialized path
+
+Revision ID: fdc46b273ced
+Revises: fbed62049804
+Create Date: 2026-10-17 10:12:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fdc46b273ced'
+down_revision: Union[str, None] = 'fbed62049804'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('path', sa.Text(), nullable=True), schema='ecommerce_fastapi')
+    op.execute('''
+        with recursive tree as (
+            select id, '/' || id || '/' as path
+            from ecommerce_fastapi.categories
+            where parent_id is null
+            union all
+            select c.id, t.path || c.id || '/'
+            from ecommerce_fastapi.categories c
+            join tree t on c.parent_id = t.id
+        )
+        update ecommerce_fastapi.categories c
+        set path = tree.path
+        from tree
+        where c.id = tree.id
+    ''')
+    op.create_index('ix_ecommerce_fastapi_categories_path', 'categories', ['path'], unique=False,
+                    schema='ecommerce_fastapi', postgresql_ops={'path': 'text_pattern_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ecommerce_fastapi_categories_path', table_name='categories', schema='ecommerce_fastapi')
+    op.drop_column('categories', 'path', schema='ecommerce_fastapi')
@@ -8,8 +8,10 @@ from app.backend.db import (
     curr_time,
     AsyncSession
 )
-from sqlalchemy import ForeignKey, func, event, select, update, cast, Numeric, UniqueConstraint
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from datetime import datetime
+from sqlalchemy import (ForeignKey, func, event, select, update, cast, and_, case, Numeric, UniqueConstraint, Index, Text,
+                        literal_column, text, DDL)
+from sqlalchemy.orm import relationship, Mapped, mapped_column, object_session
 from sqlalchemy.orm.attributes import get_history
 from typing import Optional
 
@@ -17,19 +19,56 @@ from typing import Optional
 class Category(Base):
 
     __tablename__ = 'categories'
+    __table_args__ = (
+        Index('ix_ecommerce_fastapi_categories_path', 'path', postgresql_ops={'path': 'text_pattern_ops'}),
+    )
 
     id: Mapped[int_pk]
     name: Mapped[basic_str]
     slug: Mapped[str_uq_ix]
     is_active: Mapped[true_bool]
     parent_id: Mapped[Optional[int]] = mapped_column(ForeignKey('categories.id'))
+    path: Mapped[Optional[str]] = mapped_column(Text)
+    version: Mapped[int] = mapped_column(server_default='1')
 
     products: Mapped[list['Product']] = relationship(back_populates='category')
 
+    # версия увеличивается при каждом UPDATE через ORM, который к тому же
+    # проверяет, что строка не изменилась с момента чтения; массовые UPDATE
+    # увеличивают version явно
+    __mapper_args__ = {'version_id_col': version}
+
 
 class Product(Base):
 
     __tablename__ = 'products'
+    __table_args__ = (
+        Index('ix_ecommerce_fastapi_products_search',
+              func.to_tsvector(literal_column("'simple'"),
+                               literal_column('name') + literal_column("' '") + literal_column('description')),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+        Index('ix_ecommerce_fastapi_products_listing', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+        Index('ix_ecommerce_fastapi_products_category_listing', 'category_id', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+        Index('ix_ecommerce_fastapi_products_price_listing', 'price', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+        Index('ix_ecommerce_fastapi_products_rating_listing', 'rating', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+        Index('ix_ecommerce_fastapi_products_supplier_listing', 'supplier_id', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+        Index('ix_ecommerce_fastapi_products_category_price_listing', 'category_id', 'price', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+        Index('ix_ecommerce_fastapi_products_category_rating_listing', 'category_id', 'rating', 'id',
+              postgresql_where=text('is_active and stock > 0'),
+              sqlite_where=text('is_active and stock > 0')),
+    )
 
     id: Mapped[int_pk]
     name: Mapped[basic_str]
@@ -41,13 +80,45 @@ class Product(Base):
     supplier_id: Mapped[Optional[int]] = mapped_column(ForeignKey('users.id', ondelete='SET NULL'))
     category_id: Mapped[Optional[int]] = mapped_column(ForeignKey('categories.id', ondelete='SET NULL'))
     rating: Mapped[float]
+    rating_sum: Mapped[float] = mapped_column(default=0, server_default='0')
+    rating_count: Mapped[int] = mapped_column(default=0, server_default='0')
     is_active: Mapped[true_bool]
+    version: Mapped[int] = mapped_column(server_default='1')
 
     category: Mapped['Category'] = relationship(back_populates='products', passive_deletes=True, single_parent=True)
     user: Mapped['User'] = relationship(back_populates='products', passive_deletes=True, single_parent=True)
     ratings: Mapped[list['Rating']] = relationship(back_populates='product')
     reviews: Mapped[list['Review']] = relationship(back_populates='product')
 
+    __mapper_args__ = {'version_id_col': version}
+
+
+def sqlite_fts_ddl(schema: str) -> tuple[str, ...]:
+    """
+    FTS5-индекс поиска для запуска на aiosqlite: external content таблица поверх
+    products, синхронизируемая триггерами. Создается вместе со схемой, а не
+    при первом поиске - запросы на чтение не выполняют DDL
+    """
+    return (
+        f"create virtual table {schema}.products_fts using fts5"
+        f"(name, description, content='products', content_rowid='id')",
+        f"create trigger {schema}.products_fts_ai after insert on products begin "
+        f"insert into products_fts(rowid, name, description) values (new.id, new.name, new.description); end",
+        f"create trigger {schema}.products_fts_ad after delete on products begin "
+        f"insert into products_fts(products_fts, rowid, name, description) "
+        f"values ('delete', old.id, old.name, old.description); end",
+        f"create trigger {schema}.products_fts_au after update of name, description on products begin "
+        f"insert into products_fts(products_fts, rowid, name, description) "
+        f"values ('delete', old.id, old.name, old.description); "
+        f"insert into products_fts(rowid, name, description) values (new.id, new.name, new.description); end",
+    )
+
+
+for statement in sqlite_fts_ddl(Product.__table__.schema):
+    event.listen(Product.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Product.__table__, 'before_drop',
+             DDL(f'drop table if exists {Product.__table__.schema}.products_fts').execute_if(dialect='sqlite'))
+
 
 class User(Base):
 
@@ -67,11 +138,17 @@ class User(Base):
     products: Mapped[list['Product']] = relationship(back_populates='user')
     ratings: Mapped[list['Rating']] = relationship(back_populates='user')
     reviews: Mapped[list['Review']] = relationship(back_populates='user')
+    orders: Mapped[list['Order']] = relationship(back_populates='user')
 
 
 class Review(Base):
 
     __tablename__ = 'reviews'
+    __table_args__ = (
+        Index('ix_ecommerce_fastapi_reviews_product_active', 'product_id',
+              postgresql_where=text('is_active'),
+              sqlite_where=text('is_active')),
+    )
 
     id: Mapped[int_pk]
     user_id: Mapped[Optional[int]] = mapped_column(ForeignKey('users.id', ondelete='SET NULL'))
@@ -91,7 +168,12 @@ class Review(Base):
 class Rating(Base):
 
     __tablename__ = 'ratings'
-    __table_args__ = (UniqueConstraint('user_id', 'product_id'),)
+    __table_args__ = (
+        UniqueConstraint('user_id', 'product_id'),
+        Index('ix_ecommerce_fastapi_ratings_product_active', 'product_id',
+              postgresql_where=text('is_active'),
+              sqlite_where=text('is_active')),
+    )
 
     id: Mapped[int_pk]
     grade: Mapped[float]
@@ -104,31 +186,99 @@ class Rating(Base):
     review: Mapped['Review'] = relationship(back_populates='rating', lazy='selectin')
 
 
-def calculate_rating(connection, product_id):
+class Order(Base):
+
+    __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_ecommerce_fastapi_orders_reserved_expires', 'expires_at',
+              postgresql_where=text("status = 'reserved'"),
+              sqlite_where=text("status = 'reserved'")),
+    )
+
+    id: Mapped[int_pk]
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey('users.id', ondelete='SET NULL'), index=True)
+    status: Mapped[str] = mapped_column(Text, default='reserved')
+    total: Mapped[int]
+    created_at: Mapped[curr_time]
+    expires_at: Mapped[datetime]
+
+    __mapper_args__ = {'eager_defaults': True}
+
+    user: Mapped['User'] = relationship(back_populates='orders', passive_deletes=True, single_parent=True)
+    items: Mapped[list['OrderItem']] = relationship(back_populates='order', lazy='selectin')
+
+
+class OrderItem(Base):
+
+    __tablename__ = 'order_items'
+
+    id: Mapped[int_pk]
+    order_id: Mapped[int] = mapped_column(ForeignKey('orders.id', ondelete='CASCADE'), index=True)
+    product_id: Mapped[Optional[int]] = mapped_column(ForeignKey('products.id', ondelete='SET NULL'))
+    quantity: Mapped[int]
+    price: Mapped[int]
+
+    order: Mapped['Order'] = relationship(back_populates='items')
+
+
+def average_rating(rating_sum, rating_count):
+    return case(
+        (rating_count > 0, func.round(cast(rating_sum / rating_count, Numeric), 2)),
+        else_=0
+    )
+
+
+def rebuild_ratings_stmt(product_ids):
     """
-    Функция пересчета рейтинга у продукта
+    Пересчет счетчиков рейтинга по таблице ratings для набора продуктов одним
+    запросом: O(число активных оценок этих продуктов) по частичному индексу.
+    Результат зависит только от ratings, поэтому повтор безопасен - фоновый
+    воркер (app.backend.ratings) и починка (app.scripts.rebuild_ratings)
     """
-    rtng_stmt = (
-        select(func.round(cast(func.avg(Rating.grade), Numeric), 2))
-        .where(Rating.product_id == product_id)
-        .where(Rating.is_active == True)
+    totals = (
+        select(Product.id.label('product_id'),
+               func.coalesce(func.sum(Rating.grade), 0).label('rating_sum'),
+               func.count(Rating.id).label('rating_count'))
+        .outerjoin(Rating, and_(Rating.product_id == Product.id, Rating.is_active == True))
+        .where(Product.id.in_(product_ids))
+        .group_by(Product.id)
+        .subquery()
     )
-    avg_rating = connection.scalar(rtng_stmt)
-    upd_stmt = (
+    return (
         update(Product)
-        .where(Product.id == product_id)
-        .values(rating=avg_rating)
+        .where(Product.id == totals.c.product_id)
+        .values(rating_sum=totals.c.rating_sum,
+                rating_count=totals.c.rating_count,
+                rating=average_rating(totals.c.rating_sum, totals.c.rating_count),
+                version=Product.version + 1)
     )
-    connection.execute(upd_stmt)
+
+
+def rating_contribution(is_active: bool, grade: float) -> tuple[float, int]:
+    return (grade, 1) if is_active else (0, 0)
+
+
+def mark_rating_dirty(target, contribution: tuple[float, int], previous: tuple[float, int] = (0, 0)):
+    """
+    Обновление рейтинга отложено: продукт с изменившейся оценкой копится
+    в сессии, после commit его забирает фоновый воркер (app.backend.ratings)
+    """
+    session = object_session(target)
+    if session is None or target.product_id is None or contribution == previous:
+        return
+    session.info.setdefault('rating_dirty', set()).add(target.product_id)
 
 
 @event.listens_for(Rating, 'after_insert')
 def receive_after_insert(mapper, connection, target):
-    calculate_rating(connection, target.product_id)
+    mark_rating_dirty(target, rating_contribution(target.is_active, target.grade))
 
 
 @event.listens_for(Rating, 'after_update')
-def receive_after_insert(mapper, connection, target):
-    status = get_history(target, 'is_active')
-    if status.added[-1] is False and status.deleted[-1] is True:
-        calculate_rating(connection, target.product_id)
+def receive_after_update(mapper, connection, target):
+    status, grade = get_history(target, 'is_active'), get_history(target, 'grade')
+    if status.has_changes() or grade.has_changes():
+        was_active = status.deleted[0] if status.deleted else target.is_active
+        old_grade = grade.deleted[0] if grade.deleted else target.grade
+        mark_rating_dirty(target, rating_contribution(target.is_active, target.grade),
+                          rating_contribution(was_active, old_grade))
@@ -1,5 +1,4 @@
 from datetime import timedelta, datetime, timezone
-from environs import Env
 from fastapi import APIRouter, Depends, status, Security, Path
 from fastapi.exceptions import HTTPException
 from fastapi.responses import ORJSONResponse
@@ -11,9 +10,14 @@ from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Any
 import jwt
+import time
 
+from app.backend.cache import TTLCache
 from app.backend.db_depends import get_session
-from app.schemas.schemas import CreateUser, JWTTokenWithScope, TokenData, UserNoPassword
+from app.backend.hashing import PasswordHasher
+from app.backend.metrics import request_stats
+from app.backend.settings import get_settings, lazy
+from app.schemas.schemas import CreateUser, JWTTokenWithScope, TokenData, UserNoPassword, UserPrincipal
 from app.models.models import User
 
 
@@ -30,18 +34,24 @@ oauth2 = OAuth2PasswordBearer(
         'customer': 'read only'
     }
 )
-env = Env()
-env.read_env()
-secret_key = env('SECRET_KEY')
-expires = timedelta(seconds=env.int('EXPIRES'))
-algorithm = env('ALGORITHM')
 bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+password_hasher = lazy(lambda: PasswordHasher(bcrypt_context,
+                                              workers=get_settings().password_hash_workers,
+                                              max_queue=get_settings().password_hash_queue))
+user_cache = lazy(lambda: TTLCache('users', maxsize=get_settings().user_cache_size,
+                                   ttl=get_settings().user_cache_ttl))
+
+
+def token_expires() -> timedelta:
+    return timedelta(seconds=get_settings().expires)
 
 
 def create_access_token(data: dict[str, Any], expires_delta: timedelta) -> JWTTokenWithScope:
+    settings = get_settings()
     payload = data.copy()
-    payload.update({'exp': datetime.now(tz=timezone.utc) + expires_delta})
-    token = jwt.encode(payload, secret_key, algorithm=algorithm)
+    now = datetime.now(tz=timezone.utc)
+    payload.update({'iat': now, 'exp': now + expires_delta})
+    token = jwt.encode(payload, settings.secret_key, algorithm=settings.algorithm)
     return token
 
 
@@ -58,16 +68,64 @@ async def user_authenticate(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    if not bcrypt_context.verify(user_auth.password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(user_auth.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Incorrect password',
             headers={"WWW-Authenticate": "Bearer"}
         )
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
 
     return user
 
 
+async def cached_user(user_id: int, db: AsyncSession) -> UserPrincipal | None:
+    """
+    Пользователь из кэша воркера, а при промахе - из базы. False в кэше -
+    пользователь удален. Кэш сбрасывается только в воркере, обработавшем
+    смену роли или удаление: остальные воркеры видят прежние данные
+    до user_cache_ttl секунд
+    """
+    principal = user_cache.get(user_id)
+    if principal is False:
+        return None
+    if principal is None:
+        user = await db.scalar(select(User).where(and_(User.id == user_id,
+                                                       User.is_active == True)))
+        if not user:
+            return None
+        principal = UserPrincipal.model_validate(user)
+        user_cache.set(user_id, principal)
+    return principal
+
+
+async def user_principal(claims: dict[str, Any], db: AsyncSession) -> UserPrincipal | None:
+    """
+    Пользователь из токена: в stateless-режиме id и роли берутся из claims
+    свежего токена без обращения к базе, профиль - из кэша воркера, если он там есть
+    (иначе без профиля, его загрузит /auth/users/me). В остальных случаях - cached_user
+    """
+    settings = get_settings()
+    if settings.auth_stateless and claims.get('iat', 0) >= time.time() - settings.auth_stateless_max_age:
+        principal = UserPrincipal.from_claims(claims)
+        cached = user_cache.get(principal.id)
+        if cached is False:
+            return None
+        if cached is not None and cached.username == principal.username:
+            return principal.model_copy(update={'first_name': cached.first_name,
+                                                'last_name': cached.last_name,
+                                                'email': cached.email})
+        return principal
+
+    principal = await cached_user(claims.get('user_id'), db)
+    if principal is None or principal.username != claims.get('sub'):
+        return None
+    return principal
+
+
 async def check_user_credentials(
     scopes: SecurityScopes,
     db: Annotated[AsyncSession, Depends(get_session)],
@@ -84,15 +142,20 @@ async def check_user_credentials(
     )
 
     try:
-        decoded_token = jwt.decode(token, secret_key, leeway=0, algorithms=[algorithm])
+        settings = get_settings()
+        decoded_token = jwt.decode(token, settings.secret_key, leeway=0, algorithms=[settings.algorithm])
         username = decoded_token.get('sub')
-        user = await db.scalar(select(User).where(User.username == username))
+        TokenData.model_validate({'username': username, 'scopes': decoded_token.get('scopes', [])})
+        user = await user_principal(decoded_token, db)
         if not (username and user):
             raise credentials_exception
-        TokenData.model_validate({'username': username, 'scopes': decoded_token.get('scopes', [])})
-    except (InvalidTokenError, ExpiredSignatureError, ValidationError):
+    except (InvalidTokenError, ExpiredSignatureError, ValidationError, KeyError):
         raise credentials_exception
 
+    stats = request_stats.get()
+    if stats is not None:
+        stats.user_id = user.id
+
     token_scopes = set(decoded_token.get('scopes', []))
     if not token_scopes.issubset(set(scopes.scopes)):
         raise HTTPException(
@@ -117,7 +180,7 @@ async def create_user(
                     last_name=create_user.last_name,
                     username=create_user.username,
                     email=create_user.email,
-                    hashed_password=bcrypt_context.hash(create_user.password))
+                    hashed_password=await password_hasher.hash(create_user.password))
     db.add(new_user)
     await db.commit()
 
@@ -132,8 +195,21 @@ async def create_user(
     response_model=UserNoPassword
 )
 async def read_current_user(
-        user: Annotated[User, Security(check_user_credentials, scopes=['admin', 'supplier', 'customer'])]
+        db: Annotated[AsyncSession, Depends(get_session)],
+        user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier', 'customer'])]
 ):
+    if user.email is None:
+        # stateless-токен без профиля в кэше воркера
+        profile = await cached_user(user.id, db)
+        if profile is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail='Could not validate credentials',
+                headers={'WWW-Authenticate': 'Bearer'}
+            )
+        user = user.model_copy(update={'first_name': profile.first_name,
+                                       'last_name': profile.last_name,
+                                       'email': profile.email})
     return user
 
 
@@ -158,7 +234,7 @@ async def login(
         'user_id': user.id,
         'scopes': scopes
     }
-    token = create_access_token(data, expires_delta=expires)
+    token = create_access_token(data, expires_delta=token_expires())
     return JWTTokenWithScope(access_token=token)
 
 
@@ -181,6 +257,9 @@ async def apply_supplier_role(
     new_supplier.is_supplier = True
     new_supplier.is_customer = False
     await db.commit()
+    # свежие данные вместо удаления: промах загрузил бы пользователя с реплики,
+    # которая может еще не получить эту запись
+    user_cache.set(user_id, UserPrincipal.model_validate(new_supplier))
 
     return {
         'status_code': status.HTTP_200_OK,
@@ -206,6 +285,7 @@ async def revoke_supplier_role(
         )
     rev_supplier.is_supplier = False
     await db.commit()
+    user_cache.set(user_id, UserPrincipal.model_validate(rev_supplier))
 
     return {
         'status_code': status.HTTP_200_OK,
@@ -230,6 +310,7 @@ async def delete_user(
         )
     del_user.is_active = False
     await db.commit()
+    user_cache.set(user_id, False)
 
     return {
         'status_code': status.HTTP_200_OK,
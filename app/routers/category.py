@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, status, Security, Path, Body
-from fastapi.responses import ORJSONResponse
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, status, Security, Body, Header, HTTPException
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy import select, update, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
 from slugify import slugify
 from typing import Annotated
 
+from app.backend.cache import response_cache
+from app.backend.category_tree import category_tree
 from app.backend.db_depends import get_session, category_found, category_already_exists
+from app.backend.etag import rows_etag, etag_matches, not_modified
 from app.schemas.schemas import CreateCategory
 from app.models.models import Category, User
 from app.routers.auth import check_user_credentials
@@ -17,15 +20,65 @@ router = APIRouter(
 )
 
 
+async def category_path(db: AsyncSession, category_id: int | None) -> str:
+    if category_id is None:
+        return '/'
+    path = await db.scalar(select(Category.path).where(Category.id == category_id))
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='There is no parent category found'
+        )
+    return path
+
+
+async def move_subtree(db: AsyncSession, category: Category, parent_id: int | None):
+    """
+    Перенос категории под нового родителя: пути всего поддерева
+    переписываются одним UPDATE по префиксу. Версию самой категории
+    увеличит ORM при сохранении, потомкам - этот UPDATE
+    """
+    new_path = await category_path(db, parent_id) + f'{category.id}/'
+    old_path = category.path
+    if new_path.startswith(old_path):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Category cannot be moved into its own subtree'
+        )
+    await db.execute(
+        update(Category)
+        .where(Category.path.startswith(old_path))
+        .values(path=new_path + func.substr(Category.path, len(old_path) + 1),
+                version=case((Category.id == category.id, Category.version), else_=Category.version + 1))
+        .execution_options(synchronize_session=False)
+    )
+    category.path = new_path
+
+
 @router.get(
     '/',
     dependencies=[Security(check_user_credentials, scopes=['admin', 'supplier', 'customer'])]
 )
 async def get_all_categories(
-        db: Annotated[AsyncSession, Depends(get_session)]
+        db: Annotated[AsyncSession, Depends(get_session)],
+        if_none_match: Annotated[str | None, Header()] = None
 ):
-    categories = (await db.scalars(select(Category).where(Category.is_active == True))).all()
-    return categories
+    # ETag по (id, version) активных категорий; он же ключ кэша тела
+    versions = await db.execute(
+        select(Category.id, Category.version).where(Category.is_active == True).order_by(Category.id)
+    )
+    etag = rows_etag(versions)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    async def load():
+        categories = await db.execute(
+            select(*Category.columns()).where(Category.is_active == True).order_by(Category.id)
+        )
+        return [category._asdict() for category in categories], ['categories']
+
+    body = await response_cache.get_or_set('get_all_categories', etag, load)
+    return Response(body, media_type='application/json', headers={'ETag': etag})
 
 
 @router.post(
@@ -43,7 +96,11 @@ async def create_category(
                             parent_id=category.parent_id,
                             slug=slugify(category.name))
     db.add(new_category)
+    await db.flush()
+    new_category.path = await category_path(db, new_category.parent_id) + f'{new_category.id}/'
     await db.commit()
+    category_tree.invalidate()
+    await response_cache.invalidate('categories')
 
     return {
         'status_code': status.HTTP_201_CREATED,
@@ -53,16 +110,16 @@ async def create_category(
 
 @router.delete(
     '/{category_slug}',
-    dependencies=[Depends(category_found),
-                  Security(check_user_credentials, scopes=['admin'])]
+    dependencies=[Security(check_user_credentials, scopes=['admin'])]
 )
 async def delete_category(
-        category_slug: Annotated[str, Path()],
+        category: Annotated[Category, Depends(category_found)],
         db: Annotated[AsyncSession, Depends(get_session)]
 ):
-    category = await db.scalar(select(Category).where(Category.slug == category_slug))
     category.is_active = False
     await db.commit()
+    category_tree.invalidate()
+    await response_cache.invalidate('categories')
 
     return {
         'status_code': status.HTTP_200_OK,
@@ -72,21 +129,23 @@ async def delete_category(
 
 @router.put(
     '/{category_slug}',
-    dependencies=[Depends(category_found),
-                  Security(check_user_credentials, scopes=['admin'])]
+    dependencies=[Security(check_user_credentials, scopes=['admin'])]
 )
 async def update_category(
-        category_slug: Annotated[str, Path()],
+        category: Annotated[Category, Depends(category_found)],
         db: Annotated[AsyncSession, Depends(get_session)],
         upd_category: Annotated[CreateCategory, Body()]
 ):
-    category = await db.scalar(select(Category).where(Category.slug == category_slug))
     new_attrs = {key: getattr(upd_category, key)
                  for key in upd_category.model_fields_set}
     new_attrs.update({'slug': slugify(upd_category.name)})
+    if 'parent_id' in new_attrs and new_attrs['parent_id'] != category.parent_id:
+        await move_subtree(db, category, new_attrs['parent_id'])
     for attr, val in new_attrs.items():
         setattr(category, attr, val)
     await db.commit()
+    category_tree.invalidate()
+    await response_cache.invalidate('categories')
 
     return {
         'status_code': status.HTTP_200_OK,
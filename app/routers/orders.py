@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, status, HTTPException, Body, Security
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated
+
+from app.backend import orders
+from app.backend.db_depends import get_session, order_found
+from app.backend.pagination import Page, page_params, paginate, page_result
+from app.schemas.schemas import Checkout, UserPrincipal
+from app.models.models import Order
+from app.routers.auth import check_user_credentials
+
+
+router = APIRouter(
+    prefix='/orders',
+    tags=['orders']
+)
+
+
+def order_attrs(order: Order) -> dict:
+    return {**order.attrs, 'items': [item.attrs for item in order.items]}
+
+
+def check_owner(order: Order, user: UserPrincipal) -> None:
+    if not user.is_admin and order.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No order found'
+        )
+
+
+@router.post(
+    '/',
+    status_code=status.HTTP_201_CREATED,
+    response_class=ORJSONResponse
+)
+async def checkout(
+    cart: Annotated[Checkout, Body()],
+    db: Annotated[AsyncSession, Depends(get_session)],
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['customer'])]
+):
+    order = await orders.reserve(db, user, cart.items)
+
+    return {
+        'status_code': status.HTTP_201_CREATED,
+        'order': order_attrs(order)
+    }
+
+
+@router.get(
+    '/',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def user_orders(
+    db: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[Page, Depends(page_params)],
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'customer'])]
+):
+    keys = (Order.id,)
+    stmt = select(Order).where(Order.user_id == user.id)
+    result = [order_attrs(order) for order in await db.scalars(paginate(stmt, page, keys, descending=True))]
+
+    return page_result(result, page, keys)
+
+
+@router.get(
+    '/{order_id}',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def order_detail(
+    order: Annotated[Order, Depends(order_found)],
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'customer'])]
+):
+    check_owner(order, user)
+    return order_attrs(order)
+
+
+@router.post(
+    '/{order_id}/pay',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def pay_order(
+    order: Annotated[Order, Depends(order_found)],
+    db: Annotated[AsyncSession, Depends(get_session)],
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['customer'])]
+):
+    check_owner(order, user)
+    if not await orders.pay(db, order):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='Order is not reserved or the reservation has expired'
+        )
+
+    return {
+        'status_code': status.HTTP_200_OK,
+        'transaction': 'Order paid'
+    }
+
+
+@router.post(
+    '/{order_id}/cancel',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def cancel_order(
+    order: Annotated[Order, Depends(order_found)],
+    db: Annotated[AsyncSession, Depends(get_session)],
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'customer'])]
+):
+    check_owner(order, user)
+    if not await orders.cancel(db, order):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail='Only a reserved order can be cancelled'
+        )
+
+    return {
+        'status_code': status.HTTP_200_OK,
+        'transaction': 'Order cancelled'
+    }
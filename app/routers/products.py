@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Body, Path, Security
-from fastapi.responses import ORJSONResponse
-from sqlalchemy import select, union, and_
+from dataclasses import replace
+from fastapi import APIRouter, Depends, status, HTTPException, Body, File, Header, Path, Query, Request, Security, UploadFile
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from slugify import slugify
 from typing import Annotated
 
+from app.backend.bulk import ProductImport, iter_records, update_stock_price
+from app.backend.cache import response_cache
+from app.backend.category_tree import category_tree
 from app.backend.db_depends import get_session, product_found, product_already_exists, category_found
-from app.schemas.schemas import CreateProduct
-from app.models.models import Product, Category, User
+from app.backend.etag import entity_etag, rows_etag, etag_matches, not_modified
+from app.backend.fields import Fields, fields_params, select_fields, fields_key
+from app.backend.images import ThumbnailSize, DIGEST_PATTERN, image_store, image_urls, store_image
+from app.backend.listing import ProductFilters, product_filters
+from app.backend.pagination import Page, page_params, paginate, page_result
+from app.backend.search import search_stmt
+from app.backend.settings import get_settings
+from app.backend.streaming import wants_ndjson, ndjson_response
+from app.schemas.schemas import CreateProduct, ProductStockPrice, UserPrincipal
+from app.models.models import Product, Category
 from app.routers.auth import check_user_credentials
 
 
@@ -15,6 +28,36 @@ router = APIRouter(
     prefix='/products',
     tags=['products']
 )
+product_fields = fields_params(Product)
+
+
+async def product_page(
+    db: AsyncSession,
+    response: Response,
+    page: Page,
+    fields: Fields,
+    filters: ProductFilters,
+    if_none_match: str | None,
+    categories: list[int] | None = None
+) -> dict | Response:
+    """
+    Страница списка с ETag по парам (id, version). При If-None-Match сначала
+    выбираются только id и version по тому же индексу, и совпавшая страница
+    отдается как 304 без выборки и сериализации остальных колонок
+    """
+    keys = filters.keys
+    if if_none_match is not None:
+        stmt = filters.apply(select(*select_fields(Product, ('id', 'version'), keys)), categories)
+        versions = (await db.execute(paginate(stmt, page, keys, filters.descending))).all()
+        etag = rows_etag((row.id, row.version) for row in versions[:page.limit])
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    # version выбирается всегда: по нему считается ETag страницы
+    stmt = filters.apply(select(*select_fields(Product, fields, keys + (Product.version,))), categories)
+    rows = await db.execute(paginate(stmt, page, keys, filters.descending))
+    result = page_result([row._asdict() for row in rows], page, keys)
+    response.headers['ETag'] = rows_etag((item['id'], item['version']) for item in result['items'])
+    return result
 
 
 @router.post(
@@ -26,7 +69,7 @@ router = APIRouter(
 async def create_product(
         product: Annotated[CreateProduct, Body()],
         db: Annotated[AsyncSession, Depends(get_session)],
-        user: Annotated[User, Security(check_user_credentials, scopes=['admin', 'supplier'])]
+        user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier'])]
 ):
     new_product = Product(
         name=product.name,
@@ -48,6 +91,42 @@ async def create_product(
     }
 
 
+@router.post(
+    '/bulk',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def bulk_create_products(
+        request: Request,
+        db: Annotated[AsyncSession, Depends(get_session)],
+        user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier'])]
+):
+    report = await ProductImport(db, user).run(iter_records(request))
+
+    return {
+        'status_code': status.HTTP_200_OK,
+        **report
+    }
+
+
+@router.patch(
+    '/bulk',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def bulk_update_products(
+        items: Annotated[list[ProductStockPrice], Body(max_length=50000)],
+        db: Annotated[AsyncSession, Depends(get_session)],
+        user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier'])]
+):
+    report = await update_stock_price(db, user, items)
+
+    return {
+        'status_code': status.HTTP_200_OK,
+        **report
+    }
+
+
 @router.get(
     '/',
     status_code=status.HTTP_200_OK,
@@ -55,22 +134,28 @@ async def create_product(
     dependencies=[Security(check_user_credentials, scopes=['admin', 'customer', 'supplier'])]
 )
 async def all_products(
-        db: Annotated[AsyncSession, Depends(get_session)]
+        db: Annotated[AsyncSession, Depends(get_session)],
+        response: Response,
+        page: Annotated[Page, Depends(page_params)],
+        stream: Annotated[bool, Depends(wants_ndjson)],
+        fields: Annotated[Fields, Depends(product_fields)],
+        filters: Annotated[ProductFilters, Depends(product_filters)],
+        if_none_match: Annotated[str | None, Header()] = None
 ):
-    stmt = (
-        select(Product).
-        where(Product.is_active == True).
-        where(Product.stock > 0)
-    )
-    result = (await db.scalars(stmt)).all()
+    filters.check()
+    keys = filters.keys
+    if stream:
+        stmt = filters.apply(select(*select_fields(Product, fields, keys)))
+        return ndjson_response(paginate(stmt, replace(page, limit=None), keys, filters.descending))
+    result = await product_page(db, response, page, fields, filters, if_none_match)
 
-    if not result:
+    if isinstance(result, dict) and not result['items'] and page.after is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='There are no products'
         )
 
-    return list(map(lambda x: x.attrs, result))
+    return result
 
 
 @router.get(
@@ -81,24 +166,48 @@ async def all_products(
 )
 async def product_by_category(
     category_slug: Annotated[str, Path()],
-    category: Annotated[dict[str, str | int], Depends(category_found)],
-    db: Annotated[AsyncSession, Depends(get_session)]
+    category: Annotated[Category, Depends(category_found)],
+    db: Annotated[AsyncSession, Depends(get_session)],
+    response: Response,
+    page: Annotated[Page, Depends(page_params)],
+    stream: Annotated[bool, Depends(wants_ndjson)],
+    fields: Annotated[Fields, Depends(product_fields)],
+    filters: Annotated[ProductFilters, Depends(product_filters)],
+    if_none_match: Annotated[str | None, Header()] = None
 ):
-    subcategories = select(Category.id)\
-        .where(Category.parent_id == category['id'])
-    categories = select(Category.id)\
-        .where(Category.id == category['id'])
-    union_stmt = union(categories, subcategories).subquery()
-    stmt = (
-        select(Product)
-        .where(and_(Product.is_active == True,
-                    Product.stock > 0,
-                    Product.category_id.in_(select(union_stmt))))
-    )
-    rows = await db.scalars(stmt)
-    result = [row.attrs for row in rows]
+    filters.check(in_category=True)
+    categories = await category_tree.subtree(db, category.id)
+    keys = filters.keys
+    if stream:
+        stmt = filters.apply(select(*select_fields(Product, fields, keys)), categories)
+        return ndjson_response(paginate(stmt, replace(page, limit=None), keys, filters.descending))
 
-    return result
+    return await product_page(db, response, page, fields, filters, if_none_match, categories)
+
+
+@router.get(
+    '/search',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse,
+    dependencies=[Security(check_user_credentials, scopes=['admin', 'supplier', 'customer'])]
+)
+async def search_products(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    db: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[Page, Depends(page_params)],
+    fields: Annotated[Fields, Depends(product_fields)]
+):
+    q = q.strip()
+    if not q:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='Search query must contain at least one word'
+        )
+    stmt, keys = search_stmt(db, q, select_fields(Product, fields))
+    rows = await db.execute(paginate(stmt, page, keys, descending=True))
+    result = [row._asdict() for row in rows]
+
+    return page_result(result, page, keys)
 
 
 @router.get(
@@ -109,36 +218,75 @@ async def product_by_category(
 )
 async def product_detail(
     product_slug: Annotated[str, Path()],
-    product: Annotated[Product, Depends(product_found)]
+    db: Annotated[AsyncSession, Depends(get_session)],
+    fields: Annotated[Fields, Depends(product_fields)],
+    if_none_match: Annotated[str | None, Header()] = None
 ):
+    # одна выборка по уникальному индексу slug: на ее результат опираются и 304,
+    # и ключ кэша, поэтому воркер не отдаст тело старше версии в ETag
+    current = (await db.execute(
+        select(Product.id, Product.version).where(Product.slug == product_slug)
+    )).first()
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No product found'
+        )
+    etag = entity_etag(current.id, current.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    return product.attrs
+    async def load():
+        product = (await db.execute(
+            select(*select_fields(Product, fields)).where(Product.id == current.id)
+        )).first()
+        return product._asdict(), [f'product:{current.id}']
+
+    key = fields_key(f'{product_slug}@{current.version}', fields)
+    body = await response_cache.get_or_set('product_detail', key, load)
+    return Response(body, media_type='application/json', headers={'ETag': etag})
 
 
 @router.put(
     '/{product_slug}',
     status_code=status.HTTP_200_OK,
-    response_class=ORJSONResponse,
-    dependencies=[Depends(product_found)]
+    response_class=ORJSONResponse
 )
 async def update_product(
-    product_slug: Annotated[str, Path()],
+    product: Annotated[Product, Depends(product_found)],
     update_product: Annotated[CreateProduct, Body()],
     db: Annotated[AsyncSession, Depends(get_session)],
-    user: Annotated[User, Security(check_user_credentials, scopes=['admin', 'supplier'])]
+    response: Response,
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier'])],
+    if_match: Annotated[str | None, Header()] = None
 ):
-    product = await db.scalar(select(Product).where(Product.slug == product_slug))
     if user.is_supplier and user.id != product.supplier_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="You are not authorized to use this method"
         )
+    # If-Match - ETag из /products/detail: запись по устаревшей версии отклоняется
+    if if_match is not None and not etag_matches(if_match, entity_etag(product.id, product.version), weak=False):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail='Product has been modified'
+        )
     new_attrs = {key: getattr(update_product, key)
                  for key in update_product.model_fields_set}
     new_attrs.update({'slug': slugify(update_product.name)})
     for attr, val in new_attrs.items():
         setattr(product, attr, val)
-    await db.commit()
+    try:
+        # UPDATE ... WHERE version = прочитанная версия: проверка выше не пропустит
+        # и запись, успевшую пройти между чтением и commit
+        await db.commit()
+    except StaleDataError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail='Product has been modified'
+        )
+    await response_cache.invalidate(f'product:{product.id}')
+    response.headers['ETag'] = entity_etag(product.id, product.version)
 
     return {
         'status_code': status.HTTP_200_OK,
@@ -149,15 +297,13 @@ async def update_product(
 @router.delete(
     '/{product_slug}',
     status_code=status.HTTP_200_OK,
-    response_class=ORJSONResponse,
-    dependencies=[Depends(product_found)]
+    response_class=ORJSONResponse
 )
 async def delete_product(
-    product_slug: Annotated[str, Path()],
+    product: Annotated[Product, Depends(product_found)],
     db: Annotated[AsyncSession, Depends(get_session)],
-    user: Annotated[User, Security(check_user_credentials, scopes=['admin', 'supplier'])]
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier'])]
 ):
-    product = await db.scalar(select(Product).where(Product.slug == product_slug))
     if user.is_supplier and user.id != product.supplier_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -165,9 +311,68 @@ async def delete_product(
         )
     product.is_active = False
     await db.commit()
+    await response_cache.invalidate(f'product:{product.id}', f'reviews:{product.id}')
 
     return {
         'status_code': status.HTTP_200_OK,
         'transaction': 'Product delete is successful'
     }
 
+
+@router.post(
+    '/{product_slug}/image',
+    status_code=status.HTTP_200_OK,
+    response_class=ORJSONResponse
+)
+async def upload_product_image(
+    product: Annotated[Product, Depends(product_found)],
+    image: Annotated[UploadFile, File()],
+    db: Annotated[AsyncSession, Depends(get_session)],
+    response: Response,
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['admin', 'supplier'])]
+):
+    if user.is_supplier and user.id != product.supplier_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You are not authorized to use this method"
+        )
+    # завершаем транзакцию чтения, чтобы соединение не простаивало на время
+    # ресайза; UPDATE ниже все равно проверит, что версия товара не изменилась
+    await db.commit()
+    digest = await store_image(image)
+    urls = image_urls(digest)
+    product.image_url = urls['large']
+    await db.commit()
+    await response_cache.invalidate(f'product:{product.id}')
+    response.headers['ETag'] = entity_etag(product.id, product.version)
+
+    return {
+        'status_code': status.HTTP_200_OK,
+        'transaction': 'Product image upload is successful',
+        'image_url': product.image_url,
+        'thumbnails': urls
+    }
+
+
+@router.get(
+    '/images/{digest}/{size}',
+    status_code=status.HTTP_200_OK
+)
+async def product_image(
+    digest: Annotated[str, Path(pattern=DIGEST_PATTERN)],
+    size: Annotated[ThumbnailSize, Path()]
+):
+    """
+    Миниатюры публичны (их загружает <img> без токена) и неизменяемы: адрес
+    содержит хэш. За nginx файл отдает сам nginx по X-Accel-Redirect
+    """
+    path = image_store.relative_path(digest, size)
+    headers = {'Cache-Control': 'public, max-age=31536000, immutable'}
+    if get_settings().image_accel_redirect:
+        return Response(media_type='image/webp', headers={**headers, 'X-Accel-Redirect': f'/_images/{path}'})
+    if not (image_store.root / path).is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='No image found'
+        )
+    return FileResponse(image_store.root / path, media_type='image/webp', headers=headers)
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Body, Path, Security
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from typing import Annotated
 
-from app.backend.db_depends import get_session, product_found, rating_found
-from app.schemas.schemas import ReviewWithRating
-from app.models.models import Product, User, Review, Rating
+from app.backend.cache import response_cache
+from app.backend.db_depends import get_session, get_loader, product_found, rating_found, EntityLoader
+from app.backend.fields import Fields, fields_params, select_fields, fields_key
+from app.backend.streaming import wants_ndjson, ndjson_response
+from app.schemas.schemas import ReviewWithRating, UserPrincipal
+from app.models.models import Product, Review, Rating
 from app.routers.auth import check_user_credentials
 
 
@@ -15,6 +18,7 @@ router = APIRouter(
     prefix='/reviews',
     tags=['reviews']
 )
+review_fields = fields_params(Review)
 
 
 @router.get(
@@ -23,31 +27,39 @@ router = APIRouter(
     dependencies=[Security(check_user_credentials, scopes=['admin', 'supplier', 'customer'])]
 )
 async def all_reviews(
-    db: Annotated[AsyncSession, Depends(get_session)]
+    db: Annotated[AsyncSession, Depends(get_session)],
+    stream: Annotated[bool, Depends(wants_ndjson)],
+    fields: Annotated[Fields, Depends(review_fields)]
 ):
-    reviews = await db.scalars(select(Review).where(Review.is_active == True))
-    return [review.attrs for review in reviews]
+    stmt = select(*select_fields(Review, fields)).where(Review.is_active == True)
+    if stream:
+        return ndjson_response(stmt.order_by(Review.id))
+    reviews = await db.execute(stmt)
+    return [review._asdict() for review in reviews]
 
 
 @router.get(
     '/product/{product_slug}',
     response_class=ORJSONResponse,
-    dependencies=[
-        Security(check_user_credentials, scopes=['admin', 'supplier', 'customer']),
-        Depends(product_found)
-    ]
+    dependencies=[Security(check_user_credentials, scopes=['admin', 'supplier', 'customer'])]
 )
 async def products_reviews(
         db: Annotated[AsyncSession, Depends(get_session)],
-        product_slug: Annotated[str, Path()]
+        loader: Annotated[EntityLoader, Depends(get_loader)],
+        product_slug: Annotated[str, Path()],
+        fields: Annotated[Fields, Depends(review_fields)]
 ):
-    reviews = await db.scalars(
-        select(Review)
-        .join(Product)
-        .where(and_(Product.slug == product_slug,
-                    Review.is_active == True))
-    )
-    return [review.attrs for review in reviews]
+    async def load():
+        product = await product_found(product_slug, loader)
+        reviews = await db.execute(
+            select(*select_fields(Review, fields))
+            .where(and_(Review.product_id == product.id,
+                        Review.is_active == True))
+        )
+        return [review._asdict() for review in reviews], [f'reviews:{product.id}']
+
+    body = await response_cache.get_or_set('products_reviews', fields_key(product_slug, fields), load)
+    return Response(body, media_type='application/json')
 
 
 @router.post(
@@ -56,7 +68,7 @@ async def products_reviews(
 )
 async def add_review(
     db: Annotated[AsyncSession, Depends(get_session)],
-    user: Annotated[User, Security(check_user_credentials, scopes=['customer'])],
+    user: Annotated[UserPrincipal, Security(check_user_credentials, scopes=['customer'])],
     review: Annotated[ReviewWithRating, Body()],
     product: Annotated[Product, Depends(product_found)]
 ):
@@ -80,6 +92,7 @@ async def add_review(
                             comment=review.comment)
         db.add(new_review)
         await db.commit()
+        await response_cache.invalidate(f'product:{product.id}', f'reviews:{product.id}')
 
         return {
             'status_code': status.HTTP_201_CREATED,
@@ -99,6 +112,7 @@ async def delete_reviews(
     rating.is_active = False
     rating.review.is_active = False
     await db.commit()
+    await response_cache.invalidate(f'product:{rating.product_id}', f'reviews:{rating.product_id}')
 
     return {
         'status_code': status.HTTP_201_CREATED,
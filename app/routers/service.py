@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Security
+from fastapi.responses import ORJSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.backend.db import get_engine, get_read_engine
+from app.backend.metrics import render_metrics
+from app.backend.pool import pool_status
+from app.routers.auth import check_user_credentials
+
+
+router = APIRouter(
+    prefix='/service',
+    tags=['service']
+)
+metrics_router = APIRouter(tags=['service'])
+
+
+@metrics_router.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get(
+    '/pool',
+    response_class=ORJSONResponse,
+    dependencies=[Security(check_user_credentials, scopes=['admin'])]
+)
+async def get_pool_status():
+    if get_read_engine() is not get_engine():
+        return {**pool_status(get_engine()), 'replica': pool_status(get_read_engine())}
+    return pool_status(get_engine())
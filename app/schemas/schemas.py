@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
 from typing import Literal
 
 
@@ -60,6 +60,14 @@ class CreateUser(BaseModel):
         }
     )
 
+    @field_validator('password')
+    @classmethod
+    def check_password(cls, password: str) -> str:
+        # bcrypt учитывает только первые 72 байта: остальное молча отбрасывалось бы
+        if len(password.encode()) > 72:
+            raise ValueError('Password must not exceed 72 bytes')
+        return password
+
 
 class UserNoPassword(BaseModel):
 
@@ -90,3 +98,77 @@ class ReviewWithRating(BaseModel):
 
     comment: str = Field(min_length=10)
     grade: int = Field(gt=0, le=10)
+
+
+class UserPrincipal(BaseModel):
+
+    id: int
+    username: str
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
+    is_admin: bool
+    is_supplier: bool
+    is_customer: bool
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> 'UserPrincipal':
+        # в токене только id и роли: профиль загружается отдельно (cached_user)
+        scopes = claims.get('scopes', [])
+        return cls(id=claims['user_id'],
+                   username=claims['sub'],
+                   is_admin='admin' in scopes,
+                   is_supplier='supplier' in scopes,
+                   is_customer='customer' in scopes)
+
+
+class ProductStockPrice(BaseModel):
+
+    id: int | None = None
+    slug: str | None = None
+    stock: int | None = Field(default=None, ge=0)
+    price: int | None = Field(default=None, ge=0)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "slug": "sample-product",
+                "stock": 10,
+                "price": 100
+            }
+        }
+    )
+
+    @model_validator(mode='after')
+    def check_key(self) -> 'ProductStockPrice':
+        if self.id is None and self.slug is None:
+            raise ValueError('Either id or slug is required')
+        return self
+
+    @property
+    def key(self) -> int | str:
+        return self.slug if self.slug is not None else self.id
+
+
+class CartLine(BaseModel):
+
+    product_id: int
+    quantity: int = Field(gt=0, le=1000)
+
+
+class Checkout(BaseModel):
+
+    items: list[CartLine] = Field(min_length=1, max_length=200)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "items": [
+                    {"product_id": 1, "quantity": 2},
+                    {"product_id": 7, "quantity": 1}
+                ]
+            }
+        }
+    )
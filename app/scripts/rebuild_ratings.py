@@ -0,0 +1,40 @@
+"""
+Пересборка rating_sum, rating_count и rating у продуктов по таблице ratings.
+
+    python -m app.scripts.rebuild_ratings --batch-size 1000
+"""
+from argparse import ArgumentParser
+from sqlalchemy import select
+import asyncio
+
+from app.backend.db import AsyncSession, dispose_engines
+from app.models.models import Product, rebuild_ratings_stmt
+
+
+async def rebuild_ratings(batch_size: int) -> int:
+    last_id = 0
+    total = 0
+    while True:
+        async with AsyncSession() as session:
+            ids = (await session.scalars(
+                select(Product.id)
+                .where(Product.id > last_id)
+                .order_by(Product.id)
+                .limit(batch_size)
+            )).all()
+            if not ids:
+                break
+            await session.execute(rebuild_ratings_stmt(ids))
+            await session.commit()
+        last_id = ids[-1]
+        total += len(ids)
+        print(f'Rebuilt ratings for {total} products (last id {last_id})')
+    await dispose_engines()
+    return total
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Rebuild product rating counters from ratings')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(rebuild_ratings(args.batch_size))
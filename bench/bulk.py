@@ -0,0 +1,62 @@
+"""
+Замер пропускной способности массовой загрузки товаров (POST /products/bulk):
+ProductImport на сгенерированных строках, результат - строк в секунду.
+Цель - не меньше 10 000 строк/с на Postgres с COPY. Часть имен повторяется,
+чтобы в замер попадал подбор суффиксов slug. База берется из тех же
+переменных окружения, что и у приложения.
+
+    python -m bench.bulk --rows 100000 --reset
+"""
+from random import Random
+from time import perf_counter
+from typing import Any, AsyncIterator
+import asyncio
+
+from app.backend.db import AsyncSession, dispose_engines
+from app.backend.bulk import ProductImport
+from app.schemas.schemas import UserPrincipal
+from bench.seed import WORDS, SeedConfig, seed, config_parser, config_from_args
+
+
+ADMIN = UserPrincipal(id=1, username='user1', first_name='First1', last_name='Last1', email='user1@bench.local',
+                      is_admin=True, is_supplier=False, is_customer=False)
+
+
+async def records(config: SeedConfig, rows: int, repeats: float) -> AsyncIterator[tuple[int, dict[str, Any]]]:
+    rnd = Random(config.seed)
+    for row_no in range(1, rows + 1):
+        # имя с номером уникально, без номера - повторяется
+        suffix = '' if rnd.random() < repeats else f' import {row_no}'
+        yield row_no, {
+            'name': ' '.join(rnd.choices(WORDS, k=2)) + suffix,
+            'description': ' '.join(rnd.choices(WORDS, k=8)),
+            'price': rnd.randint(100, 100_000),
+            'stock': rnd.randint(0, 500),
+            'category_id': rnd.randint(1, config.categories)
+        }
+
+
+async def run(config: SeedConfig, rows: int, repeats: float, reset: bool) -> dict[str, float]:
+    if reset:
+        await seed(config, reset=True)
+    async with AsyncSession() as session:
+        started = perf_counter()
+        report = await ProductImport(session, ADMIN).run(records(config, rows, repeats))
+        elapsed = perf_counter() - started
+    await dispose_engines()
+    return {
+        'rows': rows,
+        'inserted': report['inserted'],
+        'updated': report['updated'],
+        'errors': len(report['errors']),
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed
+    }
+
+
+if __name__ == '__main__':
+    parser = config_parser('Benchmark bulk product import throughput')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeats', type=float, default=0.05, help='share of rows with a repeated name')
+    args = parser.parse_args()
+    print(asyncio.run(run(config_from_args(args), args.rows, args.repeats, args.reset)))
@@ -0,0 +1,121 @@
+"""
+Конкурентный бенчмарк оформления заказов: сотни одновременных checkout
+по небольшому набору "горячих" товаров с малым остатком. После прогона
+проверяется, что проданное количество плюс остаток равны исходному
+остатку и что остаток нигде не ушел в минус, затем резервы принудительно
+просрочиваются и проверяется, что остатки вернулись полностью.
+
+    python -m bench.checkout --checkouts 1000 --concurrency 300 --hot-products 5 --stock 100
+"""
+from argparse import ArgumentParser
+from collections import Counter
+from datetime import datetime, timedelta
+from httpx import ASGITransport, AsyncClient
+from random import Random
+from sqlalchemy import select, update, func
+from time import perf_counter
+import asyncio
+import statistics
+import sys
+
+from app.backend.db import AsyncSession as Session
+from app.backend.orders import release_expired
+from app.models.models import Order, OrderItem, Product
+from bench.seed import SeedConfig, access_token
+
+
+async def prepare(hot: list[int], stock: int) -> int:
+    async with Session() as db:
+        await db.execute(update(Product).where(Product.id.in_(hot)).values(stock=stock, is_active=True))
+        await db.commit()
+        return await db.scalar(select(func.coalesce(func.max(Order.id), 0)))
+
+
+async def check(hot: list[int], stock: int, first_order: int) -> list[str]:
+    async with Session() as db:
+        stocks = dict((await db.execute(select(Product.id, Product.stock).where(Product.id.in_(hot)))).all())
+        sold = dict((await db.execute(
+            select(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.id > first_order)
+            .where(Order.status == 'reserved')
+            .where(OrderItem.product_id.in_(hot))
+            .group_by(OrderItem.product_id)
+        )).all())
+    errors = []
+    for product_id in hot:
+        if stocks[product_id] < 0:
+            errors.append(f'product {product_id}: negative stock {stocks[product_id]}')
+        if stocks[product_id] + sold.get(product_id, 0) != stock:
+            errors.append(f'product {product_id}: stock {stocks[product_id]} + sold {sold.get(product_id, 0)} != {stock}')
+    return errors
+
+
+async def expire(first_order: int) -> int:
+    async with Session() as db:
+        await db.execute(update(Order).where(Order.id > first_order).where(Order.status == 'reserved')
+                         .values(expires_at=datetime.now() - timedelta(seconds=1)))
+        await db.commit()
+        return await release_expired(db)
+
+
+async def run(args) -> int:
+    config = SeedConfig()
+    rnd = Random(args.seed)
+    hot = list(range(1, args.hot_products + 1))
+    first_order = await prepare(hot, args.stock)
+    customers = range(config.suppliers + 2, config.users - config.reviewers + 1)
+    tokens = [access_token(user_id, ['customer']) for user_id in rnd.sample(customers, min(len(customers), 200))]
+    carts = [
+        [{'product_id': product_id, 'quantity': rnd.randint(1, args.max_quantity)}
+         for product_id in rnd.sample(hot, rnd.randint(1, min(3, len(hot))))]
+        for _ in range(args.checkouts)
+    ]
+
+    if args.url:
+        client = AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from app.main import app
+        client = AsyncClient(transport=ASGITransport(app=app), base_url='http://bench', timeout=60)
+
+    limit = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+
+    async def checkout(i: int):
+        async with limit:
+            started = perf_counter()
+            response = await client.post('/orders/', json={'items': carts[i]},
+                                         headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}'})
+            latencies.append(perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = perf_counter()
+    async with client:
+        await asyncio.gather(*(checkout(i) for i in range(args.checkouts)))
+    elapsed = perf_counter() - started
+
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f'checkouts: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s), '
+          f'p50 {cuts[49] * 1000:.1f} ms, p95 {cuts[94] * 1000:.1f} ms, p99 {cuts[98] * 1000:.1f} ms')
+    print('statuses:', dict(sorted(statuses.items())))
+
+    errors = await check(hot, args.stock, first_order)
+    released = await expire(first_order)
+    print(f'released expired reservations: {released}')
+    errors += [f'after release: {error}' for error in await check(hot, args.stock, first_order)]
+    for error in errors:
+        print('OVERSOLD', error)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Concurrent checkout benchmark with an overselling check')
+    parser.add_argument('--checkouts', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--hot-products', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=100)
+    parser.add_argument('--max-quantity', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1007)
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    sys.exit(asyncio.run(run(parser.parse_args())))
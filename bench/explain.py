@@ -0,0 +1,87 @@
+"""
+Проверка планов запросов: прогоняет основные GET-маршруты приложения
+на заполненной базе Postgres, перехватывает выполненные SELECT и для каждого
+делает EXPLAIN. Завершается с кодом 1, если по горячей таблице
+планировщик выбрал последовательное сканирование.
+
+    python -m bench.explain --products 200000 --reset
+"""
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+import asyncio
+import orjson
+import sys
+
+from app.backend.db import get_engine, dispose_engines
+from app.main import app
+from bench.seed import SeedConfig, seed, access_token, config_parser, config_from_args
+
+
+HOT_TABLES = {'products', 'ratings', 'reviews'}
+
+
+def routes(config: SeedConfig) -> list[str]:
+    return [
+        '/products/?limit=50',
+        '/products/category/category-1?limit=50',
+        f'/products/detail/product-{config.products // 2}',
+        '/products/search?q=lamp&limit=50',
+        '/products/?sort=price&price_min=100&price_max=500&limit=50',
+        '/products/?sort=-price&limit=50',
+        '/products/?sort=-rating&rating_min=4&limit=50',
+        '/products/?sort=newest&supplier_id=2&limit=50',
+        '/products/category/category-1?sort=-price&limit=50',
+        '/products/category/category-1?sort=-rating&limit=50',
+        f'/reviews/product/product-{config.products // 2}',
+    ]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in HOT_TABLES:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def run(config: SeedConfig, reset: bool) -> int:
+    if reset:
+        await seed(config, reset=True)
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().lower().startswith('select'):
+            captured.append((statement, parameters))
+
+    event.listen(get_engine().sync_engine, 'before_cursor_execute', capture)
+    headers = {'Authorization': f'Bearer {access_token(1, ["admin"])}'}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url='http://bench', headers=headers) as client:
+        for route in routes(config):
+            response = await client.get(route)
+            response.raise_for_status()
+            after = response.json().get('next_cursor') if route.startswith('/products/?') else None
+            if after:
+                (await client.get(f'{route}&after={after}')).raise_for_status()
+    event.remove(get_engine().sync_engine, 'before_cursor_execute', capture)
+
+    failures = 0
+    async with get_engine().connect() as conn:
+        for statement, parameters in dict.fromkeys(captured):
+            plan = (await conn.exec_driver_sql(f'explain (format json) {statement}', parameters)).scalar()
+            plan = orjson.loads(plan) if isinstance(plan, (str, bytes)) else plan
+            tables = seq_scans(plan[0]['Plan'])
+            if tables:
+                failures += 1
+                print(f'Seq Scan on {", ".join(tables)}:\n{statement}\n')
+    await dispose_engines()
+    print(f'{len(set(captured))} statements checked, {failures} with sequential scans on hot tables')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    parser = config_parser('Fail if a hot query plans a sequential scan')
+    parser.set_defaults(products=200_000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(config_from_args(args), args.reset)))
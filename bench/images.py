@@ -0,0 +1,89 @@
+"""
+Нагрузочный замер загрузки изображений товаров: параллельные загрузки
+уникальных JPEG (ресайз в пуле процессов) и повторные загрузки тех же файлов
+(дедупликация по sha256). Во время замера отдельная задача измеряет задержку
+event loop - при ресайзе в процессах она должна оставаться в пределах миллисекунд.
+
+    python -m bench.images --uploads 200 --concurrency 8 --width 4000 --height 3000
+"""
+from httpx import ASGITransport, AsyncClient
+from io import BytesIO
+from PIL import Image
+from random import Random
+from time import perf_counter
+import asyncio
+import statistics
+
+from bench.seed import seed, access_token, config_parser, config_from_args
+
+
+def make_jpeg(rnd: Random, width: int, height: int) -> bytes:
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    image.paste(tuple(rnd.randrange(256) for _ in range(3)), (0, 0, width // 3, height // 3))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+async def loop_lag(samples: list[float], interval: float = 0.005) -> None:
+    while True:
+        started = perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(perf_counter() - started - interval)
+
+
+async def upload_all(client: AsyncClient, images: list[bytes], products: int, concurrency: int,
+                     token: str) -> tuple[list[float], dict[int, int]]:
+    limit = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def upload(i: int):
+        async with limit:
+            started = perf_counter()
+            response = await client.post(f'/products/product-{1 + i % products}/image',
+                                         files={'image': (f'{i}.jpg', images[i], 'image/jpeg')},
+                                         headers={'Authorization': f'Bearer {token}'})
+            latencies.append(perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(upload(i) for i in range(len(images))))
+    return latencies, statuses
+
+
+def report(name: str, latencies: list[float], statuses: dict[int, int], lag: list[float]) -> None:
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f'{name:>12}: p50 {cuts[49] * 1000:.0f} ms, p95 {cuts[94] * 1000:.0f} ms, p99 {cuts[98] * 1000:.0f} ms, '
+          f'statuses {statuses}, loop lag max {max(lag, default=0) * 1000:.1f} ms')
+
+
+async def run(args) -> None:
+    config = config_from_args(args)
+    if args.reset:
+        await seed(config, reset=True)
+    rnd = Random(config.seed)
+    images = [make_jpeg(rnd, args.width, args.height) for _ in range(args.uploads)]
+    token = access_token(1, ['admin'])
+
+    from app.main import app
+    lifespan = app.router.lifespan_context(app)
+    await lifespan.__aenter__()
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url='http://bench', timeout=120) as client:
+            for name in ('processed', 'deduplicated'):
+                lag: list[float] = []
+                ticker = asyncio.create_task(loop_lag(lag))
+                latencies, statuses = await upload_all(client, images, config.products, args.concurrency, token)
+                ticker.cancel()
+                report(name, latencies, statuses, lag)
+    finally:
+        await lifespan.__aexit__(None, None, None)
+
+
+if __name__ == '__main__':
+    parser = config_parser('Benchmark product image uploads')
+    parser.add_argument('--uploads', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    asyncio.run(run(parser.parse_args()))
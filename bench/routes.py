@@ -0,0 +1,256 @@
+"""
+Бенчмарк всех маршрутов auth, category, products, reviews и orders. Приложение
+запускается в процессе через httpx.ASGITransport либо отдельным uvicorn,
+база заполняется генератором bench.seed. Для каждого сценария считаются
+пропускная способность, p50/p95/p99 и число SQL-запросов на запрос
+(из заголовка Server-Timing). Результат сохраняется в JSON и может
+сравниваться с сохраненным baseline.
+
+    python -m bench.routes --reset --requests 500 --concurrency 16 --output bench/results.json
+    python -m bench.routes --uvicorn --baseline bench/baseline.json
+"""
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from httpx import ASGITransport, AsyncClient
+from time import perf_counter, time
+from typing import Any, Callable
+import asyncio
+import orjson
+import re
+import statistics
+import subprocess
+import sys
+
+from bench.seed import SeedConfig, PASSWORD, seed, access_token, config_parser, config_from_args
+
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@dataclass
+class Scenario:
+
+    name: str
+    method: str
+    path: Callable[[int], str]
+    token: Callable[[int], str | None]
+    json: Callable[[int], Any] | None = None
+    data: Callable[[int], dict[str, str]] | None = None
+    content: Callable[[int], bytes] | None = None
+    content_type: str | None = None
+    headers: dict[str, str] | None = None
+    max_requests: int | None = None
+
+
+@lru_cache(maxsize=None)
+def token(user_id: int, scope: str) -> str:
+    return access_token(user_id, [scope])
+
+
+def scenarios(config: SeedConfig) -> list[Scenario]:
+    run = int(time())
+    admin = lambda i: token(1, 'admin')
+    supplier = lambda i: token(2, 'supplier')
+    customer = lambda i: token(config.users - config.reviewers, 'customer')
+    reviewer = lambda i: token(config.users - config.reviewers + 1 + i % config.reviewers, 'customer')
+    # покупатели делятся на непересекающиеся диапазоны: меняющие пользователей
+    # сценарии не трогают ни чужие диапазоны, ни владельца токена customer
+    first_customer = config.suppliers + 2
+    last_customer = config.users - config.reviewers
+    login_users = range(first_customer, min(first_customer + 100, last_customer))
+    role_users = range(login_users.stop, login_users.stop + (last_customer - login_users.stop) // 2)
+    deleted_users = range(role_users.stop, last_customer)
+    middle = config.products // 2
+
+    return [
+        Scenario('auth.create_user', 'POST', lambda i: '/auth/', lambda i: None,
+                 json=lambda i: {'first_name': 'Bench', 'last_name': 'User', 'username': f'bench{run}x{i}',
+                                 'email': f'bench{run}x{i}@bench.local', 'password': PASSWORD}),
+        Scenario('auth.login', 'POST', lambda i: '/auth/login', lambda i: None,
+                 data=lambda i: {'username': f'user{login_users[i % len(login_users)]}', 'password': PASSWORD}),
+        Scenario('auth.read_current_user', 'GET', lambda i: '/auth/users/me', customer),
+        Scenario('auth.supplier_role', 'PATCH',
+                 lambda i: f'/auth/{"add_supplier" if i % 2 == 0 else "revoke_supplier"}/{role_users[i // 2]}',
+                 admin, max_requests=2 * len(role_users)),
+        Scenario('auth.delete_user', 'DELETE', lambda i: f'/auth/delete_user/{deleted_users[i]}', admin,
+                 max_requests=len(deleted_users)),
+
+        Scenario('category.get_all_categories', 'GET', lambda i: '/categories/', customer),
+        Scenario('category.create_category', 'POST', lambda i: '/categories/', admin,
+                 json=lambda i: {'name': f'Bench category {run} {i}', 'parent_id': 1 + i % config.categories}),
+        Scenario('category.update_category', 'PUT', lambda i: f'/categories/category-{1 + i % config.categories}',
+                 admin, json=lambda i: {'name': f'category {1 + i % config.categories}'}),
+        Scenario('category.delete_category', 'DELETE',
+                 lambda i: f'/categories/category-{config.categories - i % (config.categories // 4 or 1)}', admin),
+
+        Scenario('products.all_products', 'GET', lambda i: '/products/?limit=50', customer),
+        Scenario('products.product_by_category', 'GET',
+                 lambda i: f'/products/category/category-{1 + i % config.categories}?limit=50', customer),
+        Scenario('products.search_products', 'GET', lambda i: f'/products/search?q={["lamp", "chair pro", "phonemax"][i % 3]}',
+                 customer),
+        Scenario('products.product_detail', 'GET', lambda i: f'/products/detail/product-{1 + i % config.products}',
+                 customer),
+        # If-None-Match: * - 304 для любой существующей версии, только проверка версии
+        Scenario('products.product_detail_not_modified', 'GET',
+                 lambda i: f'/products/detail/product-{1 + i % config.products}', customer,
+                 headers={'If-None-Match': '*'}),
+        Scenario('products.create_product', 'POST', lambda i: '/products/', supplier,
+                 json=lambda i: {'name': f'Bench product {run} {i}', 'description': 'benchmark', 'price': 100,
+                                 'image_url': '', 'stock': 10, 'category_id': 1}),
+        Scenario('products.bulk_create_products', 'POST', lambda i: '/products/bulk', supplier,
+                 content=lambda i: b'\n'.join(orjson.dumps({
+                     'name': f'Bench bulk {run} {i} {j}', 'description': 'benchmark', 'price': 100,
+                     'image_url': '', 'stock': 10, 'category_id': 1
+                 }) for j in range(100)), content_type='application/x-ndjson'),
+        Scenario('products.bulk_update_products', 'PATCH', lambda i: '/products/bulk', admin,
+                 json=lambda i: [{'slug': f'product-{1 + (i * 100 + j) % config.products}', 'stock': 1 + i % 50}
+                                 for j in range(100)]),
+        Scenario('products.update_product', 'PUT', lambda i: f'/products/product-{middle + i % 1000}', admin,
+                 json=lambda i: {'name': f'product {middle + i % 1000}', 'description': 'benchmark',
+                                 'price': 100 + i, 'image_url': '', 'stock': 10, 'category_id': 1}),
+        Scenario('products.delete_product', 'DELETE', lambda i: f'/products/product-{config.products - i}', admin,
+                 max_requests=config.products // 10),
+
+        Scenario('reviews.all_reviews', 'GET', lambda i: '/reviews/', customer, max_requests=20),
+        Scenario('reviews.products_reviews', 'GET', lambda i: f'/reviews/product/product-{1 + i % config.products}',
+                 customer),
+        Scenario('reviews.add_review', 'POST', lambda i: f'/reviews/product/product-{1 + i // config.reviewers}',
+                 reviewer, json=lambda i: {'comment': 'benchmark review text', 'grade': 1 + i % 10}),
+        Scenario('reviews.delete_reviews', 'DELETE', lambda i: f'/reviews/{1 + i}', admin),
+
+        Scenario('orders.checkout', 'POST', lambda i: '/orders/', reviewer,
+                 json=lambda i: {'items': [{'product_id': 1 + (i * 7 + j) % config.products, 'quantity': 1}
+                                           for j in range(3)]}),
+        Scenario('orders.user_orders', 'GET', lambda i: '/orders/?limit=20', reviewer),
+    ]
+
+
+async def run_scenario(client: AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> dict[str, Any]:
+    if scenario.max_requests is not None:
+        requests = max(min(requests, scenario.max_requests), 1)
+    latencies: list[float] = []
+    queries: list[int] = []
+    statuses: Counter[int] = Counter()
+    iterations = iter(range(requests))
+
+    async def worker():
+        for i in iterations:
+            headers = dict(scenario.headers or {})
+            bearer = scenario.token(i)
+            if bearer:
+                headers['Authorization'] = f'Bearer {bearer}'
+            if scenario.content_type:
+                headers['Content-Type'] = scenario.content_type
+            started = perf_counter()
+            response = await client.request(
+                scenario.method, scenario.path(i), headers=headers,
+                json=scenario.json(i) if scenario.json else None,
+                data=scenario.data(i) if scenario.data else None,
+                content=scenario.content(i) if scenario.content else None
+            )
+            latencies.append(perf_counter() - started)
+            statuses[response.status_code] += 1
+            match = QUERIES.search(response.headers.get('server-timing', ''))
+            if match:
+                queries.append(int(match.group(1)))
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': cuts[49] * 1000,
+        'p95_ms': cuts[94] * 1000,
+        'p99_ms': cuts[98] * 1000,
+        'db_queries_per_request': statistics.fmean(queries) if queries else None,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())}
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {previous["p95_ms"]:.1f} -> {current["p95_ms"]:.1f} ms')
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f'{name}: throughput {previous["throughput_rps"]:.0f} -> '
+                               f'{current["throughput_rps"]:.0f} rps')
+        if (current['db_queries_per_request'] or 0) > (previous['db_queries_per_request'] or 0) + 0.5:
+            regressions.append(f'{name}: db queries {previous["db_queries_per_request"]} -> '
+                               f'{current["db_queries_per_request"]}')
+    return regressions
+
+
+async def start_uvicorn(port: int) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--no-access-log'])
+    async with AsyncClient() as client:
+        for _ in range(300):
+            try:
+                await client.get(f'http://127.0.0.1:{port}/docs')
+                return process
+            except OSError:
+                await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('uvicorn did not start')
+
+
+async def run(args) -> int:
+    config = config_from_args(args)
+    if args.reset:
+        await seed(config, reset=True)
+
+    process = None
+    if args.uvicorn:
+        process = await start_uvicorn(args.port)
+        client = AsyncClient(base_url=f'http://127.0.0.1:{args.port}', timeout=60)
+        lifespan = None
+    else:
+        from app.main import app
+        client = AsyncClient(transport=ASGITransport(app=app), base_url='http://bench', timeout=60)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+
+    results = {}
+    try:
+        async with client:
+            for scenario in scenarios(config):
+                if args.only and not any(part in scenario.name for part in args.only):
+                    continue
+                results[scenario.name] = await run_scenario(client, scenario, args.requests, args.concurrency)
+                print(scenario.name, results[scenario.name])
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        with open(args.output, 'wb') as file:
+            file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    if args.baseline:
+        with open(args.baseline, 'rb') as file:
+            regressions = compare(results, orjson.loads(file.read()), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    parser = config_parser('Benchmark every route of the application')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--only', nargs='*', help='run scenarios whose name contains one of these')
+    parser.add_argument('--uvicorn', action='store_true', help='benchmark a real uvicorn process')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a stored results file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    sys.exit(asyncio.run(run(parser.parse_args())))
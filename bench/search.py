@@ -0,0 +1,46 @@
+"""
+Нагрузочный замер поиска по товарам: p50/p95/p99 латентности search_products
+на заполненной таблице. База берется из тех же переменных окружения, что и у приложения.
+
+    python -m bench.search --products 1000000 --queries 2000 --reset
+"""
+from random import Random
+from time import perf_counter
+import asyncio
+import statistics
+
+from app.backend.db import AsyncSession, dispose_engines
+from app.backend.pagination import Page, paginate
+from app.backend.search import search_stmt
+from bench.seed import WORDS, SeedConfig, seed, config_parser, config_from_args
+
+
+async def run(config: SeedConfig, queries: int, limit: int, reset: bool) -> dict[str, float]:
+    rnd = Random(config.seed)
+    if reset:
+        await seed(config, reset=True)
+    timings = []
+    async with AsyncSession() as session:
+        for _ in range(queries):
+            q = ' '.join(rnd.choices(WORDS, k=rnd.randint(1, 2)))
+            started = perf_counter()
+            stmt, keys = search_stmt(session, q)
+            (await session.execute(paginate(stmt, Page(limit=limit), keys, descending=True))).all()
+            timings.append(perf_counter() - started)
+    await dispose_engines()
+    cuts = statistics.quantiles(timings, n=100)
+    return {
+        'queries': queries,
+        'p50_ms': cuts[49] * 1000,
+        'p95_ms': cuts[94] * 1000,
+        'p99_ms': cuts[98] * 1000
+    }
+
+
+if __name__ == '__main__':
+    parser = config_parser('Benchmark product full-text search')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.set_defaults(products=1_000_000)
+    args = parser.parse_args()
+    print(asyncio.run(run(config_from_args(args), args.queries, args.limit, args.reset)))
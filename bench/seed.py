@@ -0,0 +1,190 @@
+"""
+Детерминированный генератор тестовых данных для бенчмарков: пользователи,
+вложенные категории, товары, оценки и отзывы. Идентификаторы задаются явно,
+поэтому при одинаковом seed получается одна и та же база.
+
+    python -m bench.seed --products 200000 --reset
+"""
+from argparse import ArgumentParser
+from dataclasses import dataclass, asdict
+from random import Random
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+
+from app.backend.db import AsyncSession as Session, get_engine
+from app.models.models import Base, User, Category, Product, Rating, Review
+from app.routers.auth import bcrypt_context, create_access_token, token_expires
+
+
+WORDS = [f'{stem}{suffix}' for stem in ('lamp', 'chair', 'phone', 'table', 'cable', 'shoe', 'watch', 'bag',
+                                        'shirt', 'kettle', 'drill', 'glass', 'towel', 'pillow', 'mouse')
+         for suffix in ('', 'pro', 'max', 'mini', 'lite', 'plus', 'air', 'neo')]
+
+PASSWORD = 'bench'
+
+
+@dataclass
+class SeedConfig:
+
+    users: int = 1000
+    suppliers: int = 50
+    reviewers: int = 100
+    categories: int = 200
+    category_depth: int = 4
+    products: int = 100_000
+    ratings_per_product: int = 5
+    seed: int = 1007
+    batch_size: int = 5000
+
+
+async def reset_schema() -> None:
+    async with get_engine().begin() as conn:
+        schema = Base.metadata.schema
+        if conn.dialect.name == 'postgresql':
+            await conn.execute(text(f'create schema if not exists {schema}'))
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def insert_batches(session: AsyncSession, model, rows, batch_size: int) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            await session.execute(insert(model), batch)
+            batch = []
+    if batch:
+        await session.execute(insert(model), batch)
+
+
+def users(config: SeedConfig):
+    # один хэш на всех пользователей, чтобы не тратить время на bcrypt при генерации
+    password_hash = bcrypt_context.hash(PASSWORD)
+    for i in range(1, config.users + 1):
+        yield {
+            'id': i,
+            'first_name': f'First{i}',
+            'last_name': f'Last{i}',
+            'username': f'user{i}',
+            'email': f'user{i}@bench.local',
+            'hashed_password': password_hash,
+            'is_admin': i == 1,
+            'is_supplier': 1 < i <= config.suppliers + 1,
+            'is_customer': i > config.suppliers + 1
+        }
+
+
+def categories(config: SeedConfig, rnd: Random):
+    paths = {}
+    for i in range(1, config.categories + 1):
+        candidates = [cid for cid, path in paths.items() if path.count('/') - 1 < config.category_depth]
+        parent_id = rnd.choice(candidates) if candidates and rnd.random() > 0.2 else None
+        paths[i] = (paths[parent_id] if parent_id else '/') + f'{i}/'
+        yield {
+            'id': i,
+            'name': f'Category {i}',
+            'slug': f'category-{i}',
+            'parent_id': parent_id,
+            'path': paths[i]
+        }
+
+
+def catalog(config: SeedConfig, rnd: Random):
+    """
+    Товары вместе с оценками и отзывами: счетчики рейтинга считаются сразу,
+    так как массовая вставка не вызывает ORM-события Rating
+    """
+    # последние reviewers покупателей остаются без оценок - для бенчмарка добавления отзывов
+    customers = range(config.suppliers + 2, config.users - config.reviewers + 1)
+    products, ratings, reviews = [], [], []
+    rating_id = 0
+    for i in range(1, config.products + 1):
+        grades = []
+        count = min(len(customers), rnd.randint(0, 2 * config.ratings_per_product))
+        for user_id in rnd.sample(customers, count):
+            rating_id += 1
+            grade = rnd.randint(1, 10)
+            grades.append(grade)
+            ratings.append({'id': rating_id, 'grade': grade, 'user_id': user_id, 'product_id': i})
+            reviews.append({'id': rating_id, 'user_id': user_id, 'product_id': i, 'rating_id': rating_id,
+                            'comment': ' '.join(rnd.choices(WORDS, k=8))})
+        products.append({
+            'id': i,
+            'name': ' '.join(rnd.choices(WORDS, k=3)) + f' {i}',
+            'slug': f'product-{i}',
+            'description': ' '.join(rnd.choices(WORDS, k=20)),
+            'price': rnd.randint(1, 100000),
+            'image_url': '',
+            'stock': rnd.choice((0, rnd.randint(1, 100), rnd.randint(1, 100), rnd.randint(1, 100))),
+            'supplier_id': rnd.randint(2, config.suppliers + 1) if config.suppliers else None,
+            'category_id': rnd.randint(1, config.categories) if config.categories else None,
+            'rating': round(sum(grades) / len(grades), 2) if grades else 0.0,
+            'rating_sum': sum(grades),
+            'rating_count': len(grades),
+            'is_active': rnd.random() > 0.05
+        })
+        if len(products) >= config.batch_size:
+            yield products, ratings, reviews
+            products, ratings, reviews = [], [], []
+    if products:
+        yield products, ratings, reviews
+
+
+async def reset_sequences(session: AsyncSession) -> None:
+    if session.bind.dialect.name != 'postgresql':
+        return
+    for model in (User, Category, Product, Rating, Review):
+        table = model.__table__.fullname
+        await session.execute(text(
+            f"select setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) from {table}"
+        ))
+
+
+async def seed(config: SeedConfig, reset: bool = False) -> None:
+    rnd = Random(config.seed)
+    if reset:
+        await reset_schema()
+    async with Session() as session:
+        await insert_batches(session, User, users(config), config.batch_size)
+        await insert_batches(session, Category, categories(config, rnd), config.batch_size)
+        for products, ratings, reviews in catalog(config, rnd):
+            await session.execute(insert(Product), products)
+            if ratings:
+                await session.execute(insert(Rating), ratings)
+                await session.execute(insert(Review), reviews)
+            await session.commit()
+        await reset_sequences(session)
+        await session.commit()
+    if get_engine().dialect.name == 'postgresql':
+        async with get_engine().connect() as conn:
+            await conn.execution_options(isolation_level='AUTOCOMMIT')
+            await conn.execute(text('analyze'))
+
+
+def access_token(user_id: int, scopes: list[str]) -> str:
+    return create_access_token({
+        'sub': f'user{user_id}',
+        'user_id': user_id,
+        'first_name': f'First{user_id}',
+        'last_name': f'Last{user_id}',
+        'email': f'user{user_id}@bench.local',
+        'scopes': scopes
+    }, expires_delta=token_expires())
+
+
+def config_parser(description: str) -> ArgumentParser:
+    parser = ArgumentParser(description=description)
+    for field, default in asdict(SeedConfig()).items():
+        parser.add_argument(f'--{field.replace("_", "-")}', type=int, default=default)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate all tables first')
+    return parser
+
+
+def config_from_args(args) -> SeedConfig:
+    return SeedConfig(**{field: getattr(args, field) for field in asdict(SeedConfig())})
+
+
+if __name__ == '__main__':
+    args = config_parser('Seed the database with deterministic benchmark data').parse_args()
+    asyncio.run(seed(config_from_args(args), reset=args.reset))
@@ -0,0 +1,67 @@
+"""
+Сравнение путей сериализации списка товаров на больших выборках (по умолчанию
+100 000 строк): ORM-сущности с прежним .attrs через getattr по колонкам,
+ORM-сущности с attrgetter по маппер-колонкам и выборка колонок без ORM
+с передачей строк сразу в orjson. Печатает rows/s для каждого пути.
+
+    python -m bench.serialize --rows 100000 --rounds 5 --reset
+"""
+from sqlalchemy import select
+from time import perf_counter
+import asyncio
+import orjson
+
+from app.backend.db import AsyncSession, dispose_engines
+from app.models.models import Product
+from bench.seed import seed, config_parser, config_from_args
+
+
+def getattr_attrs(product: Product) -> dict:
+    return {col.key: getattr(product, col.key) for col in list(product.__table__.columns)}
+
+
+async def orm_getattr(rows: int) -> bytes:
+    async with AsyncSession() as session:
+        products = await session.scalars(select(Product).order_by(Product.id).limit(rows))
+        return orjson.dumps([getattr_attrs(product) for product in products])
+
+
+async def orm_accessor(rows: int) -> bytes:
+    async with AsyncSession() as session:
+        products = await session.scalars(select(Product).order_by(Product.id).limit(rows))
+        return orjson.dumps([product.attrs for product in products])
+
+
+async def columns(rows: int) -> bytes:
+    async with AsyncSession() as session:
+        result = await session.execute(select(*Product.columns()).order_by(Product.id).limit(rows))
+        return orjson.dumps([row._asdict() for row in result])
+
+
+async def run(rows: int, rounds: int) -> dict[str, float]:
+    results = {}
+    for name, path in (('orm_getattr', orm_getattr), ('orm_accessor', orm_accessor), ('columns', columns)):
+        await path(rows)
+        best = float('inf')
+        for _ in range(rounds):
+            started = perf_counter()
+            await path(rows)
+            best = min(best, perf_counter() - started)
+        results[name] = rows / best
+        print(f'{name:>14}: {rows / best:,.0f} rows/s ({best * 1000:.0f} ms)')
+    print(f'columns vs orm_getattr: x{results["columns"] / results["orm_getattr"]:.2f}')
+    return results
+
+
+async def main(args) -> None:
+    if args.reset:
+        await seed(config_from_args(args), reset=True)
+    await run(args.rows, args.rounds)
+    await dispose_engines()
+
+
+if __name__ == '__main__':
+    parser = config_parser('Compare ORM and column-row serialization of product listings')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--rounds', type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
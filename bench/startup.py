@@ -0,0 +1,126 @@
+"""
+Замер запуска приложения: время импорта app.main в чистом процессе
+(с разбивкой по самым тяжелым модулям из -X importtime) и время до готовности -
+от старта процесса до выхода из lifespan (прогрев пула, кэшей и запросов)
+в процессе и до первого ответа отдельного uvicorn. Каждый замер делается
+в новом интерпретаторе, чтобы не мерить уже импортированные модули.
+
+    python -m bench.startup --rounds 5 --output bench/startup.json
+    python -m bench.startup --uvicorn --baseline bench/startup.json
+"""
+from argparse import ArgumentParser
+from httpx import get
+from time import perf_counter, sleep
+import orjson
+import statistics
+import subprocess
+import sys
+
+
+IMPORT = '''
+from time import perf_counter
+started = perf_counter()
+import app.main
+print(perf_counter() - started)
+'''
+
+READY = '''
+from time import perf_counter
+started = perf_counter()
+import asyncio
+from app.main import create_app
+
+async def ready():
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        print(perf_counter() - started)
+
+asyncio.run(ready())
+'''
+
+
+def measure(code: str) -> float:
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def heaviest_imports(top: int) -> list[tuple[str, float]]:
+    """
+    Модули с наибольшим собственным временем импорта (self, мс)
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app.main'],
+                            capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line.removeprefix('import time:').split('|')
+        modules.append((name.strip(), int(own) / 1000))
+    return sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+
+
+def uvicorn_ready(port: int) -> float:
+    started = perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app.main:create_app', '--factory',
+                                '--port', str(port), '--no-access-log'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(600):
+            try:
+                get(f'http://127.0.0.1:{port}/docs')
+                return perf_counter() - started
+            except OSError:
+                sleep(0.05)
+        raise RuntimeError('uvicorn did not start')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(timings: list[float]) -> dict[str, float]:
+    return {
+        'min_ms': min(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'max_ms': max(timings) * 1000
+    }
+
+
+def run(args) -> int:
+    results = {
+        'import': summary([measure(IMPORT) for _ in range(args.rounds)]),
+        'ready': summary([measure(READY) for _ in range(args.rounds)]),
+    }
+    if args.uvicorn:
+        results['uvicorn_ready'] = summary([uvicorn_ready(args.port) for _ in range(args.rounds)])
+    for name, result in results.items():
+        print(f'{name:>14}: median {result["median_ms"]:.0f} ms (min {result["min_ms"]:.0f}, '
+              f'max {result["max_ms"]:.0f})')
+    print('heaviest imports:')
+    for name, own in heaviest_imports(args.top):
+        print(f'{own:>10.1f} ms  {name}')
+
+    if args.output:
+        with open(args.output, 'wb') as file:
+            file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    if args.baseline:
+        with open(args.baseline, 'rb') as file:
+            baseline = orjson.loads(file.read())
+        regressions = [f'{name}: median {baseline[name]["median_ms"]:.0f} -> {result["median_ms"]:.0f} ms'
+                       for name, result in results.items()
+                       if name in baseline and result['median_ms'] > baseline[name]['median_ms'] * (1 + args.tolerance)]
+        for regression in regressions:
+            print('REGRESSION', regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Measure import time and time-to-ready of the application')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='how many of the heaviest imports to print')
+    parser.add_argument('--uvicorn', action='store_true', help='also measure a real uvicorn process')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare against a stored results file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    sys.exit(run(parser.parse_args()))
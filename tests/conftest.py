@@ -0,0 +1,189 @@
+from datetime import datetime
+from time import monotonic
+from typing import Iterable
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+import pytest
+
+from app.backend.cache import CacheBackend
+from app.backend.db import get_engine, get_read_engine, dispose_engines
+from app.backend.settings import Settings, use_settings
+from app.main import create_app
+from app.models.models import Base, Category, Product, User
+from app.routers.auth import create_access_token, token_expires
+
+
+ADMIN = {'id': 1, 'first_name': 'Admin', 'last_name': 'Admin', 'username': 'admin',
+         'email': 'admin@example.com', 'hashed_password': '-', 'is_admin': True,
+         'is_supplier': False, 'is_customer': False}
+CUSTOMER = {'id': 2, 'first_name': 'Customer', 'last_name': 'Customer', 'username': 'customer',
+            'email': 'customer@example.com', 'hashed_password': '-', 'is_admin': False,
+            'is_supplier': False, 'is_customer': True}
+SUPPLIER = {'id': 3, 'first_name': 'Supplier', 'last_name': 'Supplier', 'username': 'supplier',
+            'email': 'supplier@example.com', 'hashed_password': '-', 'is_admin': False,
+            'is_supplier': True, 'is_customer': False}
+CATEGORY = {'id': 1, 'name': 'Electronics', 'slug': 'electronics', 'path': '/1/'}
+PRODUCT = {'id': 1, 'name': 'Phone', 'slug': 'phone', 'description': 'Smartphone', 'price': 100,
+           'image_url': '', 'stock': 10, 'category_id': 1, 'rating': 0}
+
+
+@event.listens_for(Engine, 'connect')
+def sqlite_schema(dbapi_connection, connection_record):
+    """
+    Схема ecommerce_fastapi в sqlite - присоединенный файл рядом с основным,
+    clock_timestamp() - функция Python
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('pragma database_list')
+    path = next(row[2] for row in cursor.fetchall() if row[1] == 'main')
+    cursor.execute('attach database ? as ecommerce_fastapi', (f'{path}.schema',))
+    cursor.close()
+    dbapi_connection.create_function('clock_timestamp', 0, lambda: datetime.now().isoformat(' '))
+
+
+class SharedBackend(CacheBackend):
+    """
+    Общее для воркеров хранилище - замена Redis в тестах: все состояние в одном
+    словаре, каждая операция атомарна, как скрипт Redis
+    """
+
+    def __init__(self):
+        self.store: dict[str, object] = {'sequence': 0}
+
+    async def sequence(self) -> int:
+        return self.store['sequence']
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self.store.get(f'entry:{key}')
+        if entry is None or entry[0] <= monotonic():
+            return None
+        return entry[1]
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        tags: Iterable[str],
+        ttl: float,
+        since: int,
+        lag: float = 0
+    ) -> bool:
+        tags = set(tags)
+        settled = monotonic() - lag
+        for tag in tags:
+            sequence, invalidated_at = self.store.get(f'invalidated:{tag}', (0, 0))
+            if sequence > since or invalidated_at > settled:
+                return False
+        self.store[f'entry:{key}'] = (monotonic() + ttl, value)
+        for tag in tags:
+            self.store.setdefault(f'tag:{tag}', set()).add(key)
+        return True
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        self.store['sequence'] += 1
+        for tag in tags:
+            self.store[f'invalidated:{tag}'] = (self.store['sequence'], monotonic())
+            for key in self.store.pop(f'tag:{tag}', ()):
+                self.store.pop(f'entry:{key}', None)
+
+
+@pytest.fixture
+def shared_backend() -> SharedBackend:
+    return SharedBackend()
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+def sqlite_settings(tmp_path, **overrides) -> Settings:
+    return Settings(
+        db_language='sqlite',
+        db_driver='aiosqlite',
+        db_username=None,
+        db_password=None,
+        db_host=None,
+        db_port=None,
+        db_database=str(tmp_path / 'primary.db'),
+        secret_key='test',
+        expires=3600,
+        algorithm='HS256',
+        db_read={'database': str(tmp_path / 'replica.db')},
+        # stdout перехватывается pytest и закрывается раньше, чем поток лога
+        access_log_sink=str(tmp_path / 'access.log'),
+        **overrides
+    )
+
+
+async def seed(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [ADMIN, CUSTOMER, SUPPLIER])
+        await conn.execute(insert(Category), [CATEGORY])
+        await conn.execute(insert(Product), [PRODUCT])
+
+
+@pytest.fixture
+async def settings(tmp_path):
+    """
+    Две sqlite-базы с одинаковыми данными: основная и реплика
+    """
+    settings = sqlite_settings(tmp_path)
+    use_settings(settings)
+    await seed(get_engine())
+    await seed(get_read_engine())
+    yield settings
+    await dispose_engines()
+
+
+@pytest.fixture
+async def client(settings):
+    async with AsyncClient(transport=ASGITransport(app=create_app()), base_url='http://test') as client:
+        yield client
+
+
+def bearer(user: dict, scopes: list[str]) -> dict[str, str]:
+    token = create_access_token({'sub': user['username'], 'user_id': user['id'], 'scopes': scopes},
+                                expires_delta=token_expires())
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def admin_headers(settings) -> dict[str, str]:
+    return bearer(ADMIN, ['admin'])
+
+
+@pytest.fixture
+def customer_headers(settings) -> dict[str, str]:
+    return bearer(CUSTOMER, ['customer'])
+
+
+@pytest.fixture
+def supplier_headers(settings) -> dict[str, str]:
+    return bearer(SUPPLIER, ['supplier'])
+
+
+@pytest.fixture
+def promoted_headers(settings) -> dict[str, str]:
+    """
+    Токен покупателя, получившего роль поставщика
+    """
+    return bearer(CUSTOMER, ['supplier'])
+
+
+@pytest.fixture
+def statements(settings):
+    """
+    SQL, отправленный в основную базу за время теста
+    """
+    executed = []
+    engine = get_engine().sync_engine
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', capture)
@@ -0,0 +1,82 @@
+from dataclasses import replace
+from time import sleep
+import pytest
+
+from app.backend.settings import use_settings
+from app.middleware.log import BatchedWriter, access_log
+
+
+def test_lines_held_until_interval(tmp_path):
+    sink = tmp_path / 'access.log'
+    writer = BatchedWriter(str(sink), batch_size=100, interval=0.5, max_queue=100)
+    writer.write(b'first\n')
+    sleep(0.1)
+    writer.write(b'second\n')
+    sleep(0.1)
+
+    assert sink.read_bytes() == b''
+    sleep(0.6)
+    assert sink.read_bytes() == b'first\nsecond\n'
+    writer.close()
+
+
+def test_full_batch_written_before_interval(tmp_path):
+    sink = tmp_path / 'access.log'
+    writer = BatchedWriter(str(sink), batch_size=2, interval=10, max_queue=100)
+    writer.write(b'first\n')
+    writer.write(b'second\n')
+    sleep(0.2)
+
+    assert sink.read_bytes() == b'first\nsecond\n'
+    writer.close()
+
+
+def test_close_flushes_pending_lines(tmp_path):
+    sink = tmp_path / 'access.log'
+    writer = BatchedWriter(str(sink), batch_size=100, interval=10, max_queue=100)
+    writer.write(b'last\n')
+    writer.close()
+
+    assert sink.read_bytes() == b'last\n'
+
+
+class FlakySink:
+
+    def __init__(self):
+        self.failures = 1
+        self.lines = b''
+
+    def write(self, data: bytes) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError('disk full')
+        self.lines += data
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_write_error_does_not_stop_writer(tmp_path, capsys):
+    writer = BatchedWriter(str(tmp_path / 'access.log'), batch_size=1, interval=10, max_queue=100)
+    writer._stream = sink = FlakySink()
+    writer.write(b'lost\n')
+    sleep(0.2)
+    writer.write(b'kept\n')
+    writer.close()
+
+    assert sink.lines == b'kept\n'
+    assert 'disk full' in capsys.readouterr().err
+
+
+@pytest.mark.anyio
+async def test_settings_change_stops_writer(settings, tmp_path):
+    use_settings(replace(settings, access_log_sink=str(tmp_path / 'access.log')))
+    access_log.write(b'line\n')
+    thread = access_log._thread
+
+    use_settings(settings)
+    assert not thread.is_alive()
+    assert (tmp_path / 'access.log').read_bytes() == b'line\n'
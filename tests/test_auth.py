@@ -0,0 +1,32 @@
+from dataclasses import replace
+from sqlalchemy import update
+import jwt
+import pytest
+
+from app.backend.db import dispose_engines, get_engine
+from app.backend.settings import use_settings
+from app.models.models import User
+from app.routers.auth import bcrypt_context
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def stateless(settings):
+    await dispose_engines()
+    use_settings(replace(settings, auth_stateless=True))
+    async with get_engine().begin() as conn:
+        await conn.execute(update(User).where(User.id == 2).values(hashed_password=bcrypt_context.hash('secret')))
+
+
+async def test_token_carries_no_profile(client, stateless, settings):
+    response = await client.post('/auth/login', data={'username': 'customer', 'password': 'secret'})
+    token = response.json()['access_token']
+    claims = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+
+    assert set(claims) == {'sub', 'user_id', 'scopes', 'iat', 'exp'}
+
+    response = await client.get('/auth/users/me', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.json()['email'] == 'customer@example.com'
@@ -0,0 +1,72 @@
+from sqlalchemy import insert, select
+import orjson
+import pytest
+
+from app.backend.db import get_engine
+from app.models.models import Product
+
+
+pytestmark = pytest.mark.anyio
+
+
+def ndjson(*names: str) -> bytes:
+    return b'\n'.join(orjson.dumps({'name': name, 'description': 'Item', 'price': 10, 'stock': 1,
+                                    'category_id': 1}) for name in names)
+
+
+async def test_repeated_slugs_get_suffixes(client, admin_headers):
+    response = await client.post('/products/bulk', content=ndjson('Phone 2'), headers=admin_headers)
+    assert response.json()['inserted'] == 1
+
+    response = await client.post('/products/bulk', content=ndjson('Phone', 'phone', 'Phone!', 'Phone 2'),
+                                 headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.json()['errors'] == []
+    # phone и phone-2 уже в базе: первые строки с этими именами их обновляют
+    assert (response.json()['inserted'], response.json()['updated']) == (2, 2)
+    for slug in ('phone-3', 'phone-4'):
+        assert (await client.get(f'/products/detail/{slug}', headers=admin_headers)).status_code == 200
+
+
+@pytest.fixture
+async def lamp(settings):
+    # товар поставщика SUPPLIER
+    async with get_engine().begin() as conn:
+        await conn.execute(insert(Product), [{'id': 2, 'name': 'Lamp', 'slug': 'lamp', 'description': 'Lamp',
+                                              'price': 30, 'image_url': '', 'stock': 1, 'category_id': 1,
+                                              'rating': 0, 'supplier_id': 3}])
+
+
+async def stock_price(slug: str) -> tuple[int, int]:
+    async with get_engine().connect() as conn:
+        return tuple((await conn.execute(select(Product.stock, Product.price).where(Product.slug == slug))).one())
+
+
+async def test_stock_price_result_buckets(client, admin_headers, lamp):
+    response = await client.patch('/products/bulk', json=[{'slug': 'phone', 'stock': 3},
+                                                          {'id': 2, 'stock': 1, 'price': 30},
+                                                          {'id': 1, 'price': 90},
+                                                          {'slug': 'missing', 'stock': 1},
+                                                          {'id': 99, 'price': 1}],
+                                  headers=admin_headers)
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report['changed'], report['unchanged'], report['missing']) == (['phone', 1], [2], ['missing', 99])
+    assert await stock_price('phone') == (3, 90)
+    assert await stock_price('lamp') == (1, 30)
+
+
+async def test_supplier_cannot_update_foreign_products(client, supplier_headers, lamp):
+    response = await client.patch('/products/bulk', json=[{'slug': 'lamp', 'stock': 5},
+                                                          {'slug': 'phone', 'stock': 0}],
+                                  headers=supplier_headers)
+
+    assert response.status_code == 401
+    assert response.json()['detail']['products'] == ['phone']
+    assert await stock_price('lamp') == (1, 30)
+
+    response = await client.patch('/products/bulk', json=[{'slug': 'lamp', 'stock': 5}], headers=supplier_headers)
+    assert response.json()['changed'] == ['lamp']
+    assert await stock_price('lamp') == (5, 30)
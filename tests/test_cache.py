@@ -0,0 +1,147 @@
+from asyncio import Event, create_task
+import orjson
+import pytest
+
+from app.backend.cache import MemoryBackend, ResponseCache
+from app.backend.db import read_only
+
+
+pytestmark = pytest.mark.anyio
+
+
+def loaded(content, *tags):
+    async def loader():
+        loader.calls += 1
+        return content, tags
+    loader.calls = 0
+    return loader
+
+
+@pytest.fixture(autouse=True)
+def replica_reads():
+    # как GET без недавней записи: кэш читается и заполняется
+    token = read_only.set(True)
+    yield
+    read_only.reset(token)
+
+
+@pytest.fixture(params=['memory', 'shared'])
+def backend(request):
+    if request.param == 'memory':
+        return MemoryBackend(maxsize=100)
+    return request.getfixturevalue('shared_backend')
+
+
+async def test_tags_pruned_on_lru_eviction():
+    backend = MemoryBackend(maxsize=2)
+    for number in range(3):
+        await backend.set(f'key{number}', b'{}', [f'tag{number}', 'all'], ttl=60, since=0)
+
+    assert await backend.get('key0') is None
+    assert backend._tags == {'tag1': {'key1'}, 'tag2': {'key2'}, 'all': {'key1', 'key2'}}
+
+
+async def test_tags_pruned_on_expiry():
+    backend = MemoryBackend(maxsize=2)
+    await backend.set('key', b'{}', ['tag'], ttl=-1, since=0)
+
+    assert await backend.get('key') is None
+    assert backend._tags == {}
+
+
+async def test_invalidate_removes_key_from_other_tags():
+    backend = MemoryBackend(maxsize=10)
+    await backend.set('key', b'{}', ['product:1', 'reviews:1'], ttl=60, since=0)
+    await backend.invalidate(['product:1'])
+
+    assert await backend.get('key') is None
+    assert backend._tags == {}
+
+
+async def test_invalidation_during_load_is_not_cached(backend):
+    cache = ResponseCache(backend, ttl=60)
+
+    async def stale_loader():
+        # запись и инвалидация успели пройти, пока загрузка читала старые данные
+        await cache.invalidate('product:1')
+        return {'price': 100}, ['product:1']
+
+    assert await cache.get_or_set('detail', '1', stale_loader) == orjson.dumps({'price': 100})
+    assert await backend.get('detail:1') is None
+
+    fresh = loaded({'price': 120}, 'product:1')
+    assert await cache.get_or_set('detail', '1', fresh) == orjson.dumps({'price': 120})
+    assert await backend.get('detail:1') == orjson.dumps({'price': 120})
+
+
+async def test_invalidation_on_other_worker_during_load(shared_backend):
+    shared = shared_backend
+    reader, writer = ResponseCache(shared, ttl=60), ResponseCache(shared, ttl=60)
+    reading, written = Event(), Event()
+
+    async def slow_loader():
+        reading.set()
+        await written.wait()
+        return {'price': 100}, ['product:1']
+
+    load = create_task(reader.get_or_set('detail', '1', slow_loader))
+    await reading.wait()
+    await writer.invalidate('product:1')
+    written.set()
+    await load
+
+    assert await shared.get('detail:1') is None
+
+
+async def test_workers_share_cached_response(shared_backend):
+    shared = shared_backend
+    first, second = ResponseCache(shared, ttl=60), ResponseCache(shared, ttl=60)
+    loader = loaded({'price': 100}, 'product:1')
+
+    await first.get_or_set('detail', '1', loader)
+    await second.get_or_set('detail', '1', loader)
+    assert loader.calls == 1
+
+    await second.invalidate('product:1')
+    await first.get_or_set('detail', '1', loader)
+    assert loader.calls == 2
+
+
+async def test_invalidate_detaches_in_flight_load():
+    cache = ResponseCache(MemoryBackend(maxsize=10), ttl=60)
+    reading, written = Event(), Event()
+
+    async def slow_loader():
+        reading.set()
+        await written.wait()
+        return {'price': 100}, ['product:1']
+
+    load = create_task(cache.get_or_set('detail', '1', slow_loader))
+    await reading.wait()
+    await cache.invalidate('product:1')
+    fresh = loaded({'price': 120}, 'product:1')
+
+    assert await cache.get_or_set('detail', '1', fresh) == orjson.dumps({'price': 120})
+    written.set()
+    assert await load == orjson.dumps({'price': 100})
+    assert await cache.backend.get('detail:1') == orjson.dumps({'price': 120})
+
+
+async def test_unrelated_invalidation_keeps_in_flight_load():
+    cache = ResponseCache(MemoryBackend(maxsize=10), ttl=60)
+    await cache.get_or_set('detail', '1', loaded({'price': 100}, 'product:1'))
+    await cache.invalidate('product:1')
+    reading, written = Event(), Event()
+
+    async def slow_loader():
+        reading.set()
+        await written.wait()
+        return {'price': 120}, ['product:1']
+
+    load = create_task(cache.get_or_set('detail', '1', slow_loader))
+    await reading.wait()
+    await cache.invalidate('product:2')
+    waiter = create_task(cache.get_or_set('detail', '1', loaded({'price': 0}, 'product:1')))
+    written.set()
+
+    assert await waiter == await load == orjson.dumps({'price': 120})
@@ -0,0 +1,28 @@
+from sqlalchemy import insert
+import pytest
+
+from app.backend.db import get_engine
+from app.models.models import Product
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def category_slugs(client, headers) -> list[str]:
+    response = await client.get('/products/category/electronics', headers=headers)
+    assert response.status_code == 200
+    return sorted(product['slug'] for product in response.json()['items'])
+
+
+async def test_deleted_category_leaves_subtree(client, admin_headers):
+    response = await client.post('/categories/', json={'name': 'Lamps', 'parent_id': 1}, headers=admin_headers)
+    assert response.status_code == 201
+    async with get_engine().begin() as conn:
+        await conn.execute(insert(Product), [{'name': 'Lamp', 'slug': 'lamp', 'description': 'Lamp', 'price': 30,
+                                              'image_url': '', 'stock': 1, 'category_id': 2, 'rating': 0}])
+    assert await category_slugs(client, admin_headers) == ['lamp', 'phone']
+
+    response = await client.delete('/categories/lamps', headers=admin_headers)
+    assert response.status_code == 200
+
+    assert await category_slugs(client, admin_headers) == ['phone']
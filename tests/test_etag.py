@@ -0,0 +1,40 @@
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+# имя прежнее: slug не меняется
+PRODUCT_UPDATE = {'name': 'Phone', 'description': 'Smartphone', 'price': 120, 'stock': 5, 'category_id': 1}
+
+
+@pytest.mark.parametrize('path', ['/products/detail/phone', '/products/', '/categories/'])
+async def test_matching_etag_not_modified(client, customer_headers, path):
+    response = await client.get(path, headers=customer_headers)
+    etag = response.headers['ETag']
+
+    response = await client.get(path, headers=customer_headers | {'If-None-Match': f'W/{etag}'})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.content == b''
+
+
+async def test_etag_changes_after_update(client, admin_headers):
+    etag = (await client.get('/products/detail/phone', headers=admin_headers)).headers['ETag']
+    response = await client.put('/products/phone', json=PRODUCT_UPDATE,
+                                headers=admin_headers | {'If-Match': etag})
+    assert response.status_code == 200
+
+    response = await client.get('/products/detail/phone', headers=admin_headers | {'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['price'] == 120
+
+
+async def test_stale_if_match_rejected(client, admin_headers):
+    etag = (await client.get('/products/detail/phone', headers=admin_headers)).headers['ETag']
+    await client.put('/products/phone', json=PRODUCT_UPDATE, headers=admin_headers)
+
+    response = await client.put('/products/phone', json=PRODUCT_UPDATE | {'price': 130},
+                                headers=admin_headers | {'If-Match': etag})
+    assert response.status_code == 412
+    response = await client.get('/products/detail/phone', headers=admin_headers)
+    assert response.json()['price'] == 120
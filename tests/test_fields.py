@@ -0,0 +1,30 @@
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize('path', ['/products/', '/products/detail/phone'])
+async def test_fields_projection(client, customer_headers, path):
+    response = await client.get(path, params={'fields': 'price, name'}, headers=customer_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    product = body['items'][0] if 'items' in body else body
+    # id добавляется всегда; список страницы добавляет version для ETag
+    assert {key: product[key] for key in ('id', 'name', 'price')} == {'id': 1, 'name': 'Phone', 'price': 100}
+    assert set(product) - {'id', 'name', 'price', 'version'} == set()
+
+
+async def test_projection_cached_separately(client, customer_headers):
+    await client.get('/products/detail/phone', params={'fields': 'name'}, headers=customer_headers)
+    response = await client.get('/products/detail/phone', headers=customer_headers)
+
+    assert 'description' in response.json()
+
+
+@pytest.mark.parametrize('fields', ['name,colour', ',', 'hashed_password'])
+async def test_unknown_field_rejected(client, customer_headers, fields):
+    response = await client.get('/products/', params={'fields': fields}, headers=customer_headers)
+
+    assert response.status_code == 422
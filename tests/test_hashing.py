@@ -0,0 +1,37 @@
+from threading import get_ident
+import pytest
+
+from app.backend.hashing import PasswordHasher
+from app.routers.auth import bcrypt_context
+
+
+pytestmark = pytest.mark.anyio
+
+USER = {'first_name': 'New', 'last_name': 'User', 'username': 'new', 'email': 'new@example.com'}
+
+
+async def test_hashing_runs_off_event_loop():
+    threads = []
+
+    class Context:
+        def hash(self, password):
+            threads.append(get_ident())
+            return bcrypt_context.hash(password)
+
+    hasher = PasswordHasher(Context(), workers=1, max_queue=0)
+    hashed = await hasher.hash('secret')
+
+    assert threads and threads[0] != get_ident()
+    assert bcrypt_context.verify('secret', hashed)
+
+
+async def test_user_created_with_hashed_password(client):
+    response = await client.post('/auth/', json=USER | {'password': 'secret'})
+
+    assert response.status_code == 201
+
+
+async def test_over_long_password_rejected(client):
+    response = await client.post('/auth/', json=USER | {'password': 'x' * 73})
+
+    assert response.status_code == 422
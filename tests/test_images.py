@@ -0,0 +1,64 @@
+from fastapi import HTTPException
+from io import BytesIO
+from PIL import Image
+import asyncio
+import pytest
+
+from app.backend.images import ImageProcessor
+from app.backend.thumbnails import UnsupportedImage, render_thumbnails
+
+
+def encoded(image: Image.Image, format: str) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('data', [
+    b'not an image',
+    encoded(Image.effect_noise((64, 64), 64), 'PNG')[:1000],
+])
+def test_corrupted_image_unsupported(tmp_path, data):
+    with pytest.raises(UnsupportedImage):
+        render_thumbnails(data, str(tmp_path), quality=80, max_pixels=10_000)
+
+
+def test_pixel_limit_unsupported(tmp_path):
+    with pytest.raises(UnsupportedImage):
+        render_thumbnails(encoded(Image.new('RGB', (200, 200)), 'PNG'), str(tmp_path), quality=80, max_pixels=10_000)
+
+
+def test_write_error_not_reported_as_bad_image(tmp_path):
+    occupied = tmp_path / 'file'
+    occupied.touch()
+
+    with pytest.raises(OSError) as error:
+        render_thumbnails(encoded(Image.new('RGB', (64, 64)), 'PNG'), str(occupied), quality=80, max_pixels=10_000)
+    assert not isinstance(error.value, UnsupportedImage)
+
+
+@pytest.mark.anyio
+async def test_cancelled_upload_holds_slot_until_render_ends(settings, tmp_path):
+    processor = ImageProcessor(workers=1, max_queue=0)
+    try:
+        # пул запущен заранее, чтобы большая картинка сразу попала в процесс
+        await processor.render(encoded(Image.new('RGB', (8, 8)), 'PNG'), tmp_path / 'warmup')
+        upload = asyncio.create_task(
+            processor.render(encoded(Image.effect_noise((3000, 3000), 64), 'BMP'), tmp_path / 'large')
+        )
+        await asyncio.sleep(0.2)
+        upload.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await upload
+
+        with pytest.raises(HTTPException) as rejected:
+            await processor.render(encoded(Image.new('RGB', (8, 8)), 'PNG'), tmp_path / 'small')
+        assert rejected.value.status_code == 503
+
+        for _ in range(200):
+            if processor._pending == 0:
+                break
+            await asyncio.sleep(0.05)
+        assert processor._pending == 0
+    finally:
+        processor.shutdown()
@@ -0,0 +1,32 @@
+import pytest
+
+from app.backend.db import get_engine, get_read_engine
+from app.backend.images import image_processor
+from app.backend.ratings import rating_worker
+from app.main import create_app
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_lifespan_opens_and_disposes_resources(settings):
+    app = create_app(settings)
+    async with app.router.lifespan_context(app):
+        primary, replica = get_engine(), get_read_engine()
+        executor = image_processor._executor
+        # пулы прогреты до готовности воркера
+        assert primary is not replica
+        assert primary.pool.checkedin() > 0 and replica.pool.checkedin() > 0
+        assert rating_worker._task is not None
+
+    assert primary.pool.checkedin() == 0 and replica.pool.checkedin() == 0
+    assert get_engine() is not primary
+    assert rating_worker._task is None
+    assert executor._shutdown_thread
+
+
+async def test_factory_uses_given_settings(settings):
+    app = create_app(settings)
+
+    assert get_engine().url.database == settings.db_database
+    assert {route.path for route in app.routes} >= {'/products/', '/categories/', '/orders/', '/auth/login'}
@@ -0,0 +1,46 @@
+from sqlalchemy import insert
+import pytest
+
+from app.backend.db import get_read_engine
+from app.models.models import Product
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def products(settings):
+    # одинаковые цены: порядок внутри цены задает id
+    rows = [{'id': product_id, 'name': f'Lamp {product_id}', 'slug': f'lamp-{product_id}', 'description': 'Lamp',
+             'price': 10 * (product_id % 4), 'image_url': '', 'stock': 1, 'category_id': 1, 'rating': 0}
+            for product_id in range(2, 22)]
+    async with get_read_engine().begin() as conn:
+        await conn.execute(insert(Product), rows)
+
+
+async def all_pages(client, headers, sort: str) -> list[tuple[int, int]]:
+    seen, after = [], None
+    while True:
+        params = {'sort': sort, 'limit': 3} | ({'after': after} if after else {})
+        response = await client.get('/products/', params=params, headers=headers)
+        assert response.status_code == 200
+        seen += [(item['price'], item['id']) for item in response.json()['items']]
+        after = response.json()['next_cursor']
+        if after is None:
+            return seen
+
+
+@pytest.mark.parametrize('sort, descending', [('price', False), ('-price', True)])
+async def test_sorted_pages_stable(client, customer_headers, products, sort, descending):
+    seen = await all_pages(client, customer_headers, sort)
+
+    assert len(seen) == len(set(seen)) == 21
+    assert seen == sorted(seen, reverse=descending)
+    assert seen == await all_pages(client, customer_headers, sort)
+
+
+@pytest.mark.parametrize('params', [{'sort': 'colour'}, {'colour': 'red'}, {'price_minimum': 10}])
+async def test_unknown_filter_or_sort_rejected(client, customer_headers, params):
+    response = await client.get('/products/', params=params, headers=customer_headers)
+
+    assert response.status_code == 422
@@ -0,0 +1,30 @@
+import re
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+PRODUCT_UPDATE = {'name': 'Phone X', 'description': 'Smartphone', 'price': 120, 'stock': 5, 'category_id': 1}
+
+
+def selects(statements: list[str], table: str) -> int:
+    return sum(1 for statement in statements
+               if statement.lstrip().upper().startswith('SELECT') and f'ecommerce_fastapi.{table}' in statement)
+
+
+def timed_queries(response) -> int:
+    return int(re.search(r'desc="(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+
+@pytest.mark.parametrize('method, path, body, table', [
+    ('PUT', '/products/phone', PRODUCT_UPDATE, 'products'),
+    ('DELETE', '/products/phone', None, 'products'),
+    ('PUT', '/categories/electronics', {'name': 'Gadgets'}, 'categories'),
+    ('DELETE', '/categories/electronics', None, 'categories'),
+])
+async def test_entity_loaded_once(client, admin_headers, statements, method, path, body, table):
+    response = await client.request(method, path, json=body, headers=admin_headers)
+
+    assert response.status_code == 200
+    assert selects(statements, table) == 1
+    assert timed_queries(response) == len(statements)
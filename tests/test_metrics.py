@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+from app.backend.metrics import mark_dead_workers
+
+
+def test_dead_worker_gauges_removed(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    for pid in (exited.pid, os.getpid()):
+        (tmp_path / f'gauge_livesum_{pid}.db').touch()
+    (tmp_path / f'counter_{exited.pid}.db').touch()
+
+    mark_dead_workers()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f'counter_{exited.pid}.db', f'gauge_livesum_{os.getpid()}.db'
+    ]
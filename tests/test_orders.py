@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, update
+import pytest
+
+from app.backend.db import AsyncSession
+from app.backend.orders import release_expired
+from app.models.models import Order, Product
+
+
+pytestmark = pytest.mark.anyio
+
+LAMP = {'id': 2, 'name': 'Lamp', 'slug': 'lamp', 'description': 'Desk lamp', 'price': 30,
+        'image_url': '', 'stock': 1, 'category_id': 1, 'rating': 0}
+
+
+async def stock(session, product_id: int) -> int:
+    return await session.scalar(select(Product.stock).where(Product.id == product_id))
+
+
+@pytest.fixture
+async def db(settings):
+    async with AsyncSession() as session:
+        await session.execute(insert(Product), [LAMP])
+        await session.commit()
+        yield session
+
+
+async def test_checkout_reserves_stock(client, customer_headers, db):
+    response = await client.post('/orders/', json={'items': [{'product_id': 1, 'quantity': 2},
+                                                             {'product_id': 1, 'quantity': 1},
+                                                             {'product_id': 2, 'quantity': 1}]},
+                                 headers=customer_headers)
+
+    assert response.status_code == 201
+    order = response.json()['order']
+    assert (order['status'], order['total']) == ('reserved', 3 * 100 + 30)
+    assert (await stock(db, 1), await stock(db, 2)) == (7, 0)
+
+
+async def test_oversell_reserves_nothing(client, customer_headers, db):
+    response = await client.post('/orders/', json={'items': [{'product_id': 1, 'quantity': 5},
+                                                             {'product_id': 2, 'quantity': 2}]},
+                                 headers=customer_headers)
+
+    assert response.status_code == 409
+    assert response.json()['detail']['products'] == [2]
+    assert (await stock(db, 1), await stock(db, 2)) == (10, 1)
+    assert await db.scalar(select(Order.id)) is None
+
+
+async def test_sweeper_releases_expired_reservation(client, customer_headers, db):
+    response = await client.post('/orders/', json={'items': [{'product_id': 1, 'quantity': 4}]},
+                                 headers=customer_headers)
+    order_id = response.json()['order']['id']
+    await db.execute(update(Order).where(Order.id == order_id)
+                     .values(expires_at=datetime.now() - timedelta(seconds=1)))
+    await db.commit()
+
+    assert await release_expired(db) == 1
+    assert await db.scalar(select(Order.status).where(Order.id == order_id)) == 'expired'
+    assert await stock(db, 1) == 10
+    # повторный проход ничего не возвращает второй раз
+    assert await release_expired(db) == 0
+    assert await stock(db, 1) == 10
@@ -0,0 +1,38 @@
+import pytest
+
+from app.backend.pagination import encode_cursor
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize('after', [
+    encode_cursor([{'a': 1}]),
+    encode_cursor(['x', 'y']),
+    encode_cursor([100]),
+    encode_cursor([100, 1, 2]),
+    encode_cursor([True, 1]),
+    encode_cursor({'price': 100}),
+    'not-a-cursor',
+])
+async def test_tampered_cursor_rejected(client, customer_headers, after):
+    response = await client.get('/products/', params={'sort': 'price', 'after': after}, headers=customer_headers)
+
+    assert response.status_code == 400
+    assert response.json()['detail'] == 'Invalid cursor'
+
+
+async def test_cursor_continues_listing(client, customer_headers):
+    response = await client.get('/products/', params={'sort': 'price', 'after': encode_cursor([50, 7])},
+                                headers=customer_headers)
+
+    assert response.status_code == 200
+    assert [product['slug'] for product in response.json()['items']] == ['phone']
+
+
+async def test_search_cursor_accepts_rank(client, customer_headers):
+    response = await client.get('/products/search', params={'q': 'phone', 'after': encode_cursor([1e9, 1])},
+                                headers=customer_headers)
+
+    assert response.status_code == 200
+    assert [product['slug'] for product in response.json()['items']] == ['phone']
@@ -0,0 +1,99 @@
+from sqlalchemy import insert, select
+import pytest
+
+from app.backend import ratings
+from app.backend.db import AsyncSession, get_engine
+from app.backend.ratings import RatingWorker, RatingsNotApplied, rating_worker
+from app.models.models import Product, Rating
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def product_rating() -> tuple[float, int, float]:
+    async with get_engine().connect() as conn:
+        product = (await conn.execute(
+            select(Product.rating_sum, Product.rating_count, Product.rating).where(Product.id == 1)
+        )).one()
+    return tuple(product)
+
+
+def failing_stmt(product_ids):
+    raise RuntimeError('database is unavailable')
+
+
+async def add_ratings(*grades: float) -> None:
+    # оценки без сессии ORM: воркер о них не узнает, пока продукт не отмечен
+    async with get_engine().begin() as conn:
+        await conn.execute(insert(Rating), [{'grade': grade, 'user_id': user_id, 'product_id': 1}
+                                            for user_id, grade in enumerate(grades, start=1)])
+
+
+async def test_marks_coalesced_into_one_update(settings, statements):
+    await add_ratings(4.0, 2.0)
+    statements.clear()
+    worker = RatingWorker(mode='inprocess', window=0)
+    worker.mark([1])
+    worker.mark([1])
+    await worker.flush()
+
+    assert [statement.lstrip().split()[0].upper() for statement in statements] == ['UPDATE']
+    assert await product_rating() == (6.0, 2, 3.0)
+
+
+async def test_repeated_recompute_does_not_drift(settings):
+    await add_ratings(4.0)
+    worker = RatingWorker(mode='inprocess', window=0)
+    for _ in range(2):
+        # повтор после неясного исхода commit
+        worker.mark([1])
+        await worker.flush()
+
+    assert await product_rating() == (4.0, 1, 4.0)
+
+
+async def test_committed_rating_changes_reach_product(settings):
+    async with AsyncSession() as db:
+        rating = Rating(grade=5, user_id=2, product_id=1)
+        db.add(rating)
+        await db.commit()
+        await rating_worker.flush()
+        assert await product_rating() == (5.0, 1, 5.0)
+
+        rating.is_active = False
+        await db.commit()
+        await rating_worker.flush()
+        assert await product_rating() == (0.0, 0, 0.0)
+
+
+async def test_rolled_back_changes_discarded(settings):
+    async with AsyncSession() as db:
+        db.add(Rating(grade=5, user_id=2, product_id=1))
+        await db.flush()
+        await db.rollback()
+    await rating_worker.flush()
+
+    assert await product_rating() == (0.0, 0, 0.0)
+
+
+async def test_celery_task_recomputes_ratings(settings):
+    await add_ratings(3.0)
+    worker = RatingWorker(mode='celery', window=0)
+    worker.mark([1])
+    await worker.flush()
+
+    assert await product_rating() == (3.0, 1, 3.0)
+
+
+@pytest.mark.parametrize('mode', ['inprocess', 'celery'])
+async def test_failed_products_marked_again(settings, monkeypatch, mode):
+    await add_ratings(3.0)
+    worker = RatingWorker(mode=mode, window=0)
+    worker.mark([1])
+    monkeypatch.setattr(ratings, 'rebuild_ratings_stmt', failing_stmt)
+    with pytest.raises(RatingsNotApplied):
+        await worker.flush()
+    monkeypatch.undo()
+
+    await worker.flush()
+    assert await product_rating() == (3.0, 1, 3.0)
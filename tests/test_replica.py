@@ -0,0 +1,104 @@
+from sqlalchemy import select, update
+import orjson
+import pytest
+
+from app.backend.cache import ResponseCache
+from app.backend.db import ReadSession, get_engine, read_only
+from app.models.models import Category, Product
+
+
+pytestmark = pytest.mark.anyio
+
+
+def loader(content, *tags):
+    async def load():
+        return content, tags
+    return load
+
+
+async def rename_on_primary(name: str) -> None:
+    async with get_engine().begin() as conn:
+        await conn.execute(update(Category).where(Category.id == 1)
+                           .values(name=name, version=Category.version + 1))
+
+
+async def category_names(client, headers) -> list[str]:
+    response = await client.get('/categories/', headers=headers)
+    assert response.status_code == 200
+    return [category['name'] for category in response.json()]
+
+
+async def test_reads_use_replica(client, customer_headers):
+    await rename_on_primary('Renamed')
+
+    assert await category_names(client, customer_headers) == ['Electronics']
+
+
+async def test_writer_reads_own_write_by_token(client, admin_headers, customer_headers):
+    response = await client.put('/categories/electronics', json={'name': 'Gadgets'}, headers=admin_headers)
+    assert response.status_code == 200
+    client.cookies.clear()
+
+    assert await category_names(client, admin_headers) == ['Gadgets']
+    assert await category_names(client, customer_headers) == ['Electronics']
+
+
+async def test_writer_reads_own_write_by_cookie(client, admin_headers, customer_headers):
+    response = await client.put('/categories/electronics', json={'name': 'Gadgets'}, headers=admin_headers)
+    assert response.status_code == 200
+
+    assert await category_names(client, customer_headers) == ['Gadgets']
+
+
+async def test_role_change_not_reloaded_from_replica(client, admin_headers, promoted_headers):
+    response = await client.patch('/auth/add_supplier/2', headers=admin_headers)
+    assert response.status_code == 200
+    client.cookies.clear()
+
+    # товар поставщика получает его supplier_id, только если пользователь загружен уже с новой ролью
+    row = orjson.dumps({'name': 'Lamp', 'description': 'Lamp', 'price': 10, 'stock': 1, 'category_id': 1})
+    response = await client.post('/products/bulk', content=row, headers=promoted_headers)
+    assert response.json()['inserted'] == 1
+    async with get_engine().connect() as conn:
+        assert await conn.scalar(select(Product.supplier_id).where(Product.slug == 'lamp')) == 2
+
+
+async def test_deleted_user_not_reloaded_from_replica(client, admin_headers, customer_headers):
+    response = await client.delete('/auth/delete_user/2', headers=admin_headers)
+    assert response.status_code == 200
+    client.cookies.clear()
+
+    response = await client.get('/auth/users/me', headers=customer_headers)
+    assert response.status_code == 401
+
+
+async def test_replica_response_after_write_not_cached(shared_backend):
+    cache = ResponseCache(shared_backend, ttl=60, replica_lag=5)
+    await cache.invalidate('reviews:1')
+    token = read_only.set(True)
+    try:
+        # реплика еще не получила запись: ответ отдается, но не сохраняется
+        await cache.get_or_set('reviews', '1', loader([], 'reviews:1'))
+    finally:
+        read_only.reset(token)
+
+    assert await shared_backend.get('reviews:1') is None
+
+
+async def test_primary_reads_bypass_cache(shared_backend):
+    cache = ResponseCache(shared_backend, ttl=60, replica_lag=5)
+    token = read_only.set(True)
+    try:
+        await cache.get_or_set('reviews', '1', loader([], 'reviews:1'))
+    finally:
+        read_only.reset(token)
+
+    body = await cache.get_or_set('reviews', '1', loader(['new'], 'reviews:1'))
+    assert body == orjson.dumps(['new'])
+
+
+async def test_read_session_refuses_writes(settings):
+    async with ReadSession() as session:
+        session.add(Category(name='Books', slug='books'))
+        with pytest.raises(RuntimeError):
+            await session.flush()
@@ -0,0 +1,35 @@
+from sqlalchemy import event
+import pytest
+
+from app.backend.db import get_read_engine
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize('q', ['  ', '\t'])
+async def test_blank_query_rejected(client, customer_headers, q):
+    response = await client.get('/products/search', params={'q': q}, headers=customer_headers)
+
+    assert response.status_code == 422
+
+
+async def test_query_padded_with_spaces(client, customer_headers):
+    response = await client.get('/products/search', params={'q': '  phone '}, headers=customer_headers)
+
+    assert response.status_code == 200
+    assert [product['slug'] for product in response.json()['items']] == ['phone']
+
+
+async def test_search_runs_no_ddl(client, customer_headers):
+    executed = []
+    engine = get_read_engine().sync_engine
+    capture = lambda conn, cursor, statement, *args: executed.append(statement)
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = await client.get('/products/search', params={'q': 'phone'}, headers=customer_headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    assert response.status_code == 200
+    assert executed and all(statement.lstrip().upper().startswith('SELECT') for statement in executed)
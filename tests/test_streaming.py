@@ -0,0 +1,33 @@
+from sqlalchemy import insert
+import orjson
+import pytest
+
+from app.backend.db import get_read_engine
+from app.models.models import Product
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def products(settings):
+    rows = [{'id': product_id, 'name': f'Lamp {product_id}', 'slug': f'lamp-{product_id}', 'description': 'Lamp',
+             'price': product_id, 'image_url': '', 'stock': 1, 'category_id': 1, 'rating': 0}
+            for product_id in range(2, 2502)]
+    async with get_read_engine().begin() as conn:
+        await conn.execute(insert(Product), rows)
+    return len(rows) + 1
+
+
+async def test_ndjson_streams_every_row(client, customer_headers, products):
+    headers = customer_headers | {'Accept': 'application/x-ndjson'}
+    async with client.stream('GET', '/products/', params={'fields': 'slug'}, headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        body = b''.join([chunk async for chunk in response.aiter_bytes()])
+
+    assert body.endswith(b'\n')
+    rows = [orjson.loads(line) for line in body.splitlines()]
+    assert len(rows) == products
+    assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+    assert rows[0] == {'id': 1, 'slug': 'phone'}